@@ -0,0 +1,85 @@
+'''
+Times a backtest over a synthetic multi-season archive.
+
+A temporary archive is filled with one forecast.json payload per school night
+(SEASON_DAYS nights a season) for every district, with about a quarter of the
+nights snowy, plus an outcomes CSV where most snowy nights closed school. The
+archive is then replayed with the stub predictor across the process pool, so the
+time is the replay itself (reading, parsing, pre-screen and prompt build) rather
+than assistant time.
+
+Usage:
+    python -m benchmarks.backtest_benchmark [--districts 4] [--seasons 5] [--workers 4] [--gzip]
+'''
+import argparse
+import csv
+import gzip
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from benchmarks import sample_forecasts
+from general_functions import backtest
+
+SEASON_DAYS = 150
+
+def build_archive(directory, districts, seasons, compress):
+    '''
+    Writes the synthetic archive and outcomes. Returns the archive directory and outcomes path.
+    '''
+    rng = random.Random(0)
+    archive_directory = os.path.join(directory, 'archive')
+    outcomes_path = os.path.join(directory, 'outcomes.csv')
+    with open(outcomes_path, 'w', newline='', encoding='utf-8') as outcomes_file:
+        writer = csv.writer(outcomes_file)
+        writer.writerow(['district', 'date', 'closed'])
+        for district in range(districts):
+            district_directory = os.path.join(archive_directory, f'district{district}')
+            os.makedirs(district_directory)
+            for season in range(seasons):
+                season_start = date(2019 + season, 11, 1)
+                for day in range(SEASON_DAYS):
+                    forecast_date = season_start + timedelta(days=day)
+                    snowy = rng.random() < 0.25
+                    payload = json.dumps(sample_forecasts.make_forecast(
+                        snowy=snowy, alerts=int(snowy), seed=rng.randrange(1 << 30), start_date=forecast_date))
+                    path = os.path.join(district_directory, f'{forecast_date.isoformat()}.json')
+                    if compress:
+                        with gzip.open(f'{path}.gz', 'wt', encoding='utf-8') as forecast_file:
+                            forecast_file.write(payload)
+                    else:
+                        with open(path, 'w', encoding='utf-8') as forecast_file:
+                            forecast_file.write(payload)
+                    closed = snowy and rng.random() < 0.6
+                    writer.writerow([f'district{district}', (forecast_date + timedelta(days=1)).isoformat(),
+                                     int(closed)])
+    return archive_directory, outcomes_path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--districts', type=int, default=4)
+    parser.add_argument('--seasons', type=int, default=5)
+    parser.add_argument('--workers', type=int, nargs='*', default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument('--gzip', action='store_true', help='archive the payloads as .json.gz')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        start_time = time.perf_counter()
+        archive_directory, outcomes_path = build_archive(directory, args.districts, args.seasons, args.gzip)
+        print(f'Built {args.districts * args.seasons * SEASON_DAYS} archived forecasts '
+              f'in {time.perf_counter() - start_time:.1f}s')
+        outcomes = backtest.load_outcomes(outcomes_path)
+
+        for workers in args.workers:
+            start_time = time.perf_counter()
+            results = backtest.run_backtest(archive_directory, 'stub', workers)
+            elapsed_seconds = time.perf_counter() - start_time
+            summary = backtest.score_predictions(results, outcomes)
+            print(f'\n{workers} worker(s): {len(results)} forecasts in {elapsed_seconds:.2f}s '
+                  f'({len(results) / elapsed_seconds:.0f} forecasts/s)')
+            backtest.print_report(summary, results)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+'''
+Runs the whole pipeline offline against local fakes of every external service
+(WeatherAPI, OpenAI, Google Forms and SMTP) and reports wall time, per-stage
+time, peak memory and throughput.
+
+Each scenario runs in a fresh Python process so memory peaks don't carry over.
+"main" scenarios drive main.main() for one district with the given number of
+sign ups; the "batch" scenario drives the batch runner for N districts. All
+caches, the recipient store and the prediction files go to a temporary
+directory, so nothing in the project is touched.
+
+Usage:
+    python -m benchmarks.end_to_end_benchmark [--recipients 10 1000 100000]
+        [--districts 10] [--batch-recipients 100]
+        [--weather-latency 0.05] [--openai-latency 0.02] [--assistant-seconds 1]
+        [--forms-latency 0.05] [--smtp-latency 0] [--http-error-rate 0] [--smtp-failure-rate 0]
+'''
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.fake_services import FakeGoogleForms, FakeOpenAi, FakeWeatherApi
+from benchmarks.smtp_sink import SmtpSink
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def configure_child(config, work_directory):
+    '''
+    Points the settings and environment of a scenario process at the fakes and the work directory.
+    Has to run before the pipeline modules are imported, since some read settings at import time.
+    '''
+    from settings import settings
+
+    os.environ.update({
+        'OPENAI_API_KEY': 'benchmark', 'OPENAI_BASE_URL': f'{config["openai_url"]}/v1',
+        'WEATHERAPI_KEY': 'benchmark', 'SENDER_EMAIL': 'blizzard@example.com',
+        'GOOGLE_SIGN_UP_FORM_ID': f'bench-{config["recipients"]}',
+    })
+    os.environ.pop('SENDER_EMAIL_PASSWORD', None)
+
+    token_path = os.path.join(work_directory, 'token.json')
+    expiry = (datetime.datetime.utcnow() + datetime.timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    with open(token_path, 'w', encoding='utf-8') as token_file:
+        json.dump({'token': 'benchmark', 'refresh_token': 'benchmark', 'client_id': 'benchmark',
+                   'client_secret': 'benchmark', 'expiry': expiry}, token_file)
+
+    settings.TESTING_MODE = False
+    settings.WEATHER_API_BASE = f'{config["weather_url"]}/v1/'
+    settings.SMTP_SERVER, settings.SMTP_PORT = config['smtp_host'], config['smtp_port']
+    settings.SMTP_USE_TLS = False
+    settings.SMTP_AUTH_ENABLED = False
+    settings.SMTP_RETRY_DELAY_SECONDS = 0.01
+    settings.GOOGLE_TOKEN_PATH = token_path
+    settings.PREDICTION_CACHE_ENABLED = False
+    for name, relative_path in (('FORECAST_CACHE_DIRECTORY', 'forecasts'), ('PREDICTION_CACHE_DIRECTORY', 'predictions'),
+                                ('OPENAI_METADATA_CACHE_PATH', 'openai_metadata.json'),
+                                ('PRESCREEN_STATS_PATH', 'prescreen_stats.json'),
+                                ('RECIPIENT_STORE_PATH', 'recipients.sqlite3'),
+                                ('PREDICTION_STORE_PATH', 'predictions.sqlite3'),
+                                ('METRICS_PATH', 'metrics.jsonl'), ('PREDICTION_FILE', 'prediction.txt'),
+                                ('BATCH_PREDICTIONS_DIRECTORY', 'batch_predictions'),
+                                ('SITE_DIRECTORY', 'site'), ('SITE_INDEX_PAGE', 'index.html')):
+        setattr(settings, name, os.path.join(work_directory, relative_path))
+    settings.DISTRICTS = [
+        {'id': f'district{index}', 'zip_code': str(10000 + index),
+         'sign_up_form_id': f'bench-{config["batch_recipients"]}-{index}'}
+        for index in range(config['districts'])
+    ]
+
+def run_child(config):
+    '''
+    Runs one scenario in this process and returns its measurements.
+    '''
+    import resource
+
+    with tempfile.TemporaryDirectory() as work_directory:
+        configure_child(config, work_directory)
+        from google_functions import google_forms
+        from general_functions import batch_runner, metrics
+        from settings import settings
+        import main
+
+        google_forms.GOOGLE_FORMS_API_BASE_URL = f'{config["forms_url"]}/v1/forms'
+        start_time = time.perf_counter()
+        if config['scenario'] == 'batch':
+            batch_runner.run_batch()
+        else:
+            main.main()
+        wall_seconds = time.perf_counter() - start_time
+        metrics.flush()
+        stages = {}
+        sent = 0
+        for span in metrics.load_spans(settings.METRICS_PATH):
+            stages[span['stage']] = stages.get(span['stage'], 0.0) + span['seconds']
+            if span['stage'] == 'smtp_send':
+                sent += span.get('delivered', 0)
+
+    return {
+        'wall_seconds': wall_seconds,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'sent': sent,
+        'stages': stages,
+    }
+
+def run_scenario(config):
+    '''
+    Runs a scenario in a fresh process and returns its measurements.
+    '''
+    with tempfile.NamedTemporaryFile('r', suffix='.json') as result_file:
+        subprocess.run(
+            [sys.executable, '-m', 'benchmarks.end_to_end_benchmark', '--child', json.dumps(config),
+             '--result', result_file.name],
+            cwd=ROOT_DIRECTORY, check=True, stdout=subprocess.DEVNULL
+        )
+        return json.load(result_file)
+
+def print_results(label, config, result, sink_messages):
+    recipients = config['recipients'] if config['scenario'] == 'main' else config['batch_recipients'] * config['districts']
+    print(f'\n{label}: {recipients} recipients, wall {result["wall_seconds"]:.2f}s, '
+          f'peak RSS {result["max_rss_mb"]:.0f} MiB, sent {result["sent"]} ({sink_messages} at the sink), '
+          f'{result["sent"] / result["wall_seconds"]:.0f} messages/s')
+    if config['scenario'] == 'batch':
+        print(f'  {config["districts"] / (result["wall_seconds"] / 60):.1f} districts/minute')
+    # Stage times add up across districts and worker threads, so they can exceed the wall time
+    for stage, seconds in sorted(result['stages'].items(), key=lambda item: -item[1]):
+        print(f'  {stage:<28} {seconds:>9.3f}s')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--recipients', type=int, nargs='*', default=[10, 1000, 100000],
+                        help='sign ups for each single district (main) scenario')
+    parser.add_argument('--districts', type=int, default=10, help='districts in the batch scenario (0 to skip)')
+    parser.add_argument('--batch-recipients', type=int, default=100, help='sign ups per district in the batch scenario')
+    parser.add_argument('--weather-latency', type=float, default=0.05)
+    parser.add_argument('--openai-latency', type=float, default=0.02)
+    parser.add_argument('--assistant-seconds', type=float, default=1.0, help='how long each assistant run takes')
+    parser.add_argument('--forms-latency', type=float, default=0.05)
+    parser.add_argument('--smtp-latency', type=float, default=0.0, help='seconds the sink takes per message')
+    parser.add_argument('--http-error-rate', type=float, default=0.0, help='share of HTTP requests answered with 503')
+    parser.add_argument('--smtp-failure-rate', type=float, default=0.0)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        with open(args.result, 'w', encoding='utf-8') as result_file:
+            json.dump(run_child(json.loads(args.child)), result_file)
+        return
+
+    weather = FakeWeatherApi(latency_seconds=args.weather_latency, error_rate=args.http_error_rate).start()
+    openai_service = FakeOpenAi(run_seconds=args.assistant_seconds, latency_seconds=args.openai_latency,
+                                error_rate=args.http_error_rate).start()
+    forms = FakeGoogleForms(latency_seconds=args.forms_latency, error_rate=args.http_error_rate).start()
+    scenarios = [('main', count, 0) for count in args.recipients]
+    if args.districts:
+        scenarios.append(('batch', 0, args.districts))
+
+    try:
+        for scenario, recipients, districts in scenarios:
+            sink = SmtpSink(latency_seconds=args.smtp_latency, failure_rate=args.smtp_failure_rate).start()
+            config = {
+                'scenario': scenario, 'recipients': recipients, 'districts': districts,
+                'batch_recipients': args.batch_recipients,
+                'weather_url': weather.url, 'openai_url': openai_service.url, 'forms_url': forms.url,
+                'smtp_host': sink.host, 'smtp_port': sink.port,
+            }
+            try:
+                result = run_scenario(config)
+            finally:
+                sink.stop()
+            label = 'main.main()' if scenario == 'main' else f'batch of {districts} districts'
+            print_results(label, config, result, sink.stats['messages'])
+    finally:
+        for service in (weather, openai_service, forms):
+            service.stop()
+        print(f'\nFake service requests: weather {weather.stats}, openai {openai_service.stats}, '
+              f'forms {forms.stats}')
+
+if __name__ == '__main__':
+    main()
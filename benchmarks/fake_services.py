@@ -0,0 +1,230 @@
+'''
+Local stand-ins for the HTTP services the pipeline talks to, for benchmarks.
+
+- FakeWeatherApi serves forecast.json with synthetic snowy forecasts.
+- FakeOpenAi serves the slice of the OpenAI API the assistant flow uses
+  (assistants, files, threads, messages and runs). Runs finish after a
+  configurable number of seconds and report token usage.
+- FakeGoogleForms serves paginated form responses. The number of sign ups is
+  read from the form ID, so "bench-1000" has 1000 responses and
+  "bench-1000-3" is another form with 1000 different responses.
+
+Every fake takes a per-request latency and an error rate (the share of requests
+answered with a 503). Use SmtpSink from benchmarks.smtp_sink for email.
+
+Usage:
+    weather = FakeWeatherApi(latency_seconds=0.05).start()
+    ... point settings.WEATHER_API_BASE at f'{weather.url}/v1/'
+    weather.stop()
+'''
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from benchmarks import sample_forecasts
+from google_functions import google_forms
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    '''
+    Applies the service's latency and error injection, then dispatches to service.handle().
+    '''
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _dispatch(self):
+        service = self.server.service
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        with service.lock:
+            service.stats['requests'] += 1
+            failed = service.error_rate and service.random.random() < service.error_rate
+        if service.latency_seconds:
+            time.sleep(service.latency_seconds)
+        if failed:
+            with service.lock:
+                service.stats['errors'] += 1
+            self.send_json(503, {'error': {'message': 'Injected failure'}})
+            return
+
+        url = urlparse(self.path)
+        status, payload = service.handle(self.command, url.path, parse_qs(url.query), body)
+        self.send_json(status, payload)
+
+    do_GET = do_POST = do_DELETE = _dispatch
+
+    def send_json(self, status, payload):
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        with self.server.service.lock:
+            self.server.service.stats['bytes'] += len(data)
+
+class FakeService:
+    '''
+    A threaded HTTP server for one fake service.
+    '''
+    def __init__(self, host='127.0.0.1', port=0, latency_seconds=0.0, error_rate=0.0, seed=0):
+        self.latency_seconds = latency_seconds
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'errors': 0, 'bytes': 0}
+        self._server = ThreadingHTTPServer((host, port), _FakeHandler)
+        self._server.daemon_threads = True
+        self._server.service = self
+        self.host, self.port = self._server.server_address[:2]
+        self.url = f'http://{self.host}:{self.port}'
+        self._thread = None
+
+    def handle(self, method, path, query, body):
+        '''
+        Answers one request. Returns (status code, JSON-serializable payload or bytes).
+        '''
+        raise NotImplementedError
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+class FakeWeatherApi(FakeService):
+    '''
+    Serves /v1/forecast.json with a synthetic snowy forecast for the requested number of days.
+    '''
+    def __init__(self, snowy=True, **kwargs):
+        super().__init__(**kwargs)
+        self.snowy = snowy
+        self._bodies = {}
+
+    def handle(self, method, path, query, body):
+        if not path.endswith('/forecast.json'):
+            return 404, {'error': {'message': 'Not found'}}
+        days = int(query.get('days', ['2'])[0])
+        if days not in self._bodies:
+            self._bodies[days] = sample_forecasts.make_forecast_bytes(days=days, snowy=self.snowy)
+        return 200, self._bodies[days]
+
+class FakeOpenAi(FakeService):
+    '''
+    Serves the assistant flow: the 'Blizzard' assistants, file uploads, threads,
+    messages and runs. A run reports 'in_progress' until run_seconds have passed,
+    then 'completed', and the thread gets a structured prediction reply.
+    '''
+    def __init__(self, run_seconds=1.0, probability=90, prompt_tokens=700, completion_tokens=150, **kwargs):
+        super().__init__(**kwargs)
+        self.run_seconds = run_seconds
+        self.probability = probability
+        self.usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens}
+        self._ids = itertools.count(1)
+        self._runs = {}
+        self._files = {}
+
+    def _new_id(self, prefix):
+        return f'{prefix}_{next(self._ids)}'
+
+    def _reply(self):
+        return json.dumps({
+            'probability': self.probability,
+            'rationale': 'Heavy overnight snow and low visibility during the morning commute.',
+            'message': f'There is a {self.probability}% chance of a snow day tomorrow. Stay warm!',
+        })
+
+    def handle(self, method, path, query, body):
+        parts = path.strip('/').split('/')[1:]
+        now = int(time.time())
+        if parts[0] == 'assistants':
+            assistants = [{'id': f'asst_{name}', 'object': 'assistant', 'name': name, 'created_at': now,
+                           'model': 'gpt-4-1106-preview', 'tools': [], 'file_ids': [], 'metadata': {}}
+                          for name in ('Blizzard', 'Blizzard_Testing')]
+            if len(parts) == 1:
+                return 200, {'object': 'list', 'data': assistants, 'has_more': False}
+            return 200, next((assistant for assistant in assistants if assistant['id'] == parts[1]),
+                             assistants[0])
+
+        if parts[0] == 'files':
+            if method == 'POST':
+                file_id = self._new_id('file')
+                match = re.search(rb'filename="([^"]+)"', body)
+                self._files[file_id] = {'id': file_id, 'object': 'file', 'bytes': len(body), 'created_at': now,
+                                        'filename': match.group(1).decode() if match else 'upload',
+                                        'purpose': 'assistants', 'status': 'processed'}
+                return 200, self._files[file_id]
+            if len(parts) == 1:
+                return 200, {'object': 'list', 'data': list(self._files.values()), 'has_more': False}
+            if method == 'DELETE':
+                self._files.pop(parts[1], None)
+                return 200, {'id': parts[1], 'object': 'file', 'deleted': True}
+            if parts[1] not in self._files:
+                return 404, {'error': {'message': 'No such file'}}
+            return 200, self._files[parts[1]]
+
+        if parts[0] == 'threads':
+            if len(parts) == 1:
+                return 200, {'id': self._new_id('thread'), 'object': 'thread', 'created_at': now, 'metadata': {}}
+            thread_id = parts[1]
+            if parts[2] == 'messages':
+                message = {'id': self._new_id('msg'), 'object': 'thread.message', 'created_at': now,
+                           'thread_id': thread_id, 'role': 'user', 'file_ids': [], 'metadata': {},
+                           'content': [{'type': 'text', 'text': {'value': '', 'annotations': []}}]}
+                if method == 'POST':
+                    return 200, message
+                message.update(role='assistant', content=[
+                    {'type': 'text', 'text': {'value': self._reply(), 'annotations': []}}])
+                return 200, {'object': 'list', 'data': [message], 'has_more': False}
+
+            if parts[2] == 'runs':
+                if method == 'POST' and len(parts) == 3:
+                    run_id = self._new_id('run')
+                    self._runs[run_id] = time.monotonic()
+                else:
+                    run_id = parts[3]
+                finished = time.monotonic() - self._runs.get(run_id, 0) >= self.run_seconds
+                cancelled = len(parts) == 5 and parts[4] == 'cancel'
+                status = 'cancelled' if cancelled else 'completed' if finished else 'in_progress'
+                return 200, {'id': run_id, 'object': 'thread.run', 'created_at': now, 'thread_id': thread_id,
+                             'assistant_id': 'asst_Blizzard', 'status': status, 'model': 'gpt-4-1106-preview',
+                             'tools': [], 'file_ids': [], 'metadata': {}, 'instructions': '',
+                             'usage': self.usage if status == 'completed' else None}
+
+        return 404, {'error': {'message': f'Unknown path {path}'}}
+
+class FakeGoogleForms(FakeService):
+    '''
+    Serves /v1/forms/<form id>/responses. A form ID ending in a number of sign ups
+    ("bench-1000", or "bench-1000-<suffix>" for more distinct forms) has that many responses.
+    '''
+    def handle(self, method, path, query, body):
+        match = re.match(r'.*/forms/([^/]+)/responses$', path)
+        if not match:
+            return 404, {'error': {'message': 'Not found'}}
+        form_id = match.group(1)
+        count_match = re.match(r'[^-]+-(\d+)', form_id)
+        count = int(count_match.group(1)) if count_match else 0
+        page_size = int(query.get('pageSize', ['5000'])[0])
+        start = int(query.get('pageToken', ['0'])[0])
+        end = min(count, start + page_size)
+
+        responses = [{
+            'responseId': f'{form_id}-{index}',
+            'respondentEmail': f'parent{index}.{form_id}@example.com',
+            'lastSubmittedTime': f'2024-01-01T{index // 3600 % 24:02d}:{index // 60 % 60:02d}:{index % 60:02d}Z',
+            'answers': {google_forms.NAME_ANSWER_KEY: {'textAnswers': {'answers': [{'value': f'Parent{index}'}]}}},
+        } for index in range(start, end)]
+        payload = {'responses': responses}
+        if end < count:
+            payload['nextPageToken'] = str(end)
+        return 200, payload
@@ -0,0 +1,125 @@
+'''
+Measures how fast the feedback votes are taken, and checks none are lost.
+
+Three scenarios run against a temporary feedback store:
+- buffer: threads add votes straight to a VoteBuffer (the ingestion ceiling),
+- per vote: every vote written in its own transaction, for comparison,
+- http: client threads POST votes to the prediction server over keep-alive connections.
+
+After each buffered scenario the buffer is closed (flushing what is left) and the
+stored votes are counted: the benchmark exits with status 1 if the store or the
+live counters don't match the votes that were accepted.
+
+The HTTP clients run in the same process as the server, so those numbers are a lower bound.
+
+Usage:
+    python -m benchmarks.feedback_benchmark [--votes 100000] [--http-votes 10000] [--threads 8]
+'''
+import argparse
+import datetime
+import http.client
+import os
+import sys
+import tempfile
+import threading
+import time
+from general_functions import feedback_store
+from general_functions import prediction_server
+from settings import settings
+
+def run_threads(threads, target):
+    '''
+    Runs target(thread index) on each thread and returns the wall seconds.
+    '''
+    workers = [threading.Thread(target=target, args=(index,)) for index in range(threads)]
+    start_time = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start_time
+
+def check_counts(label, buffer, target_date, expected):
+    '''
+    Compares the stored votes and the live counters with the expected counts.
+    '''
+    stored = feedback_store.get_counts(settings.DISTRICT_ID, target_date).get((settings.DISTRICT_ID, target_date))
+    live = buffer.get_counts(settings.DISTRICT_ID, target_date)
+    ok = stored == expected and live == expected
+    print(f'  {label}: expected {expected}, stored {stored}, live {live} -> {"ok" if ok else "MISMATCH"}')
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--votes', type=int, default=100000, help='votes added straight to the buffer')
+    parser.add_argument('--per-vote', type=int, default=2000, help='votes written one transaction each')
+    parser.add_argument('--http-votes', type=int, default=10000, help='votes posted to the server')
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    today = datetime.date.today()
+    ok = True
+    with tempfile.TemporaryDirectory() as work_directory:
+        settings.FEEDBACK_STORE_PATH = os.path.join(work_directory, 'feedback.sqlite3')
+        settings.PREDICTION_STORE_PATH = os.path.join(work_directory, 'predictions.sqlite3')
+
+        buffer = feedback_store.VoteBuffer()
+        target_date = today.isoformat()
+        per_thread = args.votes // args.threads
+        seconds = run_threads(args.threads, lambda index: [
+            buffer.add(settings.DISTRICT_ID, target_date, feedback_store.VOTES[vote % 2]) for vote in range(per_thread)])
+        close_start = time.perf_counter()
+        buffer.close()
+        total = per_thread * args.threads
+        print(f'buffer:   {total / seconds:>9.0f} votes/s ({total} votes, final flush '
+              f'{(time.perf_counter() - close_start) * 1000:.0f}ms)')
+        ok &= check_counts('buffer', buffer, target_date,
+                           {'yes': (per_thread + 1) // 2 * args.threads, 'no': per_thread // 2 * args.threads})
+
+        start_time = time.perf_counter()
+        for vote in range(args.per_vote):
+            feedback_store.append_votes([(settings.DISTRICT_ID, 'per-vote', feedback_store.VOTES[vote % 2], time.time())])
+        print(f'per vote: {args.per_vote / (time.perf_counter() - start_time):>9.0f} votes/s ({args.per_vote} votes)')
+
+        server = prediction_server.make_server('127.0.0.1', 0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        target_date = (today - datetime.timedelta(days=1)).isoformat()
+        accepted = {'yes': 0, 'no': 0}
+        latencies = []
+        lock = threading.Lock()
+
+        def post_votes(index):
+            connection = http.client.HTTPConnection(*server.server_address[:2])
+            own_latencies = []
+            own_accepted = {'yes': 0, 'no': 0}
+            for number in range(args.http_votes // args.threads):
+                vote = feedback_store.VOTES[(index + number) % 2]
+                start = time.perf_counter()
+                connection.request('POST', prediction_server.FEEDBACK_PATH,
+                                   body=f'district={settings.DISTRICT_ID}&date={target_date}&vote={vote}',
+                                   headers={'Content-Type': 'application/x-www-form-urlencoded'})
+                response = connection.getresponse()
+                response.read()
+                own_latencies.append(time.perf_counter() - start)
+                if response.status == 202:
+                    own_accepted[vote] += 1
+            connection.close()
+            with lock:
+                latencies.extend(own_latencies)
+                for vote, count in own_accepted.items():
+                    accepted[vote] += count
+
+        seconds = run_threads(args.threads, post_votes)
+        server.shutdown()
+        server.server_close()
+        server.feedback.close()
+        latencies.sort()
+        print(f'http:     {len(latencies) / seconds:>9.0f} votes/s ({len(latencies)} votes, '
+              f'p50 {latencies[len(latencies) // 2] * 1000:.2f}ms, p95 {latencies[int(len(latencies) * 0.95)] * 1000:.2f}ms)')
+        ok &= check_counts('http', server.feedback, target_date, accepted)
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+'''
+Compares the full forecast parse (response.json() followed by
+weather_data.get_relevant_weather_information()) with the streaming,
+field-selective parse in weatherapi.forecast_stream.
+
+For each days= horizon it reports the parse time and the peak memory allocated
+while parsing, measured with tracemalloc.
+
+Usage:
+    python -m benchmarks.forecast_parse_benchmark [--days 2 7 14] [--repeat 20]
+'''
+import argparse
+import io
+import json
+import time
+import tracemalloc
+from benchmarks import sample_forecasts
+from weatherapi import weather_data
+from weatherapi import forecast_stream
+
+def full_parse(body):
+    '''
+    The current path: load the whole payload, then pick out the relevant hours.
+    '''
+    return weather_data.get_relevant_weather_information(json.loads(body))
+
+def stream_parse(body):
+    '''
+    The streaming path: only the relevant hours and the first alert are built.
+    '''
+    return forecast_stream.parse_relevant_weather_information(io.BytesIO(body))
+
+def measure(parse, body, repeat):
+    '''
+    Returns the best parse time in milliseconds and the peak traced memory in KiB.
+    '''
+    best_seconds = float('inf')
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        parse(body)
+        best_seconds = min(best_seconds, time.perf_counter() - start_time)
+
+    tracemalloc.start()
+    parse(body)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best_seconds * 1000, peak_bytes / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, nargs='+', default=[2, 7, 14])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f'{"days":>4} {"body KiB":>9} {"path":>7} {"time ms":>9} {"peak KiB":>9}')
+    for days in args.days:
+        body = sample_forecasts.make_forecast_bytes(days=days)
+        # Both paths must produce the same relevant weather information
+        assert list(full_parse(body)['hourly'].records()) == list(stream_parse(body)['hourly'].records())
+        for name, parse in (('full', full_parse), ('stream', stream_parse)):
+            parse_ms, peak_kib = measure(parse, body, args.repeat)
+            print(f'{days:>4} {len(body) / 1024:>9.1f} {name:>7} {parse_ms:>9.2f} {peak_kib:>9.1f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+'''
+Load-tests the prediction server.
+
+A temporary prediction store is filled with a season of nightly predictions for
+the default district, the server is started on a free port, and client threads
+send keep-alive requests as fast as they can. Each scenario reports requests per
+second and the latency percentiles:
+- identity: full /api/history bodies without compression,
+- gzip (and br, if brotli is installed): the precompressed bodies,
+- 304: revalidations with the ETag from the first response,
+- uncached: full bodies rebuilt from SQLite on every request, for comparison.
+
+The clients run in the same process as the server, so the numbers are a lower bound.
+
+Usage:
+    python -m benchmarks.prediction_server_benchmark [--clients 8] [--requests 2000] [--path /api/history]
+'''
+import argparse
+import http.client
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from general_functions import metrics
+from general_functions import prediction_server
+from general_functions import prediction_store
+from settings import settings
+
+SEASON_DAYS = 150
+
+def fill_store():
+    '''
+    Appends a season of predictions (two runs a night) for the default district,
+    ending on the school day the server serves.
+    '''
+    first_day = date.fromisoformat(prediction_store.get_school_day()) - timedelta(days=SEASON_DAYS - 1)
+    prediction = {'probability': 40.0, 'rationale': 'Light snow overnight, roads should be clear by 6 AM.',
+                  'source': 'assistant', 'model': settings.ENGINE_NAME, 'latency_seconds': 12.5,
+                  'message': 'There is a 40% chance of a snow day tomorrow. ' * 10}
+    with prediction_store.open_store() as connection:
+        connection.executemany(
+            """
+            INSERT INTO predictions (district, target_date, created_at, probability, rationale, message,
+                                     source, model, latency_seconds, features)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, '{}')
+            """,
+            [(settings.DISTRICT_ID, (first_day + timedelta(days=day)).isoformat(), time.time() + run,
+              prediction['probability'], prediction['rationale'], prediction['message'], prediction['source'],
+              prediction['model'], prediction['latency_seconds'])
+             for day in range(SEASON_DAYS) for run in range(2)]
+        )
+
+class UncachedResponses(prediction_server.ResponseCache):
+    '''
+    Rebuilds every response, like a server without the in-memory cache would.
+    '''
+    def get(self, path, district_id, days):
+        return prediction_server.make_entry(*prediction_server.ROUTES[path](district_id, days,
+                                                                            prediction_store.get_school_day()))
+
+def run_clients(address, path, headers, clients, requests):
+    '''
+    Sends the requests from the client threads over keep-alive connections.
+
+    Returns:
+        tuple: The wall seconds, the per-request latencies and the status codes seen.
+    '''
+    latencies = []
+    statuses = set()
+    lock = threading.Lock()
+
+    def client(count):
+        connection = http.client.HTTPConnection(*address)
+        own_latencies = []
+        for _ in range(count):
+            start_time = time.perf_counter()
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            own_latencies.append(time.perf_counter() - start_time)
+            with lock:
+                statuses.add(response.status)
+        connection.close()
+        with lock:
+            latencies.extend(own_latencies)
+
+    threads = [threading.Thread(target=client, args=(requests // clients,)) for _ in range(clients)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start_time, latencies, statuses
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000, help='requests per scenario')
+    parser.add_argument('--path', default='/api/history')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_directory:
+        settings.PREDICTION_STORE_PATH = os.path.join(work_directory, 'predictions.sqlite3')
+        settings.FEEDBACK_STORE_PATH = os.path.join(work_directory, 'feedback.sqlite3')
+        fill_store()
+
+        server = prediction_server.make_server('127.0.0.1', 0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        address = server.server_address[:2]
+        connection = http.client.HTTPConnection(*address)
+        connection.request('GET', args.path, headers={'Accept-Encoding': 'identity'})
+        response = connection.getresponse()
+        body = response.read()
+        etag = response.getheader('ETag')
+        connection.close()
+        entry = server.cache.get(args.path, settings.DISTRICT_ID, settings.SERVER_HISTORY_DAYS)
+        print(f'{args.path}: {len(body)} bytes, ' + ', '.join(
+            f'{encoding} {len(data)} bytes' for encoding, data in entry['bodies'].items() if encoding))
+
+        scenarios = [('identity', {'Accept-Encoding': 'identity'}), ('gzip', {'Accept-Encoding': 'gzip'})]
+        if prediction_server.brotli is not None:
+            scenarios.append(('br', {'Accept-Encoding': 'br, gzip'}))
+        scenarios.append(('304', {'Accept-Encoding': 'identity', 'If-None-Match': etag}))
+
+        print(f'\n{"scenario":<10} {"req/s":>9} {"p50 ms":>8} {"p95 ms":>8}  statuses')
+        try:
+            for label, headers in scenarios + [('uncached', {'Accept-Encoding': 'identity'})]:
+                if label == 'uncached':
+                    server.cache = UncachedResponses()
+                seconds, latencies, statuses = run_clients(address, args.path, headers, args.clients, args.requests)
+                print(f'{label:<10} {len(latencies) / seconds:>9.0f} '
+                      f'{metrics.percentile(latencies, 0.5) * 1000:>8.2f} '
+                      f'{metrics.percentile(latencies, 0.95) * 1000:>8.2f}  {sorted(statuses)}')
+        finally:
+            server.shutdown()
+            server.server_close()
+            server.feedback.close()
+
+if __name__ == '__main__':
+    main()
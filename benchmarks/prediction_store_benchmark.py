@@ -0,0 +1,89 @@
+'''
+Measures range queries over the prediction store.
+
+A temporary store is filled with several seasons of nightly predictions (with
+re-runs) for a number of districts, then a whole season for one district and
+the newest prediction are queried.
+
+Usage:
+    python -m benchmarks.prediction_store_benchmark [--districts 50] [--seasons 5] [--runs-per-night 2]
+'''
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+from benchmarks import sample_forecasts
+from general_functions import prediction_store
+from settings import settings
+from weatherapi import weather_data
+
+SEASON_DAYS = 150
+
+def fill_store(districts, seasons, runs_per_night):
+    '''
+    Appends the synthetic history and returns the first target date of the last season.
+    '''
+    features = weather_data.get_prediction_features(
+        weather_data.get_relevant_weather_information(sample_forecasts.make_forecast()))
+    prediction = {'probability': 40.0, 'rationale': 'Light snow overnight.', 'source': 'assistant',
+                  'model': settings.ENGINE_NAME, 'latency_seconds': 12.5,
+                  'message': 'There is a 40% chance of a snow day tomorrow. ' * 10}
+    features_json = json.dumps(features)
+    first_date = date(2024 - seasons, 11, 1)
+    rows = []
+    for season in range(seasons):
+        season_start = date(first_date.year + season, 11, 1)
+        for day in range(SEASON_DAYS):
+            target_date = (season_start + timedelta(days=day)).isoformat()
+            for district in range(districts):
+                for _ in range(runs_per_night):
+                    rows.append((f'district{district}', target_date))
+
+    start_time = time.perf_counter()
+    with prediction_store.open_store() as connection:
+        connection.executemany(
+            """
+            INSERT INTO predictions (district, target_date, created_at, probability, rationale, message,
+                                     source, model, latency_seconds, features)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [(district, target_date, index, prediction['probability'], prediction['rationale'],
+              prediction['message'], prediction['source'], prediction['model'], prediction['latency_seconds'],
+              features_json)
+             for index, (district, target_date) in enumerate(rows)]
+        )
+    print(f'Stored {len(rows)} predictions in {time.perf_counter() - start_time:.2f}s')
+    return date(first_date.year + seasons - 1, 11, 1)
+
+def time_call(label, func, repeat=20):
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed_ms = (time.perf_counter() - start_time) / repeat * 1000
+    count = len(result) if isinstance(result, list) else 1
+    print(f'{label:<40} {elapsed_ms:>8.2f} ms ({count} rows)')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--districts', type=int, default=50)
+    parser.add_argument('--seasons', type=int, default=5)
+    parser.add_argument('--runs-per-night', type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_directory:
+        settings.PREDICTION_STORE_PATH = os.path.join(work_directory, 'predictions.sqlite3')
+        season_start = fill_store(args.districts, args.seasons, args.runs_per_night)
+        season_end = (season_start + timedelta(days=SEASON_DAYS - 1)).isoformat()
+        season_start = season_start.isoformat()
+
+        time_call('season, newest run per night', lambda: prediction_store.get_predictions(
+            'district7', season_start, season_end))
+        time_call('season, every run', lambda: prediction_store.get_predictions(
+            'district7', season_start, season_end, latest_only=False))
+        time_call('newest prediction', lambda: prediction_store.get_latest_prediction('district7'))
+        print(f'Store size: {os.path.getsize(settings.PREDICTION_STORE_PATH) / 1024 / 1024:.1f} MiB')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+'''
+Compares the size of the snow day prompt in the old verbose encoding and the
+current compact tabular encoding.
+
+Recorded forecasts can be passed in as forecast.json files (the entries in
+cache/forecasts are raw forecast.json bodies). Without any files, synthetic
+snowy and clear nights are used. Tokens are counted with tiktoken when it is
+installed; otherwise a word/punctuation approximation is used and marked with "~".
+
+Usage:
+    python -m benchmarks.prompt_token_benchmark [cache/forecasts/*.cache ...]
+'''
+import argparse
+import json
+import re
+from benchmarks import sample_forecasts
+from general_functions import districts
+from openai_actions import open_ai_data
+from settings import settings
+from weatherapi import weather_data
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# The fields and labels the verbose encoding wrote for every hour
+LEGACY_FIELDS = (
+    ('Temp', 'temp_f', '°F'), ('Chance of Snow', 'chance_of_snow', '%'), ('Chance of Rain', 'chance_of_rain', '%'),
+    ('Wind Speed', 'wind_mph', 'MPH'), ('Visibility', 'visibility_miles', ' miles'), ('Snowfall', 'snow_cm', 'cm'),
+    ('Humidity', 'humidity', '%'), ('Cloud Cover', 'cloud', '%'), ('Pressure', 'pressure_in', 'in'),
+    ('Feels Like', 'feelslike_f', '°F'), ('Wind Chill', 'windchill_f', '°F'), ('Gusts', 'gust_mph', 'MPH'),
+    ('UV Index', 'uv', ''),
+)
+
+LEGACY_TEMPLATE = '''
+        -----------------------------------------------------------------
+        Here is the information about the school and weather:
+
+        - Current date and time: 2024-01-09 19:00:00.000000-05:00
+        - School name: {school_name}.
+        - The school is located in the state of {state} - this is important
+        - The school is located in the town or city of {city}
+        - The school is located in {county} county
+        - Current month: 1 (of 12) - take notice here of the month and state to understand the weather more
+        - School starts at {start_time} tomorrow
+        - School zip code is {zip_code}
+
+        -----------------------------------------------------------------
+
+        Here are the hourly weather conditions from 7 PM to 8 AM. The hours are in military time.
+        {hourly_summary}
+
+        -----------------------------------------------------------------
+
+        Current weather alerts (if applicable). ENSURE THE ALERT IS FOR THE COUNTY THE SCHOOL IS LISTED IN:
+        - Event: {event}
+        - Description: {desc}
+        - Severity: {severity}
+        - Certainty: {certainty}
+        - Urgency: {urgency}
+
+        -----------------------------------------------------------------
+
+        Attached is a file which explains what constitues a snow day at the school.
+        '''
+
+def create_legacy_prompt(weather_info, district):
+    '''
+    Rebuilds the prompt the way it was encoded before the compact table.
+    '''
+    hourly_summary = []
+    for hour, condition, values in weather_info['hourly'].records():
+        fragments = [f'Hour {hour}:', f'Condition: {condition},']
+        fragments.extend(f'{label}: {values[field]:g}{unit},' for label, field, unit in LEGACY_FIELDS)
+        hourly_summary.append(' '.join(fragments).rstrip(','))
+
+    message = LEGACY_TEMPLATE.format(
+        school_name=district['school_name'], state=district['school_district_state'],
+        city=district['school_district_town_or_city'], county=district['school_district_county'],
+        start_time=district['school_start_time'], zip_code=district['zip_code'],
+        hourly_summary=' '.join(hourly_summary),
+        event=weather_info.get('weather_alert_event', 'No data'),
+        desc=weather_info.get('weather_alert_desc', 'No data'),
+        severity=weather_info.get('weather_alert_severity', 'No data'),
+        certainty=weather_info.get('weather_alert_certainty', 'No data'),
+        urgency=weather_info.get('weather_alert_urgency', 'No data'),
+    )
+    return message.replace('\n', '\\n').strip()
+
+def count_tokens(text):
+    '''
+    Returns the token count of a prompt and whether it is exact.
+    '''
+    if tiktoken:
+        try:
+            encoding = tiktoken.encoding_for_model(settings.ENGINE_NAME)
+        except KeyError:
+            encoding = tiktoken.get_encoding('cl100k_base')
+        return len(encoding.encode(text)), True
+    return len(re.findall(r'\w+|[^\w\s]', text)), False
+
+def load_forecasts(paths):
+    '''
+    Yields (name, forecast) pairs from the given files, or synthetic samples without files.
+    '''
+    if not paths:
+        yield 'synthetic snowy night', sample_forecasts.make_forecast(snowy=True, alerts=1)
+        yield 'synthetic clear night', sample_forecasts.make_forecast(snowy=False, alerts=0)
+        return
+
+    for path in paths:
+        with open(path, 'rb') as forecast_file:
+            yield path, json.load(forecast_file)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('forecasts', nargs='*', help='recorded forecast.json files')
+    args = parser.parse_args()
+
+    district = districts.get_default_district()
+    print(f'{"forecast":<40} {"old chars":>9} {"new chars":>9} {"old tok":>8} {"new tok":>8} {"saved":>6}')
+    for name, forecast in load_forecasts(args.forecasts):
+        weather_info = weather_data.get_relevant_weather_information(forecast)
+        old_prompt = create_legacy_prompt(weather_info, district)
+        # The response format instructions are new, so they are left out of the comparison
+        new_prompt = open_ai_data.create_open_ai_snow_day_message(weather_info, district).replace(
+            open_ai_data.PREDICTION_RESPONSE_FORMAT, '').rstrip()
+        old_tokens, exact = count_tokens(old_prompt)
+        new_tokens, _ = count_tokens(new_prompt)
+        marker = '' if exact else '~'
+        print(f'{name[-40:]:<40} {len(old_prompt):>9} {len(new_prompt):>9} '
+              f'{marker}{old_tokens:>7} {marker}{new_tokens:>7} {1 - new_tokens / old_tokens:>6.0%}')
+
+if __name__ == '__main__':
+    main()
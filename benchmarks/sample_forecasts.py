@@ -0,0 +1,101 @@
+'''
+This file builds synthetic WeatherAPI forecast.json payloads for the benchmarks.
+The payloads have the same shape and roughly the same size as real responses
+(location, current conditions, day/astro blocks and 24 full hour blocks per day).
+'''
+import json
+import random
+from datetime import date, timedelta
+
+CONDITIONS = ['Clear', 'Partly cloudy', 'Overcast', 'Light snow', 'Moderate snow', 'Heavy snow', 'Light rain']
+
+def make_hour(rng, day, hour_of_day, snowy):
+    '''
+    Builds one hour block.
+    '''
+    temp_f = round(rng.uniform(10, 30) if snowy else rng.uniform(25, 50), 1)
+    chance_of_snow = rng.choice([40, 70, 90, 100]) if snowy else 0
+    hour = {
+        'time_epoch': 0,
+        'time': f'{day.isoformat()} {hour_of_day:02d}:00',
+        'temp_c': round((temp_f - 32) / 1.8, 1),
+        'temp_f': temp_f,
+        'is_day': int(7 <= hour_of_day < 18),
+        'condition': {'text': rng.choice(CONDITIONS[3:6] if snowy else CONDITIONS[:3]),
+                      'icon': '//cdn.weatherapi.com/weather/64x64/night/338.png', 'code': 1225},
+        'wind_mph': round(rng.uniform(0, 25), 1),
+        'wind_kph': 0.0,
+        'wind_degree': rng.randint(0, 359),
+        'wind_dir': 'NNW',
+        'pressure_mb': 1012.0,
+        'pressure_in': round(rng.uniform(29.6, 30.4), 2),
+        'precip_mm': 0.0,
+        'precip_in': 0.0,
+        'humidity': rng.randint(40, 100),
+        'cloud': rng.randint(0, 100),
+        'feelslike_c': 0.0,
+        'feelslike_f': round(temp_f - rng.uniform(0, 12), 1),
+        'windchill_c': 0.0,
+        'windchill_f': round(temp_f - rng.uniform(0, 15), 1),
+        'heatindex_c': 0.0,
+        'heatindex_f': temp_f,
+        'dewpoint_c': 0.0,
+        'dewpoint_f': round(temp_f - rng.uniform(0, 8), 1),
+        'will_it_rain': 0,
+        'chance_of_rain': 0 if snowy else rng.choice([0, 10, 60]),
+        'will_it_snow': int(snowy),
+        'chance_of_snow': chance_of_snow,
+        'vis_km': 10.0,
+        'vis_miles': round(rng.uniform(0.25, 2) if snowy else 6.0, 2),
+        'gust_mph': round(rng.uniform(5, 40), 1),
+        'gust_kph': 0.0,
+        'uv': 1.0,
+    }
+    if snowy:
+        hour['snow_cm'] = round(rng.uniform(0, 2.5), 2)
+    return hour
+
+def make_forecast(days=2, snowy=True, alerts=1, seed=0, start_date=None):
+    '''
+    Builds a whole forecast.json payload as a dictionary.
+    '''
+    rng = random.Random(seed)
+    start_date = start_date or date(2024, 1, 9)
+    forecast_days = []
+    for day_offset in range(days):
+        day = start_date + timedelta(days=day_offset)
+        forecast_days.append({
+            'date': day.isoformat(),
+            'date_epoch': 0,
+            'day': {'maxtemp_f': 30.0, 'mintemp_f': 15.0, 'avgtemp_f': 22.0, 'maxwind_mph': 20.0,
+                    'totalprecip_in': 0.3, 'totalsnow_cm': 8.0, 'avgvis_miles': 3.0, 'avghumidity': 85,
+                    'daily_will_it_rain': 0, 'daily_chance_of_rain': 0, 'daily_will_it_snow': 1,
+                    'daily_chance_of_snow': 90, 'condition': {'text': 'Heavy snow', 'icon': '', 'code': 1225},
+                    'uv': 1.0},
+            'astro': {'sunrise': '08:03 AM', 'sunset': '05:24 PM', 'moonrise': '07:10 AM',
+                      'moonset': '04:55 PM', 'moon_phase': 'New Moon', 'moon_illumination': 1},
+            'hour': [make_hour(rng, day, hour_of_day, snowy) for hour_of_day in range(24)],
+        })
+
+    alert_list = [{
+        'headline': 'Winter Storm Warning issued by NWS Grand Rapids',
+        'msgtype': 'Alert', 'severity': 'Moderate', 'urgency': 'Expected', 'areas': 'Kent; Ottawa; Allegan',
+        'category': 'Met', 'certainty': 'Likely', 'event': 'Winter Storm Warning', 'note': '',
+        'effective': '2024-01-09T15:00:00-05:00', 'expires': '2024-01-10T19:00:00-05:00',
+        'desc': '* WHAT...Heavy snow expected. Total snow accumulations of 6 to 10 inches. ' * 4,
+        'instruction': 'If you must travel, keep an extra flashlight, food, and water in your vehicle.',
+    } for _ in range(alerts)]
+
+    return {
+        'location': {'name': 'Rockford', 'region': 'Michigan', 'country': 'USA', 'lat': 43.12,
+                     'lon': -85.56, 'tz_id': 'America/Detroit', 'localtime': f'{start_date} 19:00'},
+        'current': {'temp_f': 25.0, 'condition': {'text': 'Light snow', 'icon': '', 'code': 1213}},
+        'forecast': {'forecastday': forecast_days},
+        'alerts': {'alert': alert_list},
+    }
+
+def make_forecast_bytes(days=2, snowy=True, alerts=1, seed=0):
+    '''
+    Builds a whole forecast.json payload as the raw response body.
+    '''
+    return json.dumps(make_forecast(days, snowy, alerts, seed)).encode('utf-8')
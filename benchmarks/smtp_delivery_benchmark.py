@@ -0,0 +1,55 @@
+'''
+Measures email delivery throughput (messages/second) against the local SMTP sink.
+
+The sink adds a fixed latency per message to stand in for a real mail server,
+and the same recipient list is sent with different SMTP pool sizes.
+
+Usage:
+    python -m benchmarks.smtp_delivery_benchmark [--recipients 500] [--latency 0.005] [--pool-sizes 1 4 8]
+'''
+import argparse
+import os
+import time
+from benchmarks.smtp_sink import SmtpSink
+from email_functions import email_delivery
+from settings import settings
+
+def make_recipients(count):
+    '''
+    Builds a recipient dictionary of email address -> first name.
+    '''
+    return {f'parent{index}@example.com': f'Parent{index}' for index in range(count)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--recipients', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.005, help='seconds the sink takes per message')
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--pool-sizes', type=int, nargs='+', default=[1, 4, 8])
+    args = parser.parse_args()
+
+    os.environ.setdefault('SENDER_EMAIL', 'blizzard@example.com')
+    os.environ.pop('SENDER_EMAIL_PASSWORD', None)
+    settings.SMTP_USE_TLS = False
+    settings.SMTP_AUTH_ENABLED = False
+    settings.SMTP_RETRY_DELAY_SECONDS = 0.01
+    recipients = make_recipients(args.recipients)
+
+    print(f'{"pool":>5} {"sent":>7} {"failed":>7} {"sessions":>9} {"seconds":>8} {"msg/s":>8}')
+    for pool_size in args.pool_sizes:
+        sink = SmtpSink(latency_seconds=args.latency, failure_rate=args.failure_rate).start()
+        settings.SMTP_SERVER, settings.SMTP_PORT = sink.host, sink.port
+        settings.SMTP_POOL_SIZE = pool_size
+        try:
+            start_time = time.perf_counter()
+            results = email_delivery.send_email_to_user(recipients, 'There is a 90% chance of a snow day!')
+            elapsed_seconds = time.perf_counter() - start_time
+        finally:
+            sink.stop()
+
+        sent = sum(1 for result in results.values() if result['delivered'])
+        print(f'{pool_size:>5} {sent:>7} {len(results) - sent:>7} {sink.stats["connections"]:>9} '
+              f'{elapsed_seconds:>8.2f} {sent / elapsed_seconds:>8.1f}')
+
+if __name__ == '__main__':
+    main()
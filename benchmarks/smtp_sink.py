@@ -0,0 +1,98 @@
+'''
+A local SMTP sink for tests and benchmarks.
+It speaks just enough SMTP for smtplib (EHLO/HELO, AUTH, MAIL, RCPT, DATA,
+RSET, NOOP, QUIT), accepts every message and only counts what it receives.
+A per-message latency and a failure rate can be injected to mimic a slow or
+flaky mail server.
+
+Usage:
+    sink = SmtpSink(latency_seconds=0.01)
+    sink.start()
+    ... point settings.SMTP_SERVER / SMTP_PORT at sink.host / sink.port
+    ... with settings.SMTP_USE_TLS = False
+    sink.stop()
+'''
+import random
+import socketserver
+import threading
+import time
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    '''
+    Handles one SMTP client connection.
+    '''
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode('ascii'))
+
+    def handle(self):
+        sink = self.server.sink
+        with sink.lock:
+            sink.stats['connections'] += 1
+        self.reply('220 localhost SMTP sink ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+
+            if verb == 'EHLO':
+                self.reply('250-localhost')
+                self.reply('250-AUTH PLAIN LOGIN')
+                self.reply('250 8BITMIME')
+            elif verb == 'AUTH':
+                self.reply('235 2.7.0 Authentication successful')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                message_bytes = 0
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line == b'.\r\n':
+                        break
+                    message_bytes += len(data_line)
+                if sink.latency_seconds:
+                    time.sleep(sink.latency_seconds)
+                if sink.failure_rate and sink.random.random() < sink.failure_rate:
+                    with sink.lock:
+                        sink.stats['failed'] += 1
+                    self.reply('451 4.3.0 Injected temporary failure')
+                    continue
+                with sink.lock:
+                    sink.stats['messages'] += 1
+                    sink.stats['bytes'] += message_bytes
+                self.reply('250 2.0.0 OK queued')
+            elif verb == 'QUIT':
+                self.reply('221 2.0.0 Bye')
+                return
+            elif verb in ('HELO', 'MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self.reply('250 2.0.0 OK')
+            else:
+                self.reply('502 5.5.2 Command not implemented')
+
+class _ThreadingTcpServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class SmtpSink:
+    '''
+    A threaded SMTP server that accepts and counts messages.
+    '''
+    def __init__(self, host='127.0.0.1', port=0, latency_seconds=0.0, failure_rate=0.0, seed=0):
+        self.latency_seconds = latency_seconds
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'connections': 0, 'messages': 0, 'failed': 0, 'bytes': 0}
+        self._server = _ThreadingTcpServer((host, port), _SmtpHandler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
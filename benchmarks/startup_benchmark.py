@@ -0,0 +1,90 @@
+'''
+Measures the cold start of the entry point modules with python -X importtime.
+
+Every run of the workflow is a cold start, so each module is imported in a fresh
+Python process a few times and the median import time is reported along with the
+slowest imports underneath it. The heavy client libraries (openai, requests, the
+Google clients) and the parsing libraries (ijson, pytz) are only imported once
+they are used, so importing an entry point must not load any of them.
+
+The benchmark exits with status 1 when an entry point imports one of the heavy
+libraries or its median import time is over the budget, so it can be run as a
+check after changing imports.
+
+Usage:
+    python -m benchmarks.startup_benchmark [--modules main general_functions.batch_runner]
+        [--runs 5] [--budget-ms 500] [--top 10]
+'''
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that must not be imported until they are used
+HEAVY_MODULES = ('openai', 'httpx', 'requests', 'google.auth', 'google.oauth2', 'googleapiclient',
+                 'apiclient', 'oauth2client', 'httplib2', 'ijson', 'pytz')
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+def import_times(module):
+    '''
+    Imports a module in a fresh process with -X importtime.
+
+    Returns:
+        list of tuple: (module name, cumulative microseconds, nesting depth) for every import.
+    '''
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT_DIRECTORY, capture_output=True, text=True, check=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            imports.append((match.group(4), int(match.group(2)), len(match.group(3)) // 2))
+    return imports
+
+def heavy_imports(imports):
+    '''
+    Returns the heavy libraries among the imported modules.
+    '''
+    return sorted({heavy for name, _, _ in imports
+                   for heavy in HEAVY_MODULES if name == heavy or name.startswith(f'{heavy}.')})
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modules', nargs='*', default=['main', 'general_functions.batch_runner',
+                                                         'general_functions.pipeline', 'general_functions.backtest'])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=500, help='largest allowed median import time')
+    parser.add_argument('--top', type=int, default=10, help='slowest imports to show')
+    args = parser.parse_args()
+
+    failures = []
+    for module in args.modules:
+        runs = [import_times(module) for _ in range(args.runs)]
+        # The entry point's own cumulative time covers everything it imported
+        totals = [next(total for name, total, _ in imports if name == module) / 1000 for imports in runs]
+        median_ms = statistics.median(totals)
+        print(f'\n{module}: median {median_ms:.0f}ms (min {min(totals):.0f}ms, max {max(totals):.0f}ms, '
+              f'{len(runs[-1])} modules)')
+        for name, total, depth in sorted(runs[-1], key=lambda entry: -entry[1])[1:args.top + 1]:
+            print(f'  {total / 1000:>8.1f}ms  {"  " * depth}{name}')
+
+        heavy = heavy_imports(runs[-1])
+        if heavy:
+            failures.append(f'{module} imports {", ".join(heavy)} at startup')
+        if median_ms > args.budget_ms:
+            failures.append(f'{module} takes {median_ms:.0f}ms to import (budget {args.budget_ms:.0f}ms)')
+
+    if failures:
+        print('\nStartup regressions:')
+        for failure in failures:
+            print(f'  {failure}')
+        sys.exit(1)
+    print('\nNo heavy imports at startup.')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+'''
+Times the overnight watch cycles against local fakes of WeatherAPI, OpenAI,
+Google Forms and SMTP.
+
+The watch runs back to back (no wait between checks) in a temporary directory:
+the first check has no stored prediction yet, so it predicts and emails; the
+next checks see the same forecast and must stop after the fetch and the
+comparison; then the fake forecast turns dry and the last check predicts again
+and sends the follow-up. Each check is a 'watch_cycle' metrics span.
+
+The benchmark exits with status 1 when an unchanged check is slower than the
+budget (a second by default).
+
+Usage:
+    python -m benchmarks.watch_cycle_benchmark [--cycles 20] [--recipients 100]
+        [--weather-latency 0.05] [--assistant-seconds 1] [--budget-ms 1000]
+'''
+import argparse
+import statistics
+import sys
+import tempfile
+from benchmarks.end_to_end_benchmark import configure_child
+from benchmarks.fake_services import FakeGoogleForms, FakeOpenAi, FakeWeatherApi
+from benchmarks.smtp_sink import SmtpSink
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cycles', type=int, default=20, help='checks with an unchanged forecast')
+    parser.add_argument('--recipients', type=int, default=100)
+    parser.add_argument('--weather-latency', type=float, default=0.05)
+    parser.add_argument('--assistant-seconds', type=float, default=1.0, help='how long each assistant run takes')
+    parser.add_argument('--budget-ms', type=float, default=1000, help='slowest allowed unchanged check')
+    args = parser.parse_args()
+
+    weather = FakeWeatherApi(latency_seconds=args.weather_latency).start()
+    openai_service = FakeOpenAi(run_seconds=args.assistant_seconds).start()
+    forms = FakeGoogleForms().start()
+    sink = SmtpSink().start()
+    try:
+        with tempfile.TemporaryDirectory() as work_directory:
+            configure_child({'openai_url': openai_service.url, 'weather_url': weather.url, 'forms_url': forms.url,
+                             'smtp_host': sink.host, 'smtp_port': sink.port, 'recipients': args.recipients,
+                             'batch_recipients': 0, 'districts': 0}, work_directory)
+            from google_functions import google_forms
+            from general_functions import metrics, overnight_watch
+            from settings import settings
+
+            google_forms.GOOGLE_FORMS_API_BASE_URL = f'{forms.url}/v1/forms'
+            overnight_watch.run_watch(interval_seconds=0, max_cycles=args.cycles + 1)
+            weather.snowy = False
+            weather._bodies.clear()
+            overnight_watch.run_watch(interval_seconds=0, max_cycles=1)
+            cycles = [span for span in metrics.load_spans(settings.METRICS_PATH) if span['stage'] == 'watch_cycle']
+    finally:
+        for service in (weather, openai_service, forms, sink):
+            service.stop()
+
+    unchanged_ms = [span['seconds'] * 1000 for span in cycles if not span['changed']]
+    print(f'\n{"check":<10} {"ms":>9}  changed  delivered')
+    for number, span in enumerate(cycles, 1):
+        print(f'{number:<10} {span["seconds"] * 1000:>9.1f}  {str(span["changed"]):<7}  {span.get("delivered", "")}')
+    print(f'\nUnchanged checks: median {statistics.median(unchanged_ms):.1f}ms, '
+          f'slowest {max(unchanged_ms):.1f}ms ({len(unchanged_ms)} checks)')
+    print(f'Messages at the SMTP sink: {sink.stats["messages"]}, OpenAI requests: {openai_service.stats["requests"]}')
+    if max(unchanged_ms) > args.budget_ms:
+        print(f'An unchanged check took over the {args.budget_ms:.0f}ms budget')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,9 @@ Email Communication Module
 
 This module provides functionalities related to sending emails to users.
 It encapsulates the SMTP logic and provides a cleaner interface for email communication.
+Messages are sent by a thread pool that shares a bounded pool of authenticated
+SMTP sessions, so large recipient lists are delivered over several connections
+at once.
 
 Dependencies:
 - email.mime.text: To construct MIME text messages.
@@ -10,6 +13,8 @@ Dependencies:
 - time: To introduce delays for retries.
 - socket: To handle socket-related errors.
 - logging: To log application events and errors.
+- concurrent.futures: To send to many recipients concurrently.
+- email_functions.smtp_pool: To share SMTP sessions between the worker threads.
 - settings.settings: To access application-specific settings.
 """
 
@@ -19,66 +24,138 @@ import smtplib
 import time
 import socket
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from email_functions.smtp_pool import SmtpConnectionPool
 from settings import settings
 
-def send_email_to_user(email_addresses, message):
+# Errors that mean this recipient will never accept the message, so retrying is pointless
+PERMANENT_SMTP_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)
+
+def send_email_to_user(email_addresses, message, pool=None):
     '''
-    this function sends an email to the specified user
+    This function sends an email to each of the specified users.
+
+    An already logged in pool from open_smtp_pool() can be passed in; it is closed
+    once the emails are sent. Otherwise a new pool is opened here.
+
+    Returns:
+        dict: The delivery result for every email address, with the keys 'delivered',
+        'attempts' and 'error' (None when the message was delivered).
     '''
     logging.info('Sending our snowday prediction to %s people', len(email_addresses))
+    if not email_addresses:
+        if pool:
+            pool.close()
+        return {}
+
+    username = os.environ.get('SENDER_EMAIL')
+    start_time = time.perf_counter()
+    if pool is None:
+        try:
+            pool = open_smtp_pool(username)
+        except smtplib.SMTPException as _e:
+            logging.error('An SMTP error occurred: %s', {_e})
+            return {email: {'delivered': False, 'attempts': 0, 'error': str(_e)} for email in email_addresses}
+        except OSError as _e:
+            # Refused connections, timeouts and failed DNS lookups
+            logging.error('A socket error occurred: %s', {_e})
+            return {email: {'delivered': False, 'attempts': 0, 'error': str(_e)} for email in email_addresses}
+
     try:
-        username = os.environ.get('SENDER_EMAIL')
-        smtp_connection = create_smtp_connection(username)
-        for email in email_addresses:
-            send_email(smtp_connection, message, email, email_addresses[email], username)
+        with ThreadPoolExecutor(max_workers=settings.SMTP_POOL_SIZE) as executor:
+            futures = {
+                email: executor.submit(send_email, pool, message, email, first_name, username)
+                for email, first_name in email_addresses.items()
+            }
+            results = {email: future.result() for email, future in futures.items()}
+    finally:
+        pool.close()
 
-        close_smtp_connection(smtp_connection)
-    except smtplib.SMTPException as _e:
-        logging.error('An SMTP error occurred: %s', {_e})
-    except socket.gaierror as _e:
-        logging.error('A socket error occurred: %s', {_e})
+    elapsed_seconds = time.perf_counter() - start_time
+    delivered = sum(1 for result in results.values() if result['delivered'])
+    logging.info('Delivered %s of %s messages in %.1f seconds (SMTP sessions: %s)',
+                 delivered, len(results), elapsed_seconds, pool.stats)
+    return results
 
-def send_email(smtp_connection, message, email, first_name, username, max_retries: int = 3):
+def create_message(message, email, first_name, username):
     '''
-    This function will loop through all of our email addresses, sending the prediction
-    to each one.
+    This function builds the MIME message for a single recipient.
     '''
-    recipient = f'{email}'
     message = f'{message}\n\n** If you would like to stop receiving emails from Blizzard, reply STOP to this email **'
     msg = MIMEText(message)
     msg['From'] = username
-    msg['To'] = recipient
+    msg['To'] = f'{email}'
     msg['Subject'] = f'{first_name}, your snow day prediction is here...'
-    retries = 0
-    while retries < max_retries:
+    return msg
+
+def send_email(pool, message, email, first_name, username, max_retries: int = 3):
+    '''
+    This function sends the prediction to one recipient over a pooled SMTP session.
+    '''
+    return deliver_message(pool, create_message(message, email, first_name, username), email, max_retries)
+
+def deliver_message(pool, msg, email, max_retries: int = 3):
+    '''
+    This function delivers an already built message over a pooled SMTP session.
+    Failed sends are retried with backoff, on a fresh session if the error broke
+    the old one. There is no wait after the last attempt.
+    '''
+    result = {'delivered': False, 'attempts': 0, 'error': None}
+    while result['attempts'] < max_retries:
+        result['attempts'] += 1
         try:
-            smtp_connection.send_message(msg)
-            status = smtp_connection.noop()[0]
-            if status == 250:
-                logging.info('Message delivered')
+            with pool.session() as session:
+                session.connection.send_message(msg)
+                session.messages_sent += 1
+            result['delivered'] = True
+            result['error'] = None
+            break
+        except PERMANENT_SMTP_ERRORS as _e:
+            result['error'] = str(_e)
+            break
+        except (smtplib.SMTPException, socket.error) as _e:
+            result['error'] = str(_e)
+            if result['attempts'] >= max_retries:
                 break
+            logging.warning('Error delivering message to %s. Retrying... (retry %s of %s) (%s)',
+                            email, result['attempts'], max_retries, str(_e))
+            time.sleep(settings.SMTP_RETRY_DELAY_SECONDS * 2 ** (result['attempts'] - 1))
 
-            retries += 1
-            logging.warning('Delivery failed. Retrying... (retry %s of %s)', retries, max_retries)
-        except smtplib.SMTPException as _e:
-            retries += 1
-            logging.warning('SMTPException occurred when delivering message. Retrying... (retry %s of %s) (%s)', retries, max_retries, str(_e))
-            time.sleep(2)  # delay before retrying
-    if retries == max_retries:
-        logging.error('Delivery failed for %s after %s retries', recipient, max_retries)
+    if not result['delivered']:
+        logging.error('Delivery failed for %s after %s attempts: %s', email, result['attempts'], result['error'])
+    return result
+
+def create_smtp_pool(username, size=None):
+    '''
+    This function creates the pool of smtp connections used to send emails.
+    '''
+    return SmtpConnectionPool(lambda: create_smtp_connection(username),
+                              size or settings.SMTP_POOL_SIZE,
+                              settings.SMTP_MAX_MESSAGES_PER_CONNECTION)
+
+def open_smtp_pool(username=None):
+    '''
+    This function creates the pool of smtp connections and logs in the first
+    session up front, so a bad login fails once, not once per recipient.
+    '''
+    pool = create_smtp_pool(username or os.environ.get('SENDER_EMAIL'))
+    pool.release(pool.acquire())
+    return pool
 
 def create_smtp_connection(username):
     '''
-    This function creates the smtp connection that is used to 
+    This function creates the smtp connection that is used to
     send an email to the user.
     '''
     # Here we are going to login to our mail server
     # In this particular case, it's a gmail server hooked to the bots email
     smtp_server = settings.SMTP_SERVER
     smtp_port = settings.SMTP_PORT
-    smtp_connection = smtplib.SMTP(smtp_server, smtp_port)
-    smtp_connection.starttls()
-    smtp_connection.login(username, os.environ.get('SENDER_EMAIL_PASSWORD'))
+    smtp_connection = smtplib.SMTP(smtp_server, smtp_port, timeout=settings.SMTP_TIMEOUT_SECONDS)
+    if settings.SMTP_USE_TLS:
+        smtp_connection.starttls()
+    if settings.SMTP_AUTH_ENABLED:
+        smtp_connection.login(username, os.environ.get('SENDER_EMAIL_PASSWORD'))
     return smtp_connection
 
 def close_smtp_connection(smtp_connection):
@@ -10,11 +10,12 @@ with special handling for testing scenarios.
 
 Functions:
     generate_email_content(message): Generates email content using OpenAI's GPT-4.
-    should_send_email(message): Determines if an email should be sent based on its content.
+    should_send_email(prediction): Determines if an email should be sent based on the
+    predicted probability.
     fetch_email_recipients(): Fetches email recipients from Google Forms or testing settings.
     fetch_email_recipients_for_testing(): Fetches email recipients specifically
     for testing purposes.
-    send_emails(recipients, message): Sends emails to the provided recipients.
+    send_emails(recipients, message, pool): Sends emails to the provided recipients.
 
 The module utilizes external modules such as 'os', 'json', 'logging', 
 and custom modules for OpenAI actions, 
@@ -26,11 +27,13 @@ scalability, while also encapsulating various aspects of email generation and de
 import os
 import json
 import logging
-import time
+import threading
 from openai_actions import open_ai_api_calls as openai_api
 from openai_actions import open_ai_data as openai_data
 from email_functions import email_delivery
+from email_functions import sms_delivery
 from google_functions import google_forms
+from general_functions import metrics
 from settings import settings
 
 def generate_email_content(message):
@@ -41,60 +44,81 @@ def generate_email_content(message):
         message (str): The base message for the email content.
     
     Returns:
-        str: The generated email content.
+        dict: The structured prediction with the keys 'probability', 'rationale'
+        and 'message' (the email content).
+
+    Raises:
+        ValueError: If there is no message, e.g. the prompt could not be built.
+        RuntimeError: If the assistant run ends in any status other than 'completed'.
     """
-    assistant = openai_api.get_assistant()
-    thread = openai_api.create_thread()
-    openai_api.add_message_to_thread(thread.id, message)
-    run = openai_api.run_assistant_on_thread(thread.id, assistant)
-    while True:
-        status = openai_api.check_run_status(thread.id, run.id)
-        if status == 'completed':
-            break
+    if not message:
+        logging.error('There is no message to send to Blizzard, not starting a run.')
+        raise ValueError('No message to generate the email content from')
+
+    with metrics.span('assistant_run', bytes_sent=len(message.encode('utf-8'))) as span:
+        assistant = openai_api.get_assistant()
+        thread = openai_api.create_thread()
+        openai_api.add_message_to_thread(thread.id, message)
         print('Waiting for Blizzard response...')
-        time.sleep(10)
-
-    response = openai_api.get_messages(thread.id)
-    prediction = response.data[0]
-    for content in prediction.content:
-        if not hasattr(content, 'type'):
-            continue
-
-        if content.type == 'text' and hasattr(content, 'text') and hasattr(content.text, 'value'):
-            prediction = content.text.value
-            break
-
-    print(f'\n\n\n{prediction}')
+        status, _ = openai_api.run_assistant_and_wait(thread.id, assistant)
+        span['run_status'] = status
+        if status != 'completed':
+            raise RuntimeError(f'The Blizzard run ended with status {status}')
+
+        response = openai_api.get_messages(thread.id)
+        response_text = ''
+        for content in response.data[0].content:
+            if not hasattr(content, 'type'):
+                continue
+
+            if content.type == 'text' and hasattr(content, 'text') and hasattr(content.text, 'value'):
+                response_text = content.text.value
+                break
+        span['bytes_received'] = len(response_text.encode('utf-8'))
+
+    prediction = openai_data.parse_snow_day_prediction(response_text)
+    print(f'\n\n\n{prediction["message"]}')
+    logging.info('Predicted a %s%% chance of a snow day: %s', prediction['probability'], prediction['rationale'])
 
     return prediction
 
-def should_send_email(message):
+def should_send_email(prediction, threshold=None):
     """
-    Determine if an email should be sent based on the provided message.
+    Determine if an email should be sent based on the predicted probability.
     
     Args:
-        message (str): The email content.
+        prediction (dict): The structured prediction from generate_email_content().
+        threshold (float, optional): The lowest probability (0 to 100) that sends emails.
+            Defaults to settings.SNOW_DAY_PROBABILITY_THRESHOLD.
     
     Returns:
         bool: True if the email should be sent, False otherwise.
     """
-    # Analyze the message to determine the likelihood of a snow day
-    analyze_message = openai_data.create_open_ai_prediction_check_message(message)
-    result = str(openai_api.generate_chat_response(analyze_message))
+    threshold = settings.SNOW_DAY_PROBABILITY_THRESHOLD if threshold is None else threshold
+    if prediction['probability'] is None:
+        logging.warning('The prediction has no probability, not sending emails.')
+        return False
 
-    return result.lower() == "true"
+    return prediction['probability'] >= threshold
 
-def fetch_email_recipients():
+def fetch_email_recipients(form_id=None):
     """
     Fetch email recipients based on the TESTING flag.
     
+    Args:
+        form_id (str, optional): The sign up form to read. Defaults to the
+            GOOGLE_SIGN_UP_FORM_ID environment variable.
+
     Returns:
         dict: A dictionary containing email addresses and associated names.
     """
-    if settings.TESTING_MODE:
-        return fetch_email_recipients_for_testing()
-
-    return google_forms.get_sign_up_responses()
+    with metrics.span('recipient_fetch', testing=settings.TESTING_MODE) as span:
+        if settings.TESTING_MODE:
+            recipients = fetch_email_recipients_for_testing()
+        else:
+            recipients = google_forms.get_sign_up_responses(form_id)
+        span['recipients'] = len(recipients) if recipients else 0
+    return recipients
 
 def fetch_email_recipients_for_testing():
     """
@@ -117,12 +141,49 @@ def fetch_email_recipients_for_testing():
 
     return personal_testing_emails
 
-def send_emails(recipients, message):
+def send_emails(recipients, message, pool=None):
     """
     Send emails to the provided recipients with the given message.
+
+    Recipients on a carrier SMS gateway get a compacted SMS-sized message through
+    the per-carrier queues, which run on a background thread while the regular
+    emails are sent, so a slow gateway never holds up email delivery.
     
     Args:
         recipients (dict): A dictionary containing email addresses and associated names.
         message (str): The content of the email.
+        pool (SmtpConnectionPool, optional): An already logged in pool for the regular
+            emails, from email_delivery.open_smtp_pool(). It is closed when done.
+
+    Returns:
+        dict: The delivery result for each email address.
     """
-    email_delivery.send_email_to_user(recipients, message)
+    with metrics.span('smtp_send', recipients=len(recipients)) as span:
+        email_recipients, sms_recipients = sms_delivery.split_recipients(recipients)
+        sms_results = {}
+        sms_errors = []
+
+        def deliver_sms():
+            try:
+                sms_results.update(sms_delivery.send_sms_to_users(sms_recipients, message))
+            except Exception as ex:
+                sms_errors.append(ex)
+
+        sms_thread = threading.Thread(target=deliver_sms, name='sms-delivery')
+        sms_thread.start()
+
+        results = email_delivery.send_email_to_user(email_recipients, message, pool)
+        sms_thread.join()
+        if sms_errors:
+            logging.error('SMS delivery failed: %s', sms_errors[0])
+        # Recipients the SMS thread never reported on count as failed, so they aren't lost
+        for carrier_recipients in sms_recipients.values():
+            for email in carrier_recipients:
+                if email not in sms_results:
+                    error = str(sms_errors[0]) if sms_errors else 'No SMS delivery result'
+                    sms_results[email] = {'delivered': False, 'attempts': 0, 'error': error}
+        results.update(sms_results)
+        span['sms_recipients'] = sum(len(carrier_recipients) for carrier_recipients in sms_recipients.values())
+        span['delivered'] = sum(1 for result in results.values() if result['delivered'])
+        span['failed'] = len(results) - span['delivered']
+    return results
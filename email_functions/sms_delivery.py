@@ -0,0 +1,217 @@
+"""
+SMS Gateway Delivery Module
+
+This module delivers predictions to recipients who signed up with a carrier's
+email-to-SMS gateway address (for example 5551234567@vtext.com). Those recipients
+are split out of the regular email list and routed into one queue per carrier.
+Each carrier queue has its own token-bucket rate limit, its own number of
+concurrent senders and its own SMTP sessions, so a slow or throttling gateway
+only holds up its own subscribers, never the regular emails or other carriers.
+
+The long-form prediction is compacted to SMS size once and the same short body
+is sent to every gateway recipient.
+
+Dependencies:
+- email.mime.text: To construct MIME text messages.
+- logging: To log application events and errors.
+- os: To read the sender email from the environment.
+- re: To compact the message text.
+- threading: For the token buckets and the stats lock.
+- time: To pace the senders and measure latency.
+- concurrent.futures: To run each carrier's senders.
+- email_functions.email_delivery: To create SMTP sessions and deliver messages.
+- settings.settings: To access application-specific settings.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.mime.text import MIMEText
+from email_functions import email_delivery
+from settings import settings
+
+_stats_lock = threading.Lock()
+carrier_stats = {}
+
+class TokenBucket:
+    """
+    A thread-safe token bucket. Tokens refill at `rate` per second up to `capacity`,
+    and every send takes one token, waiting for a refill if the bucket is empty.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes a token, blocking until one is available.
+
+        Returns:
+            float: The number of seconds spent waiting.
+        """
+        waited_seconds = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited_seconds
+                wait_seconds = (1 - self.tokens) / self.rate
+            time.sleep(wait_seconds)
+            waited_seconds += wait_seconds
+
+def get_carrier(email):
+    """
+    Returns the name of the carrier whose SMS gateway an address belongs to, or None
+    for a regular email address.
+    """
+    address = email.strip().lower()
+    domain = address[address.rfind('@'):]
+    for carrier, carrier_settings in settings.SMS_CARRIERS.items():
+        if domain == carrier_settings['domain']:
+            return carrier
+    return None
+
+def split_recipients(recipients):
+    """
+    Separates SMS gateway recipients from regular email recipients.
+
+    Args:
+        recipients (dict): A dictionary containing email addresses and associated names.
+
+    Returns:
+        tuple: The regular email recipients (dict) and the SMS recipients grouped by
+        carrier (dict of carrier -> dict of address -> name).
+    """
+    email_recipients = {}
+    sms_recipients = {}
+    for email, first_name in recipients.items():
+        carrier = get_carrier(email)
+        if carrier:
+            sms_recipients.setdefault(carrier, {})[email] = first_name
+        else:
+            email_recipients[email] = first_name
+    return email_recipients, sms_recipients
+
+def compact_sms_message(message, max_length=None):
+    """
+    Shrinks the long-form prediction into a single SMS-sized body.
+    Markdown and extra whitespace are removed and the text is cut at a word
+    boundary so the body and the opt-out note fit in max_length characters.
+    """
+    max_length = max_length or settings.SMS_MAX_LENGTH
+    suffix = settings.SMS_OPT_OUT_NOTE
+    text = re.sub(r'[*_#`>]+', '', message)
+    text = re.sub(r'\s+', ' ', text).strip()
+    room = max_length - len(suffix) - 1
+    if len(text) > room:
+        text = text[:room - 3].rsplit(' ', 1)[0].rstrip(' ,.;:') + '...'
+    return f'{text} {suffix}'
+
+def _reset_stats(carrier):
+    with _stats_lock:
+        carrier_stats[carrier] = {
+            'sent': 0, 'failed': 0, 'latencies': [], 'throttle_wait_seconds': 0.0,
+            'started_at': time.monotonic(), 'finished_at': None,
+        }
+
+def _record(carrier, result, latency_seconds, waited_seconds):
+    with _stats_lock:
+        stats = carrier_stats[carrier]
+        stats['sent' if result['delivered'] else 'failed'] += 1
+        stats['latencies'].append(latency_seconds)
+        stats['throttle_wait_seconds'] += waited_seconds
+        stats['finished_at'] = time.monotonic()
+
+def get_carrier_stats():
+    """
+    Returns the delivery stats for each carrier: messages sent and failed, throughput,
+    median and worst send latency, and total time spent waiting on the rate limit.
+    """
+    summary = {}
+    with _stats_lock:
+        for carrier, stats in carrier_stats.items():
+            latencies = sorted(stats['latencies'])
+            elapsed_seconds = (stats['finished_at'] or stats['started_at']) - stats['started_at']
+            summary[carrier] = {
+                'sent': stats['sent'],
+                'failed': stats['failed'],
+                'messages_per_second': len(latencies) / elapsed_seconds if elapsed_seconds else None,
+                'median_latency_seconds': latencies[len(latencies) // 2] if latencies else None,
+                'max_latency_seconds': latencies[-1] if latencies else None,
+                'throttle_wait_seconds': stats['throttle_wait_seconds'],
+            }
+    return summary
+
+def send_to_carrier(carrier, recipients, sms_message, username):
+    """
+    Sends the SMS body to one carrier's recipients, respecting that carrier's
+    rate limit and concurrency.
+
+    Returns:
+        dict: The delivery result for each address.
+    """
+    carrier_settings = settings.SMS_CARRIERS[carrier]
+    concurrency = carrier_settings['concurrency']
+    bucket = TokenBucket(carrier_settings['messages_per_second'], carrier_settings['burst'])
+    pool = email_delivery.create_smtp_pool(username, concurrency)
+    _reset_stats(carrier)
+
+    def send(address):
+        waited_seconds = bucket.acquire()
+        msg = MIMEText(sms_message)
+        msg['From'] = username
+        msg['To'] = address
+        start_time = time.perf_counter()
+        result = email_delivery.deliver_message(pool, msg, address, settings.SMS_MAX_RETRIES)
+        _record(carrier, result, time.perf_counter() - start_time, waited_seconds)
+        return result
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(send, address): address for address in recipients}
+            results = {futures[future]: future.result() for future in as_completed(futures)}
+    finally:
+        pool.close()
+
+    logging.info('SMS delivery for %s: %s', carrier, get_carrier_stats().get(carrier))
+    return results
+
+def send_sms_to_users(sms_recipients, message):
+    """
+    Sends the compacted prediction to every SMS gateway recipient. Every carrier
+    queue runs on its own thread, so carriers never wait on each other.
+
+    Args:
+        sms_recipients (dict): Carrier -> dict of address -> name, from split_recipients().
+        message (str): The long-form prediction.
+
+    Returns:
+        dict: The delivery result for each address.
+    """
+    if not sms_recipients:
+        return {}
+
+    sms_message = compact_sms_message(message)
+    username = os.environ.get('SENDER_EMAIL')
+    logging.info('Sending our snowday prediction by SMS to %s people on %s carriers',
+                 sum(len(recipients) for recipients in sms_recipients.values()), len(sms_recipients))
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(sms_recipients)) as executor:
+        futures = [
+            executor.submit(send_to_carrier, carrier, recipients, sms_message, username)
+            for carrier, recipients in sms_recipients.items()
+        ]
+        for future in as_completed(futures):
+            results.update(future.result())
+    return results
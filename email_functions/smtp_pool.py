@@ -0,0 +1,140 @@
+"""
+SMTP Connection Pool Module
+
+This module provides a bounded pool of authenticated SMTP sessions that can be
+shared by worker threads. Sessions are created lazily up to the pool size, handed
+out one thread at a time, and recycled when they break or when they have sent
+the configured number of messages (mail servers such as Gmail drop sessions that
+send too much). A message the server rejects doesn't break the session, so it
+goes back to the pool.
+
+Dependencies:
+- contextlib: To hand out sessions with a with block.
+- logging: To log application events and errors.
+- queue: To hold the idle sessions.
+- smtplib: To close sessions cleanly and tell which errors break them.
+- threading: To bound the number of open sessions.
+"""
+
+import logging
+import queue
+import smtplib
+import threading
+from contextlib import contextmanager
+
+# Errors the server answered without closing the session. smtplib resets the
+# transaction before raising them, so the session can send the next message.
+# (SMTPResponseException covers e.g. SMTPSenderRefused and SMTPDataError.)
+REJECTED_MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPNotSupportedError)
+
+def is_session_broken(ex):
+    """
+    Tells whether an error raised while sending leaves the session unusable. Lost
+    connections, socket errors and unexpected errors do; a rejected message doesn't,
+    unless the server is closing the session (421).
+    """
+    if isinstance(ex, smtplib.SMTPResponseException):
+        return ex.smtp_code == 421
+    return not isinstance(ex, REJECTED_MESSAGE_ERRORS)
+
+class SmtpSession:
+    """
+    An open SMTP connection and the number of messages sent over it.
+    """
+    __slots__ = ('connection', 'messages_sent')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.messages_sent = 0
+
+class SmtpConnectionPool:
+    """
+    A bounded pool of SMTP sessions.
+
+    Args:
+        connect (callable): Creates and returns a new logged-in smtplib.SMTP connection.
+        size (int): The largest number of sessions open at once.
+        max_messages_per_connection (int): Sessions are closed and replaced after sending this many messages.
+    """
+
+    def __init__(self, connect, size, max_messages_per_connection):
+        self.connect = connect
+        self.size = size
+        self.max_messages_per_connection = max_messages_per_connection
+        self.stats = {'opened': 0, 'recycled': 0, 'discarded': 0}
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    def _count(self, counter):
+        with self._lock:
+            self.stats[counter] += 1
+
+    def acquire(self):
+        """
+        Takes an idle session from the pool, opening a new one if none are idle.
+        Blocks while all sessions are in use.
+        """
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        try:
+            session = SmtpSession(self.connect())
+        except Exception:
+            self._slots.release()
+            raise
+        self._count('opened')
+        return session
+
+    def release(self, session, healthy=True):
+        """
+        Returns a session to the pool. Broken sessions and sessions that reached
+        their message limit are closed instead.
+        """
+        try:
+            if not healthy:
+                self._count('discarded')
+                self._close(session)
+            elif session.messages_sent >= self.max_messages_per_connection:
+                self._count('recycled')
+                self._close(session)
+            else:
+                self._idle.put(session)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def session(self):
+        """
+        Context manager that acquires a session and releases it afterwards. The
+        session is discarded if the block raises an error that breaks it (see
+        is_session_broken()).
+        """
+        session = self.acquire()
+        try:
+            yield session
+        except BaseException as ex:
+            self.release(session, healthy=not is_session_broken(ex))
+            raise
+        self.release(session)
+
+    def close(self):
+        """
+        Closes every idle session.
+        """
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    @staticmethod
+    def _close(session):
+        try:
+            session.connection.quit()
+        except (smtplib.SMTPException, OSError) as ex:
+            logging.debug('Error closing SMTP session: %s', ex)
+            session.connection.close()
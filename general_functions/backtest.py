@@ -0,0 +1,429 @@
+"""
+Backtest Module
+
+This module replays archived forecasts through the prediction pipeline and scores
+the predictions against the known school closures, so changes to the prompt, the
+pre-screen rules, AI_RESPONSE_THEMES or the snow day factor file can be measured
+before they go live.
+
+An archive is a directory of WeatherAPI forecast.json payloads (.json or .json.gz),
+each fetched on the evening before a school day. Payloads directly in the archive
+belong to the default district and payloads in a sub directory belong to the
+district with that ID. The school day a payload is for is its second forecast day,
+so the files can be named anything. The outcomes are a CSV file with a date column,
+a closed column (1/0, yes/no or true/false) and an optional district column.
+
+Every payload goes through get_relevant_weather_information(), the weather
+pre-screen, the prompt build and a predictor, spread across a process pool.
+The predictors are:
+- stub: a local, deterministic score from the weather features. It is free and
+  instant, which makes it a baseline and a way to time the replay itself.
+- cached: the assistant, with every answer cached on disk by prompt, model, factor
+  file and themes, so re-running a backtest only pays for the prompts that changed.
+  With --offline, prompts without a cached answer are skipped instead.
+- module:function: any callable taking (weather_info, prompt, district) and
+  returning a prediction dict with a 'probability' from 0 to 100.
+
+The report has the accuracy, precision and recall at SNOW_DAY_PROBABILITY_THRESHOLD,
+the Brier score (and its skill over always predicting the base rate) and a
+calibration table:
+    python -m general_functions.backtest ARCHIVE OUTCOMES [--predictor stub] [--workers 8]
+        [--threshold 75] [--no-prescreen] [--offline] [--output backtest.json]
+
+Dependencies:
+- argparse: For the backtest command line.
+- csv: To read the closure outcomes.
+- gzip: To read compressed archived forecasts.
+- importlib: To load module:function predictors.
+- json: To read the archived forecasts and write the results.
+- logging: To log application events and errors.
+- os: For file and directory operations.
+- sys: To silence the console output of the worker processes.
+- time: To time the replay.
+- concurrent.futures: To replay the forecasts across a process pool.
+- datetime, pytz: To date each prompt on the evening it would have been sent.
+- weatherapi: For the relevant weather information, the features and the pre-screen.
+- openai_actions: For the prompt build, the factor file hash and the factor file upload.
+- email_functions.email_helpers: To ask the assistant for uncached predictions.
+- general_functions: For the district configs, the disk cache and the root directory.
+- settings: To access application-specific settings.
+"""
+
+import argparse
+import csv
+import gzip
+import importlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from weatherapi import weather_data
+from weatherapi import weather_prescreen
+from openai_actions import open_ai_api_calls as openai_api
+from openai_actions import open_ai_data as openai_data
+from openai_actions import open_ai_metadata_cache
+from email_functions import email_helpers
+from general_functions import districts as district_configs
+from general_functions.disk_cache import DiskCache
+from general_functions import storage
+from settings import settings
+
+ARCHIVE_SUFFIXES = ('.json', '.json.gz')
+CLOSED_VALUES = ('1', 'y', 'yes', 'true', 'closed')
+
+# Set in each worker process by _init_worker()
+_worker = {}
+
+def find_forecast_files(archive_directory):
+    """
+    Finds the archived forecast payloads.
+
+    Returns:
+        list of tuple: (district ID, path) for every payload, sorted by district and path.
+    """
+    files = []
+    for directory, _, file_names in os.walk(archive_directory):
+        relative_directory = os.path.relpath(directory, archive_directory)
+        district_id = (settings.DISTRICT_ID if relative_directory == os.curdir
+                       else relative_directory.split(os.sep)[0])
+        files.extend((district_id, os.path.join(directory, file_name))
+                     for file_name in file_names if file_name.endswith(ARCHIVE_SUFFIXES))
+    return sorted(files)
+
+def load_forecast(path):
+    """
+    Reads an archived forecast.json payload, compressed or not.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as forecast_file:
+        return json.load(forecast_file)
+
+def load_outcomes(path):
+    """
+    Reads the known closures.
+
+    Returns:
+        dict: (district ID, ISO date) -> True if school was closed.
+    """
+    outcomes = {}
+    with open(path, newline='', encoding='utf-8') as outcomes_file:
+        for row in csv.DictReader(outcomes_file):
+            try:
+                target_date = date.fromisoformat(row['date'].strip()).isoformat()
+            except (KeyError, AttributeError, ValueError):
+                logging.warning('Skipping an outcome without a valid date: %s', row)
+                continue
+            district_id = (row.get('district') or '').strip() or settings.DISTRICT_ID
+            outcomes[(district_id, target_date)] = str(row.get('closed', '')).strip().lower() in CLOSED_VALUES
+    return outcomes
+
+def get_prompt_time(forecast_date):
+    """
+    Returns when the nightly run would have built the prompt for a forecast fetched
+    on forecast_date (an ISO date): 7 PM in the school's timezone.
+    """
+    import pytz
+    timezone = pytz.timezone(settings.SCHOOL_TIMEZONE)
+    return timezone.localize(datetime.combine(date.fromisoformat(forecast_date), datetime.min.time())
+                             .replace(hour=19))
+
+def stub_prediction(weather_info, prompt, district):
+    """
+    Scores a night from its weather features without calling anything. Every
+    pre-screen reason, centimetre of snow (counting double during the commute)
+    and chance of snow adds to the probability.
+    """
+    features = weather_data.get_prediction_features(weather_info)
+    reasons = weather_prescreen.get_prescreen_reasons(weather_info)
+    probability = (10 * len(reasons) + 4 * features['total_snow_cm'] + 4 * features['commute_total_snow_cm'] +
+                   0.2 * features['max_chance_of_snow'])
+    return {
+        'probability': max(1, min(99, round(probability))),
+        'rationale': '; '.join(reasons),
+        'message': '',
+    }
+
+def _get_assistant_cache():
+    if 'cache' not in _worker:
+        _worker['cache'] = DiskCache(settings.BACKTEST_CACHE_DIRECTORY,
+                                     settings.BACKTEST_CACHE_TTL_SECONDS,
+                                     settings.BACKTEST_CACHE_MAX_ENTRIES)
+    return _worker['cache']
+
+def make_assistant_key(prompt):
+    """
+    Builds the cache key for the assistant's answer to a prompt. Changing the
+    model, the factor file or the themes invalidates every cached answer.
+    """
+    try:
+        factor_file_hash = open_ai_metadata_cache.get_file_hash(
+            os.path.join(storage.ROOT_DIRECTORY, settings.SNOW_DAY_FACTOR_FILE))
+    except OSError:
+        factor_file_hash = None
+    return DiskCache.make_key(settings.ENGINE_NAME, factor_file_hash, settings.AI_RESPONSE_THEMES, prompt)
+
+def cached_prediction(weather_info, prompt, district):
+    """
+    Returns the assistant's prediction for a prompt, asking the assistant only when
+    the answer isn't cached yet. In offline mode a missing answer returns None.
+    """
+    cache = _get_assistant_cache()
+    cache_key = make_assistant_key(prompt)
+    data = cache.get(cache_key)
+    if data is not None:
+        return json.loads(data)
+    if _worker.get('offline'):
+        return None
+
+    prediction = email_helpers.generate_email_content(prompt)
+    cache.set(cache_key, json.dumps(prediction).encode('utf-8'))
+    return prediction
+
+PREDICTORS = {
+    'stub': stub_prediction,
+    'cached': cached_prediction,
+}
+
+def get_predictor(name):
+    """
+    Returns the predictor with the given name, or loads a 'module:function' predictor.
+    """
+    if name in PREDICTORS:
+        return PREDICTORS[name]
+    module_name, _, function_name = name.partition(':')
+    if not function_name:
+        raise ValueError(f'Unknown predictor {name}; use one of {", ".join(PREDICTORS)} or module:function')
+    return getattr(importlib.import_module(module_name), function_name)
+
+def _init_worker(predictor_name, prescreen, offline):
+    # The prompt build and the assistant print to the console, once per night
+    sys.stdout = open(os.devnull, 'w', encoding='utf-8')  # pylint: disable=consider-using-with
+    _worker.update(predictor=get_predictor(predictor_name), prescreen=prescreen, offline=offline,
+                   districts={district['id']: district for district in district_configs.get_batch_districts()})
+
+def _get_district(district_id):
+    district = _worker['districts'].get(district_id)
+    if district is None:
+        district = dict(district_configs.get_default_district(), id=district_id)
+        _worker['districts'][district_id] = district
+    return district
+
+def replay_forecast(district_id, path):
+    """
+    Replays one archived forecast through the pre-screen, the prompt build and the
+    predictor. Runs in a worker process.
+
+    Returns:
+        dict: The district, path, target date, probability, source and any error.
+    """
+    result = {'district': district_id, 'path': path, 'target_date': None,
+              'probability': None, 'source': None, 'error': None}
+    try:
+        forecast_data = load_forecast(path)
+        forecast_days = forecast_data['forecast']['forecastday']
+        result['target_date'] = forecast_days[1]['date']
+        weather_info = weather_data.get_relevant_weather_information(forecast_data)
+        if not weather_info['hourly']:
+            raise ValueError('no hourly forecast data')
+        district = _get_district(district_id)
+
+        if _worker['prescreen'] and not weather_prescreen.get_prescreen_reasons(weather_info):
+            result['source'] = 'prescreen'
+            prediction = weather_prescreen.create_clear_night_prediction(weather_info, district)
+        else:
+            result['source'] = 'predictor'
+            prompt = openai_data.create_open_ai_snow_day_message(weather_info, district,
+                                                                 now=get_prompt_time(forecast_days[0]['date']))
+            if prompt is None:
+                raise ValueError('the prompt could not be built')
+            prediction = _worker['predictor'](weather_info, prompt, district)
+            if prediction is None:
+                raise LookupError('no cached prediction')
+        result['probability'] = prediction.get('probability')
+    except Exception as ex:
+        result['error'] = f'{type(ex).__name__}: {ex}'
+    return result
+
+def run_backtest(archive_directory, predictor_name='stub', max_workers=None, prescreen=True, offline=False):
+    """
+    Replays every forecast in an archive across a process pool.
+
+    Args:
+        archive_directory (str): The archive of forecast payloads.
+        predictor_name (str): 'stub', 'cached' or 'module:function'.
+        max_workers (int, optional): The number of processes. Defaults to settings.BACKTEST_MAX_WORKERS.
+        prescreen (bool): Whether clear nights get the pre-screen prediction, as in a live run.
+        offline (bool): Whether the cached predictor may ask the assistant about uncached prompts.
+
+    Returns:
+        list of dict: One result per forecast, in archive order (see replay_forecast()).
+    """
+    get_predictor(predictor_name)
+    files = find_forecast_files(archive_directory)
+    if not files:
+        return []
+    max_workers = max_workers or settings.BACKTEST_MAX_WORKERS or os.cpu_count()
+    # Big chunks keep the inter-process overhead small next to the (fast) stub predictor
+    chunk_size = max(1, len(files) // (max_workers * 4))
+    if predictor_name == 'cached' and not offline:
+        # Look up the assistant and upload the factor file here, so the workers find them
+        # in the metadata cache instead of each process uploading its own copy
+        try:
+            openai_api.get_assistant()
+            openai_api.get_helping_files()
+        except Exception as ex:
+            logging.warning('Could not look up the OpenAI assistant and files before the backtest: %s', ex)
+    with ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                             initargs=(predictor_name, prescreen, offline)) as executor:
+        return list(executor.map(replay_forecast, *zip(*files), chunksize=chunk_size))
+
+def score_predictions(results, outcomes, threshold=None, bins=None):
+    """
+    Scores the replayed predictions against the known closures.
+
+    Args:
+        results (list of dict): The results from run_backtest().
+        outcomes (dict): The closures from load_outcomes().
+        threshold (float, optional): The probability (0 to 100) counted as a snow day
+            prediction. Defaults to settings.SNOW_DAY_PROBABILITY_THRESHOLD.
+        bins (int, optional): The number of calibration bins. Defaults to settings.BACKTEST_CALIBRATION_BINS.
+
+    Returns:
+        dict: The counts, accuracy, precision, recall, Brier score, Brier skill score,
+        expected calibration error and calibration table.
+    """
+    threshold = settings.SNOW_DAY_PROBABILITY_THRESHOLD if threshold is None else threshold
+    bins = bins or settings.BACKTEST_CALIBRATION_BINS
+    scored = []
+    unmatched = 0
+    for result in results:
+        if result['probability'] is None:
+            continue
+        closed = outcomes.get((result['district'], result['target_date']))
+        if closed is None:
+            unmatched += 1
+            continue
+        scored.append((min(1.0, max(0.0, result['probability'] / 100)), closed))
+
+    summary = {
+        'forecasts': len(results),
+        'errors': sum(1 for result in results if result['error']),
+        'without_outcome': unmatched,
+        'scored': len(scored),
+        'threshold': threshold,
+    }
+    if not scored:
+        return summary
+
+    true_positives = sum(1 for probability, closed in scored if closed and probability * 100 >= threshold)
+    false_positives = sum(1 for probability, closed in scored if not closed and probability * 100 >= threshold)
+    closures = sum(1 for _, closed in scored if closed)
+    false_negatives = closures - true_positives
+    true_negatives = len(scored) - closures - false_positives
+    base_rate = closures / len(scored)
+    brier_score = sum((probability - closed) ** 2 for probability, closed in scored) / len(scored)
+    # Always predicting the base rate scores base_rate * (1 - base_rate)
+    reference_score = base_rate * (1 - base_rate)
+
+    calibration = []
+    for index in range(bins):
+        members = [(probability, closed) for probability, closed in scored
+                   if min(int(probability * bins), bins - 1) == index]
+        if members:
+            calibration.append({
+                'lower': index / bins,
+                'upper': (index + 1) / bins,
+                'count': len(members),
+                'mean_probability': sum(probability for probability, _ in members) / len(members),
+                'closure_rate': sum(1 for _, closed in members if closed) / len(members),
+            })
+
+    summary.update(
+        closures=closures,
+        base_rate=base_rate,
+        true_positives=true_positives,
+        false_positives=false_positives,
+        true_negatives=true_negatives,
+        false_negatives=false_negatives,
+        accuracy=(true_positives + true_negatives) / len(scored),
+        precision=true_positives / (true_positives + false_positives) if true_positives + false_positives else None,
+        recall=true_positives / closures if closures else None,
+        brier_score=brier_score,
+        brier_skill_score=1 - brier_score / reference_score if reference_score else None,
+        expected_calibration_error=sum(
+            row['count'] / len(scored) * abs(row['mean_probability'] - row['closure_rate']) for row in calibration),
+        calibration=calibration,
+    )
+    return summary
+
+def _format(value, pattern='{:.3f}'):
+    return 'n/a' if value is None else pattern.format(value)
+
+def print_report(summary, results):
+    """
+    Prints the backtest summary and calibration table.
+    """
+    print(f'Forecasts: {summary["forecasts"]}, scored: {summary["scored"]}, errors: {summary["errors"]}, '
+          f'without an outcome: {summary["without_outcome"]}')
+    sources = {}
+    for result in results:
+        if result['source'] and not result['error']:
+            sources[result['source']] = sources.get(result['source'], 0) + 1
+    print(f'Sources: {", ".join(f"{source} {count}" for source, count in sorted(sources.items())) or "none"}')
+    errors = {}
+    for result in results:
+        if result['error']:
+            errors[result['error']] = errors.get(result['error'], 0) + 1
+    for error, count in sorted(errors.items(), key=lambda item: -item[1])[:5]:
+        print(f'  {count} x {error}')
+    if not summary['scored']:
+        return
+
+    print(f'Closures: {summary["closures"]} (base rate {summary["base_rate"]:.1%})')
+    print(f'At {summary["threshold"]}%: accuracy {summary["accuracy"]:.1%}, '
+          f'precision {_format(summary["precision"], "{:.1%}")}, recall {_format(summary["recall"], "{:.1%}")} '
+          f'(TP {summary["true_positives"]}, FP {summary["false_positives"]}, '
+          f'TN {summary["true_negatives"]}, FN {summary["false_negatives"]})')
+    print(f'Brier score: {summary["brier_score"]:.4f} (skill {_format(summary["brier_skill_score"])}), '
+          f'expected calibration error: {summary["expected_calibration_error"]:.3f}')
+    print(f'{"probability":<13} {"count":>6} {"predicted":>10} {"observed":>9}')
+    for row in summary['calibration']:
+        print(f'{row["lower"]:>5.0%} - {row["upper"]:<5.0%} {row["count"]:>6} '
+              f'{row["mean_probability"]:>10.1%} {row["closure_rate"]:>9.1%}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay archived forecasts and score the predictions')
+    parser.add_argument('archive', help='directory of archived forecast.json payloads')
+    parser.add_argument('outcomes', help='CSV file with date, closed and optional district columns')
+    parser.add_argument('--predictor', default='stub', help='stub, cached or module:function (default: stub)')
+    parser.add_argument('--workers', type=int, help='worker processes (defaults to settings.BACKTEST_MAX_WORKERS)')
+    parser.add_argument('--threshold', type=float, help='probability counted as a snow day prediction')
+    parser.add_argument('--no-prescreen', action='store_true', help='send clear nights to the predictor too')
+    parser.add_argument('--offline', action='store_true', help='skip prompts without a cached assistant answer')
+    parser.add_argument('--output', help='write the summary and every result to this JSON file')
+    args = parser.parse_args()
+    try:
+        get_predictor(args.predictor)
+    except (ValueError, ImportError, AttributeError) as ex:
+        parser.error(str(ex))
+
+    outcomes = load_outcomes(args.outcomes)
+    start_time = time.perf_counter()
+    results = run_backtest(args.archive, args.predictor, args.workers, not args.no_prescreen, args.offline)
+    elapsed_seconds = time.perf_counter() - start_time
+    summary = score_predictions(results, outcomes, args.threshold)
+    summary['seconds'] = elapsed_seconds
+
+    print(f'Replayed {len(results)} forecasts with the {args.predictor} predictor in {elapsed_seconds:.1f}s')
+    print_report(summary, results)
+    if args.output:
+        for result in results:
+            result['closed'] = outcomes.get((result['district'], result['target_date']))
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump({'summary': summary, 'results': results}, output_file, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Batch Runner Module
+
+This module runs the snow day prediction pipeline for many districts at once.
+Instead of one cold process per district, the districts are worked by a thread
+pool inside a single process. Forecasts are fetched once per unique zip code
+and shared between every district at that location, and the overall throughput
+is reported in districts per minute when the batch finishes.
+
+Dependencies:
+- logging: To log application events and errors.
+- os: For building the per-district prediction file paths.
+- time: To measure the batch duration.
+- concurrent.futures: To run the district pipelines concurrently.
+- weatherapi.weather_api_calls: To fetch the forecast for each zip code.
+- openai_actions.open_ai_api_calls: To look up the assistant and factor file upload before the workers start.
+- general_functions: For the prediction, prediction store, HTTP deadline and metrics helpers.
+- email_functions.email_helpers: For generating and sending the emails.
+- settings.settings: To access application-specific settings.
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import weatherapi.weather_api_calls as weather_api
+from openai_actions import open_ai_api_calls as openai_api
+from general_functions import general_functions
+from general_functions import districts as district_configs
+from general_functions import http_client
+from general_functions import metrics
+from general_functions import prediction_store
+from email_functions import email_helpers
+from settings import settings
+
+def fetch_forecasts(districts, executor):
+    """
+    Fetches the relevant weather information for every unique zip code in the given districts.
+
+    Args:
+        districts (list of dict): The district configs.
+        executor (concurrent.futures.Executor): The pool used to make the requests.
+
+    Returns:
+        dict: The relevant weather information for each zip code, or None if the request failed.
+    """
+    zip_codes = sorted({district['zip_code'] for district in districts})
+    logging.info('Fetching %s forecasts for %s districts', len(zip_codes), len(districts))
+    futures = {executor.submit(weather_api.get_relevant_forecast, zip_code): zip_code for zip_code in zip_codes}
+    forecasts = {}
+    for future in as_completed(futures):
+        # One zip code's failure only fails the districts at that location
+        try:
+            forecasts[futures[future]] = future.result()
+        except Exception as ex:
+            logging.error('Could not fetch the forecast for zip code %s: %s', futures[future], ex)
+            forecasts[futures[future]] = None
+    return forecasts
+
+def warm_openai_metadata():
+    """
+    Looks up the assistant and the factor file upload once, so the district workers
+    find both in the metadata cache instead of each looking them up (or uploading
+    the file) at the same time. A failure is logged and left to the workers.
+    """
+    try:
+        openai_api.get_assistant()
+        openai_api.get_helping_files()
+    except Exception as ex:
+        logging.warning('Could not look up the OpenAI assistant and files before the batch: %s', ex)
+
+def run_district(district, weather_info, use_cache=None):
+    """
+    Runs the prediction pipeline for a single district using an already fetched forecast.
+
+    Args:
+        district (dict): The district config.
+        weather_info (dict): The relevant weather information for the district's zip code.
+        use_cache (bool, optional): Whether to reuse a cached prediction.
+
+    Returns:
+        dict: The outcome for the district with the keys 'district', 'prediction'
+        (the structured prediction) and 'sent'.
+    """
+    district_id = district['id']
+    if weather_info is None:
+        raise ValueError(f'No forecast available for zip code {district["zip_code"]}')
+
+    prediction = general_functions.predict_snow_day(district, weather_info, use_cache)
+    email_message = prediction['message']
+    prediction_id = general_functions.record_prediction(
+        district, weather_info, prediction,
+        os.path.join(settings.BATCH_PREDICTIONS_DIRECTORY, f'{district_id}.txt')
+    )
+
+    sent = False
+    if email_helpers.should_send_email(prediction):
+        if district.get('sign_up_form_id'):
+            recipients = email_helpers.fetch_email_recipients(district['sign_up_form_id'])
+            results = email_helpers.send_emails(recipients, email_message)
+            delivered = sum(1 for result in results.values() if result['delivered'])
+            prediction_store.append_delivery(prediction_id, delivered, len(results) - delivered)
+            sent = True
+        else:
+            logging.info('No sign up form configured for %s, not sending emails.', district_id)
+
+    return {'district': district_id, 'prediction': prediction, 'sent': sent}
+
+def run_batch(districts=None, max_workers=None, use_cache=None):
+    """
+    Runs the prediction pipeline concurrently for a list of districts.
+
+    Args:
+        districts (list of dict, optional): The district configs. Defaults to the
+            districts configured in settings.
+        max_workers (int, optional): The size of the worker pool. Defaults to
+            settings.BATCH_MAX_WORKERS.
+        use_cache (bool, optional): Whether to reuse cached predictions. Defaults to
+            settings.PREDICTION_CACHE_ENABLED.
+
+    Returns:
+        list of dict: The outcome for each district. Failed districts have an
+        'error' key instead of a prediction.
+    """
+    districts = districts or district_configs.get_batch_districts()
+    max_workers = max_workers or settings.BATCH_MAX_WORKERS
+    logging.info('---- BATCH START (%s districts, %s workers) ----', len(districts), max_workers)
+    http_client.start_run()
+    start_time = time.perf_counter()
+    warm_openai_metadata()
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        forecasts = fetch_forecasts(districts, executor)
+        futures = {
+            executor.submit(run_district, district, forecasts.get(district['zip_code']), use_cache): district
+            for district in districts
+        }
+        for future in as_completed(futures):
+            district_id = futures[future]['id']
+            try:
+                results.append(future.result())
+                logging.info('Finished the prediction for %s', district_id)
+            except Exception as ex:
+                logging.error('The prediction for %s failed: %s', district_id, ex)
+                results.append({'district': district_id, 'error': str(ex)})
+
+    elapsed_seconds = time.perf_counter() - start_time
+    districts_per_minute = len(districts) / (elapsed_seconds / 60) if elapsed_seconds else 0.0
+    summary = (f'Batch finished {len(districts)} districts in {elapsed_seconds:.1f}s '
+               f'({districts_per_minute:.1f} districts/minute)')
+    logging.info(summary)
+    print(summary)
+    metrics.record('batch', elapsed_seconds, districts=len(districts),
+                   failed=sum(1 for result in results if 'error' in result))
+    metrics.flush()
+    logging.info('---- BATCH END ----')
+
+    return results
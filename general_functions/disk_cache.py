@@ -0,0 +1,217 @@
+"""
+Disk Cache Module
+
+This module provides a small on-disk cache for raw response bodies. Each entry is
+stored as its own file named after a hash of the cache key, so entries survive
+between runs of the application (and between workflow runs when the cache
+directory is restored).
+
+Key Features:
+- Time to live: entries older than the configured TTL are treated as misses.
+- Size-bounded eviction: the least recently used entries are removed once the
+  cache holds more than the configured number of entries or bytes. The cache
+  keeps a running count of its entries and bytes, so a write only scans the
+  directory when the count goes over a limit, and the scan then evicts down to
+  EVICTION_TARGET_RATIO of the limits so the next scan is many writes away.
+  (Other processes sharing the directory aren't in the count, so the limits are
+  approximate.)
+- Atomic writes: entries are written to a temporary file and renamed into place,
+  so a crashed or concurrent run never reads a half-written entry.
+- Hit/miss counters for logging and reporting.
+
+Dependencies:
+- hashlib: To build file names from cache keys.
+- logging: To log application events and errors.
+- os: For file and directory operations.
+- tempfile: To create the temporary files used for atomic writes.
+- threading: To keep the counters and eviction safe across worker threads.
+- time: To compare entry ages against the TTL.
+- general_functions.storage: For the root directory of the project.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from general_functions import storage
+
+ENTRY_SUFFIX = '.cache'
+
+# An eviction scan leaves the cache this full, relative to max_entries and max_bytes
+EVICTION_TARGET_RATIO = 0.9
+
+class DiskCache:
+    """
+    A file-per-entry cache with TTL expiry and least recently used eviction.
+
+    The modification time of an entry is when it was written and is used for the
+    TTL. The access time is refreshed on every hit and is used for eviction.
+    """
+
+    def __init__(self, directory, ttl_seconds, max_entries, max_bytes=None):
+        # Relative cache directories are resolved against the root directory of the project
+        self.directory = os.path.join(storage.ROOT_DIRECTORY, directory)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        # The running entry and byte counts, unknown until the first eviction scan
+        self._entry_count = None
+        self._byte_count = None
+
+    @staticmethod
+    def make_key(*parts):
+        """
+        Builds a cache key from the given parts.
+
+        Returns:
+            str: A hex digest that is stable for the same parts.
+        """
+        return hashlib.sha256('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}{ENTRY_SUFFIX}')
+
+    def _count(self, counter):
+        with self._lock:
+            self.stats[counter] += 1
+
+    def get(self, key):
+        """
+        Reads an entry from the cache.
+
+        Args:
+            key (str): The cache key from make_key().
+
+        Returns:
+            bytes or None: The cached data, or None if the entry is missing or expired.
+        """
+        path = self._path(key)
+        try:
+            modified_time = os.stat(path).st_mtime
+            if time.time() - modified_time > self.ttl_seconds:
+                self._count('misses')
+                return None
+
+            with open(path, 'rb') as cache_file:
+                data = cache_file.read()
+            # Refresh the access time so eviction keeps recently used entries
+            os.utime(path, (time.time(), modified_time))
+        except OSError:
+            self._count('misses')
+            return None
+
+        self._count('hits')
+        return data
+
+    def set(self, key, data):
+        """
+        Writes an entry to the cache atomically and evicts old entries if the cache is full.
+
+        Args:
+            key (str): The cache key from make_key().
+            data (bytes): The data to store.
+        """
+        path = self._path(key)
+        previous_size = self._size(path)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(file_descriptor, 'wb') as temp_file:
+                    temp_file.write(data)
+                os.replace(temp_path, path)
+            except OSError:
+                os.remove(temp_path)
+                raise
+        except OSError as ex:
+            logging.warning('Could not write cache entry to %s: %s', self.directory, ex)
+            return
+
+        self._count('writes')
+        with self._lock:
+            if self._entry_count is not None:
+                self._entry_count += previous_size is None
+                self._byte_count += len(data) - (previous_size or 0)
+        if self._is_full():
+            self.evict()
+
+    def delete(self, key):
+        """
+        Removes an entry from the cache if it exists.
+        """
+        path = self._path(key)
+        size = self._size(path)
+        try:
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._entry_count is not None and size is not None:
+                self._entry_count -= 1
+                self._byte_count -= size
+
+    @staticmethod
+    def _size(path):
+        try:
+            return os.stat(path).st_size
+        except OSError:
+            return None
+
+    def _is_full(self):
+        with self._lock:
+            return (self._entry_count is None or self._entry_count > self.max_entries or
+                    (self.max_bytes is not None and self._byte_count > self.max_bytes))
+
+    def evict(self):
+        """
+        Scans the cache directory: removes expired entries, then the least recently
+        used entries until the cache is within EVICTION_TARGET_RATIO of max_entries
+        and max_bytes, and resets the running counts.
+        """
+        with self._lock:
+            entries = []
+            now = time.time()
+            try:
+                file_names = os.listdir(self.directory)
+            except OSError:
+                return
+
+            for file_name in file_names:
+                if not file_name.endswith(ENTRY_SUFFIX):
+                    continue
+                path = os.path.join(self.directory, file_name)
+                try:
+                    entry_stat = os.stat(path)
+                except OSError:
+                    continue
+                if now - entry_stat.st_mtime > self.ttl_seconds:
+                    self._remove(path)
+                    continue
+                entries.append((entry_stat.st_atime, entry_stat.st_size, path))
+
+            # Newest access time first, so the least recently used are popped off the end
+            entries.sort(reverse=True)
+            total_bytes = sum(size for _, size, _ in entries)
+            target_entries = self.max_entries
+            target_bytes = self.max_bytes
+            if len(entries) > self.max_entries or (self.max_bytes is not None and total_bytes > self.max_bytes):
+                target_entries = int(self.max_entries * EVICTION_TARGET_RATIO)
+                target_bytes = None if self.max_bytes is None else int(self.max_bytes * EVICTION_TARGET_RATIO)
+            while entries and (len(entries) > target_entries or
+                               (target_bytes is not None and total_bytes > target_bytes)):
+                _, size, path = entries.pop()
+                total_bytes -= size
+                self._remove(path)
+            self._entry_count = len(entries)
+            self._byte_count = total_bytes
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            self.stats['evictions'] += 1
+        except OSError:
+            pass
@@ -0,0 +1,71 @@
+"""
+Districts Module
+
+This module builds the district configs used by the prediction pipeline. A
+district config is a plain dictionary describing one school (name, location,
+start time, etc.). The single school in settings is always available as the
+default district, and batch mode adds the entries listed in settings.DISTRICTS.
+
+Dependencies:
+- os: To read the sign up form ID from the environment.
+- settings.settings: To access application-specific settings.
+"""
+
+import os
+from settings import settings
+
+def get_default_district():
+    """
+    Builds the district config for the school defined in the settings file.
+
+    Returns:
+        dict: The district config for the default school.
+    """
+    return {
+        'id': settings.DISTRICT_ID,
+        'school_name': settings.SCHOOL_NAME,
+        'school_district_state': settings.SCHOOL_DISTRICT_STATE,
+        'school_district_town_or_city': settings.SCHOOL_DISTRICT_TOWN_OR_CITY,
+        'school_district_county': settings.SCHOOL_DISTRICT_COUNTY,
+        'school_start_time': settings.SCHOOL_START_TIME,
+        'zip_code': settings.ZIP_CODE,
+        'sign_up_form_id': os.environ.get('GOOGLE_SIGN_UP_FORM_ID'),
+    }
+
+def get_batch_districts():
+    """
+    Builds the list of district configs for batch mode.
+
+    Every entry in settings.DISTRICTS is layered on top of the default district,
+    so a config only has to list the values that differ. Only the 'id' has to be
+    listed: it names the district's prediction file, stored predictions and cache
+    entries, so it must be unique. If no districts are configured, the default
+    district is returned on its own.
+
+    Returns:
+        list of dict: The district configs to run.
+
+    Raises:
+        ValueError: If a district has no id, or two districts share one.
+    """
+    if not settings.DISTRICTS:
+        return [get_default_district()]
+
+    districts = []
+    seen_ids = set()
+    for index, district_settings in enumerate(settings.DISTRICTS):
+        district_id = str(district_settings.get('id') or '').strip()
+        if not district_id:
+            raise ValueError(f'District {index} in settings.DISTRICTS has no id')
+        if district_id in seen_ids:
+            raise ValueError(f'More than one district in settings.DISTRICTS has the id {district_id}')
+        seen_ids.add(district_id)
+        district = get_default_district()
+        # A district only gets the sign up form it explicitly lists
+        district['sign_up_form_id'] = None
+        district.update(district_settings)
+        district['id'] = district_id
+        district['zip_code'] = str(district['zip_code']).strip()
+        districts.append(district)
+
+    return districts
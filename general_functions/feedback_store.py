@@ -0,0 +1,181 @@
+"""
+Feedback Store Module
+
+This module records the "Are you confident in this prediction?" votes. Every vote
+is a row in a SQLite database (settings.FEEDBACK_STORE_PATH), indexed by district
+and school day, so the votes for a prediction are one indexed range query.
+
+Votes arrive in bursts on storm nights, so they aren't written one by one. A
+VoteBuffer takes each vote in memory, updates the live yes/no counters straight
+away and hands the waiting votes to a background thread that appends them in one
+transaction every settings.FEEDBACK_FLUSH_SECONDS (or as soon as
+settings.FEEDBACK_FLUSH_MAX_VOTES are waiting). Votes a failed write couldn't
+store (whatever the error) stay in the buffer for the next flush, and close() flushes whatever is left,
+so no vote that was accepted is lost. Once settings.FEEDBACK_MAX_PENDING_VOTES are
+waiting (the store keeps failing), new votes are refused instead of piling up.
+
+Dependencies:
+- logging: To log application events and errors.
+- threading: For the buffer lock and the flush thread.
+- time: To timestamp votes.
+- general_functions.storage: To open the SQLite store.
+- settings: To access application-specific settings.
+"""
+
+import logging
+import threading
+import time
+from general_functions import storage
+from settings import settings
+
+VOTES = ('yes', 'no')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS votes (
+    district TEXT NOT NULL,
+    target_date TEXT NOT NULL,
+    vote TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS votes_by_district_date ON votes (district, target_date);
+"""
+
+_lock = threading.Lock()
+
+def open_store(path=None):
+    """
+    Opens the feedback store (creating it if needed), commits when the block
+    succeeds and closes the connection afterwards.
+    """
+    return storage.open_sqlite(path or settings.FEEDBACK_STORE_PATH, SCHEMA)
+
+def append_votes(votes):
+    """
+    Appends votes to the store in one transaction.
+
+    Args:
+        votes (list of tuple): (district, target date, vote, created at) for each vote.
+    """
+    with _lock, open_store() as connection:
+        connection.executemany('INSERT INTO votes (district, target_date, vote, created_at) VALUES (?, ?, ?, ?)',
+                               votes)
+
+def get_counts(district_id=None, start_date=None):
+    """
+    Counts the stored votes per district and school day.
+
+    Args:
+        district_id (str, optional): Only count this district's votes.
+        start_date (str, optional): Only count school days from this ISO date on.
+
+    Returns:
+        dict: (district, target date) -> {'yes': count, 'no': count}.
+    """
+    query = 'SELECT district, target_date, vote, COUNT(*) FROM votes WHERE 1 = 1'
+    parameters = ()
+    if district_id:
+        query += ' AND district = ?'
+        parameters += (district_id,)
+    if start_date:
+        query += ' AND target_date >= ?'
+        parameters += (start_date,)
+    counts = {}
+    with open_store() as connection:
+        for district, target_date, vote, count in connection.execute(
+                f'{query} GROUP BY district, target_date, vote', parameters):
+            counts.setdefault((district, target_date), dict.fromkeys(VOTES, 0))[vote] = count
+    return counts
+
+class VoteBuffer:
+    """
+    Takes votes in memory, keeps the live counters and flushes the votes to the
+    store in batches on a background thread.
+    """
+
+    def __init__(self, flush_seconds=None, flush_max_votes=None, max_pending_votes=None, start_date=None):
+        self.flush_seconds = settings.FEEDBACK_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self.flush_max_votes = flush_max_votes or settings.FEEDBACK_FLUSH_MAX_VOTES
+        self.max_pending_votes = max_pending_votes or settings.FEEDBACK_MAX_PENDING_VOTES
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        # The counters start from what is already stored, so they survive a restart
+        self._counts = get_counts(start_date=start_date)
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='feedback-flush', daemon=True)
+        self._thread.start()
+
+    def add(self, district_id, target_date, vote):
+        """
+        Takes a vote.
+
+        Returns:
+            dict or None: The school day's updated counts, or None if the buffer is
+            full (or closed) and the vote was refused.
+        """
+        with self._lock:
+            if self._closed or len(self._pending) >= self.max_pending_votes:
+                return None
+            self._pending.append((district_id, target_date, vote, time.time()))
+            counts = self._counts.setdefault((district_id, target_date), dict.fromkeys(VOTES, 0))
+            counts[vote] += 1
+            counts = dict(counts)
+            if len(self._pending) >= self.flush_max_votes:
+                self._wake.set()
+        return counts
+
+    def get_counts(self, district_id, target_date):
+        """
+        Returns the live counts of a school day's votes.
+        """
+        with self._lock:
+            return dict(self._counts.get((district_id, target_date), dict.fromkeys(VOTES, 0)))
+
+    @property
+    def pending(self):
+        """
+        The number of votes waiting to be flushed.
+        """
+        return len(self._pending)
+
+    def flush(self):
+        """
+        Writes the waiting votes to the store.
+
+        Returns:
+            int: The number of votes written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                votes, self._pending = self._pending, []
+            if not votes:
+                return 0
+            try:
+                append_votes(votes)
+            except Exception as ex:
+                logging.error('Could not store %s votes, keeping them for the next flush: %s', len(votes), ex)
+                with self._lock:
+                    self._pending[:0] = votes
+                return 0
+            return len(votes)
+
+    def _run(self):
+        # The flush thread must outlive any failure, or accepted votes would only be written on close()
+        while not self._closed:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as ex:
+                logging.error('The feedback flush failed, trying again next flush: %s', ex)
+
+    def close(self):
+        """
+        Stops taking votes, stops the flush thread and flushes what is left.
+        """
+        with self._lock:
+            self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
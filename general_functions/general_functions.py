@@ -3,8 +3,8 @@ General Functions Module
 
 This module contains utility functions that support the main application's operations.
 It includes functionalities for logging configuration, reading application settings, 
-managing user data, and recording predictions. File-based operations are temporary 
-and serve as placeholders until database integrations are complete.
+managing user data, and recording predictions. Predictions are appended to the
+prediction store and prediction.txt is rendered from it.
 
 Dependencies:
 - logging: To log application events and errors.
@@ -16,9 +16,19 @@ Dependencies:
 import logging
 import datetime
 import os
+import time
 import weatherapi.weather_api_calls as weather_api
+from weatherapi import weather_prescreen
 from weatherapi import weather_data
+from weatherapi import forecast_delta
 from openai_actions import open_ai_data as openai_data
+from openai_actions import open_ai_response_cache
+from email_functions import email_helpers
+from general_functions import districts
+from general_functions import metrics
+from general_functions import prediction_store
+from general_functions import site_builder
+from settings import settings
 
 BASE_SETTINGS_PATH = os.path.join('settings')
 
@@ -38,33 +48,148 @@ def configure_logging():
     current_time = datetime.datetime.now()
     logging.info('---- APPLICATION START (current date/time is: %s) ----', current_time)
 
-def write_prediction_to_file(prediction):
+def write_prediction_to_file(prediction, file_name=None):
     """
     Records the provided prediction to a text file for historical tracking.
-    Writes to 'historical_predictions.txt' in the root directory of the project.
+    Writes to settings.PREDICTION_FILE ('prediction.txt') in the root directory of
+    the project unless another file name (relative to the root directory) is passed in.
     """
+    file_name = file_name or settings.PREDICTION_FILE
     # Get the directory of the current script
     current_directory = os.path.dirname(os.path.abspath(__file__))
 
     # Go up one level to the root directory of the project
     root_directory = os.path.dirname(current_directory)
-    file_path = os.path.join(root_directory, 'prediction.txt')
+    file_path = os.path.join(root_directory, file_name)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
     with open(file_path, "w", encoding="utf-8") as file:
         file.write(f'{prediction}\n')
 
-def create_snow_day_message():
+def create_snow_day_message(district=None, weather_info=None, target_date=None):
     """
     Generate a snow day message based on weather data and the given policy.
     
     Args:
-        policy (dict): The snow day policy.
+        district (dict, optional): The district config. Defaults to the school in settings.
+        weather_info (dict, optional): Already fetched relevant weather information for
+            the district's zip code. When not given, the forecast is streamed here.
+        target_date (str, optional): The school day (ISO date) to predict. Defaults to tomorrow.
     
     Returns:
         str: The generated snow day message.
     """
-    # Fetch the relevant weather information
-    weather_info = weather_data.get_relevant_weather_information(weather_api.get_forecast())
+    if weather_info is None:
+        # Fetch the relevant weather information
+        weather_info = weather_api.get_relevant_forecast(district['zip_code'] if district else None)
+    if weather_info is None:
+        raise ValueError('No forecast available to create the snow day message from')
 
     # Create a message based on the weather data and policy
-    return openai_data.create_open_ai_snow_day_message(weather_info)
+    with metrics.span('prompt_build') as span:
+        school_day = datetime.date.fromisoformat(target_date) if target_date else None
+        message = openai_data.create_open_ai_snow_day_message(weather_info, district, school_day=school_day)
+        if message is None:
+            # The prompt builder already logged the missing district field
+            raise ValueError('The snow day message could not be created')
+        span['bytes'] = len(message.encode('utf-8'))
+    return message
+
+def predict_snow_day(district=None, weather_info=None, use_cache=None, target_date=None):
+    """
+    Predicts the chance of a snow day for a district.
+
+    The relevant weather information goes through the weather pre-screen first.
+    Clear nights get a templated prediction without calling the assistant. Other
+    nights reuse a cached prediction when the district's bucketed forecast hasn't
+    changed, and get the full assistant prediction otherwise.
+
+    Args:
+        district (dict, optional): The district config. Defaults to the school in settings.
+        weather_info (dict, optional): Already fetched relevant weather information for
+            the district's zip code. When not given, the forecast is streamed here.
+        use_cache (bool, optional): Whether to reuse a cached prediction. Defaults to
+            settings.PREDICTION_CACHE_ENABLED. Fresh predictions are always stored.
+        target_date (str, optional): The school day (ISO date) to predict, with
+            weather_info covering the night before it. Defaults to tomorrow.
+
+    Returns:
+        dict: The structured prediction with the keys 'probability', 'rationale' and
+        'message', plus 'source' ('prescreen', 'cache' or 'assistant'), 'model' and
+        'latency_seconds'.
+    """
+    district = district or districts.get_default_district()
+    if weather_info is None:
+        weather_info = weather_api.get_relevant_forecast(district['zip_code'])
+    if weather_info is None:
+        raise ValueError('No forecast available to create the snow day prediction from')
+
+    start_time = time.perf_counter()
+    with metrics.span('prediction', district=district['id'], source='assistant') as span:
+        prediction = None
+        if settings.PRESCREEN_ENABLED:
+            reasons = weather_prescreen.get_prescreen_reasons(weather_info)
+            if not reasons:
+                logging.info('Pre-screen: clear night for %s, skipping the assistant', district['id'])
+                weather_prescreen.record_clear_night()
+                span['source'] = 'prescreen'
+                prediction = weather_prescreen.create_clear_night_prediction(weather_info, district)
+            else:
+                logging.info('Pre-screen: sending %s to the assistant because of %s',
+                             district['id'], '; '.join(reasons))
+
+        use_cache = settings.PREDICTION_CACHE_ENABLED if use_cache is None else use_cache
+        if prediction is None:
+            cache_key = open_ai_response_cache.make_prediction_key(district, weather_info, target_date)
+            if use_cache:
+                prediction = open_ai_response_cache.get_cached_prediction(cache_key)
+                if prediction is not None:
+                    logging.info('Using the cached prediction for %s (cache stats: %s)',
+                                 district['id'], open_ai_response_cache.response_cache.stats)
+                    span['source'] = 'cache'
+
+        if prediction is None:
+            snowday_message = create_snow_day_message(district, weather_info, target_date)
+            prediction = email_helpers.generate_email_content(snowday_message)
+            if settings.PRESCREEN_ENABLED:
+                weather_prescreen.record_assistant_run(time.perf_counter() - start_time)
+            open_ai_response_cache.cache_prediction(cache_key, prediction)
+
+    prediction.update(
+        source=span['source'],
+        model=None if span['source'] == 'prescreen' else settings.ENGINE_NAME,
+        latency_seconds=time.perf_counter() - start_time,
+    )
+    return prediction
+
+def record_prediction(district, weather_info, prediction, file_name=None, target_date=None):
+    """
+    Appends a prediction for tomorrow to the prediction store (with the forecast
+    snapshot it was made from), then renders the district's newest stored
+    prediction for tomorrow to its prediction file and its pre-rendered page.
+
+    Args:
+        district (dict): The district config.
+        weather_info (dict): The relevant weather information the prediction was made from.
+        prediction (dict): The structured prediction from predict_snow_day().
+        file_name (str, optional): The prediction file. Defaults to settings.PREDICTION_FILE.
+        target_date (str, optional): The school day (ISO date) when it isn't tomorrow,
+            e.g. for an overnight re-prediction made after midnight.
+
+    Returns:
+        int: The ID of the stored prediction.
+    """
+    features = weather_data.get_prediction_features(weather_info)
+    target_date = target_date or prediction_store.get_target_date()
+    prediction_id = prediction_store.append_prediction(district['id'], prediction, features, target_date,
+                                                       forecast_delta.take_snapshot(weather_info))
+    # The multi-day outlook stores later school days too, so only look at this one
+    latest = prediction_store.get_latest_prediction(district['id'], target_date)
+    write_prediction_to_file(latest['message'], file_name)
+    if settings.SITE_BUILD_ENABLED:
+        # The page is a convenience for the site; a failed build must not lose the prediction
+        try:
+            site_builder.build_district_page(district, target_date)
+        except Exception as ex:
+            logging.error('Could not build the prediction page for %s: %s', district['id'], ex)
+    return prediction_id
@@ -0,0 +1,152 @@
+"""
+HTTP Client Module
+
+This module is the shared HTTP layer for the providers the application calls
+over plain HTTP (WeatherAPI, Google Forms, ...). Every request goes through one
+requests.Session, so connections are kept alive and reused instead of paying a
+new TCP and TLS handshake per call.
+
+Key Features:
+- Connection pooling: one pool per host, capped at settings.HTTP_MAX_CONNECTIONS_PER_HOST
+  connections (or the host's entry in settings.HTTP_HOST_CONNECTION_LIMITS). Threads
+  wait for a free connection instead of opening more, which also limits how many
+  requests run against a host at once.
+- A deadline per run: start_run() gives the whole run settings.HTTP_RUN_DEADLINE_SECONDS
+  of HTTP time. Each request's timeout is cut to what is left, and once the deadline
+  has passed requests fail straight away with requests.Timeout.
+- Retries: connection errors and 429/5xx responses to GET requests are retried up to
+  settings.HTTP_RETRY_ATTEMPTS times with full jitter exponential backoff (or the
+  server's Retry-After), never sleeping past the deadline. The retries are counted on
+  the current metrics span.
+
+requests is only imported when the first request is made.
+
+Dependencies:
+- logging: To log application events and errors.
+- random: For the retry jitter.
+- threading: To create the shared session once across worker threads.
+- time: For the deadline and the retry delays.
+- urllib.parse: To find the host of a URL.
+- requests: For the session and its connection pools (imported on first use).
+- general_functions.metrics: To count retries on the current span.
+- settings: To access application-specific settings.
+"""
+
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+from general_functions import metrics
+from settings import settings
+
+RETRY_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_lock = threading.Lock()
+_session = None
+_deadline = None
+
+def get_session():
+    """
+    Returns the shared session, creating it on first use.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            for scheme in ('http', 'https'):
+                session.mount(f'{scheme}://', HTTPAdapter(pool_connections=16,
+                                                          pool_maxsize=settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+                                                          pool_block=True))
+                # Hosts with their own connection limit get their own adapter, matched by URL prefix
+                for host, limit in settings.HTTP_HOST_CONNECTION_LIMITS.items():
+                    session.mount(f'{scheme}://{host}/', HTTPAdapter(pool_connections=1, pool_maxsize=limit,
+                                                                     pool_block=True))
+            _session = session
+        return _session
+
+def start_run(deadline_seconds=None):
+    """
+    Starts the HTTP deadline for a run. Requests made after the deadline fail
+    with requests.Timeout.
+
+    Args:
+        deadline_seconds (float, optional): The HTTP time budget of the run.
+            Defaults to settings.HTTP_RUN_DEADLINE_SECONDS; None means no deadline.
+    """
+    global _deadline
+    deadline_seconds = settings.HTTP_RUN_DEADLINE_SECONDS if deadline_seconds is None else deadline_seconds
+    _deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+
+def remaining_seconds():
+    """
+    Returns the seconds left before the run deadline, or None if there is no deadline.
+    """
+    return None if _deadline is None else _deadline - time.monotonic()
+
+def _get_retry_delay(attempt, response=None):
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), settings.HTTP_RETRY_MAX_SECONDS)
+    return random.uniform(0, min(settings.HTTP_RETRY_MAX_SECONDS, settings.HTTP_RETRY_BASE_SECONDS * 2 ** attempt))
+
+def request(method, url, timeout=None, **kwargs):
+    """
+    Makes a request with the shared session.
+
+    Args:
+        method (str): The HTTP method.
+        url (str): The URL.
+        timeout (float, optional): The connect and read timeout. Defaults to
+            settings.HTTP_TIMEOUT_SECONDS, and is cut to the time left before the run deadline.
+        **kwargs: Passed on to requests.Session.request() (params, headers, stream, ...).
+
+    Returns:
+        requests.Response: The response. Retryable statuses are only returned once
+        the retries are used up, so callers still call raise_for_status().
+
+    Raises:
+        requests.RequestException: If the request fails, or the run deadline has passed.
+    """
+    import requests
+    session = get_session()
+    timeout = timeout or settings.HTTP_TIMEOUT_SECONDS
+    attempts = settings.HTTP_RETRY_ATTEMPTS if method.upper() in RETRY_METHODS else 1
+    host = urlsplit(url).hostname
+
+    for attempt in range(attempts):
+        remaining = remaining_seconds()
+        if remaining is not None and remaining <= 0:
+            raise requests.Timeout(f'The run deadline passed before the request to {host}')
+        request_timeout = timeout if remaining is None else min(timeout, remaining)
+
+        response = None
+        try:
+            response = session.request(method, url, timeout=request_timeout, **kwargs)
+        except requests.ConnectionError as ex:
+            if attempt + 1 == attempts:
+                raise
+            reason = str(ex)
+        else:
+            if response.status_code not in settings.HTTP_RETRY_STATUSES or attempt + 1 == attempts:
+                return response
+            reason = f'HTTP {response.status_code}'
+
+        delay = _get_retry_delay(attempt, response)
+        if response is not None:
+            response.close()
+        remaining = remaining_seconds()
+        if remaining is not None and delay >= remaining:
+            raise requests.Timeout(f'The run deadline leaves no time to retry {host} after {reason}')
+        logging.warning('Retrying %s %s in %.2fs after %s (attempt %s of %s)',
+                        method, host, delay, reason, attempt + 2, attempts)
+        metrics.increment(http_retries=1)
+        time.sleep(delay)
+
+def get(url, **kwargs):
+    """
+    Makes a GET request with the shared session. See request().
+    """
+    return request('GET', url, **kwargs)
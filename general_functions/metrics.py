@@ -0,0 +1,204 @@
+"""
+Metrics Module
+
+This module records instrumentation spans for the stages of a run (forecast fetch,
+prompt build, assistant run, recipient fetch, SMTP send, ...) and appends them to a
+durable JSON lines file, one span per line, so stage latencies can be tracked
+across nights. Unlike the application log, the metrics file is never truncated.
+
+A span records the stage name, when it ended, how long it took, whether it raised
+and any attributes the stage attaches to it: bytes, token usage, cache hits,
+recipient counts and so on. Code running inside a span can add attributes to it
+with annotate() and increment() without having the span passed in.
+
+Running this module prints the p50/p95 latency of every stage in the metrics file:
+    python -m general_functions.metrics [--runs 30]
+
+Dependencies:
+- argparse: For the summary command line.
+- json: To write and read the metrics file.
+- logging: To log application events and errors.
+- math: For the percentile ranks.
+- os: For file and directory operations.
+- threading: To keep spans separate per thread and the span list safe.
+- time: To time the spans.
+- uuid: To tell runs apart in the metrics file.
+- contextlib: To open spans with a with block.
+- general_functions.storage: For the root directory of the project.
+- settings: To access application-specific settings.
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from general_functions import storage
+from settings import settings
+
+RUN_ID = uuid.uuid4().hex[:12]
+
+_lock = threading.Lock()
+_local = threading.local()
+_spans = []
+
+def _metrics_path(path=None):
+    return os.path.join(storage.ROOT_DIRECTORY, path or settings.METRICS_PATH)
+
+def _open_spans():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+def record(stage, seconds, status='ok', **attributes):
+    """
+    Records a finished span for a stage that was timed elsewhere.
+    """
+    entry = {'run_id': RUN_ID, 'stage': stage, 'time': time.time(),
+             'seconds': round(seconds, 6), 'status': status}
+    entry.update(attributes)
+    with _lock:
+        _spans.append(entry)
+
+@contextmanager
+def span(stage, **attributes):
+    """
+    Times the enclosed block as a stage. The span is recorded with status 'error'
+    if the block raises.
+
+    Yields:
+        dict: The span's attributes, which the block can update directly.
+    """
+    stack = _open_spans()
+    stack.append(attributes)
+    start_time = time.perf_counter()
+    status = 'ok'
+    try:
+        yield attributes
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        stack.pop()
+        record(stage, time.perf_counter() - start_time, status, **attributes)
+
+def annotate(**attributes):
+    """
+    Sets attributes on the innermost open span of the current thread, if any.
+    """
+    stack = _open_spans()
+    if stack:
+        stack[-1].update(attributes)
+
+def increment(**counts):
+    """
+    Adds to numeric attributes on the innermost open span of the current thread, if any.
+    """
+    stack = _open_spans()
+    if stack:
+        for name, count in counts.items():
+            stack[-1][name] = stack[-1].get(name, 0) + count
+
+def flush(path=None):
+    """
+    Appends the spans recorded so far to the metrics file and clears them.
+
+    Returns:
+        int: The number of spans written.
+    """
+    with _lock:
+        spans = list(_spans)
+        _spans.clear()
+    if not settings.METRICS_ENABLED or not spans:
+        return 0
+
+    file_path = _metrics_path(path)
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'a', encoding='utf-8') as metrics_file:
+            for entry in spans:
+                metrics_file.write(json.dumps(entry, default=str) + '\n')
+    except OSError as ex:
+        logging.error('Could not write metrics to %s: %s', file_path, ex)
+        return 0
+    logging.info('Wrote %s metric spans to %s', len(spans), file_path)
+    return len(spans)
+
+def load_spans(path=None, runs=None):
+    """
+    Reads the spans from the metrics file.
+
+    Args:
+        path (str, optional): The metrics file. Defaults to settings.METRICS_PATH.
+        runs (int, optional): Only return the spans of the last this many runs.
+
+    Returns:
+        list of dict: The spans, oldest first.
+    """
+    spans = []
+    try:
+        with open(_metrics_path(path), encoding='utf-8') as metrics_file:
+            for line in metrics_file:
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        return []
+
+    if runs:
+        run_ids = set(list(dict.fromkeys(entry.get('run_id') for entry in spans))[-runs:])
+        spans = [entry for entry in spans if entry.get('run_id') in run_ids]
+    return spans
+
+def percentile(values, fraction):
+    """
+    Returns the nearest-rank percentile of a list of values (fraction between 0 and 1).
+    """
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(spans):
+    """
+    Summarizes the latency of every stage.
+
+    Returns:
+        dict: Stage -> {'count', 'errors', 'p50_seconds', 'p95_seconds', 'max_seconds'}.
+    """
+    seconds_by_stage = {}
+    errors_by_stage = {}
+    for entry in spans:
+        stage = entry['stage']
+        seconds_by_stage.setdefault(stage, []).append(entry['seconds'])
+        errors_by_stage[stage] = errors_by_stage.get(stage, 0) + (entry.get('status') != 'ok')
+
+    return {
+        stage: {
+            'count': len(values),
+            'errors': errors_by_stage[stage],
+            'p50_seconds': percentile(values, 0.5),
+            'p95_seconds': percentile(values, 0.95),
+            'max_seconds': max(values),
+        }
+        for stage, values in seconds_by_stage.items()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize the stage latencies in the metrics file')
+    parser.add_argument('--path', help='the metrics file (defaults to settings.METRICS_PATH)')
+    parser.add_argument('--runs', type=int, help='only include the last this many runs')
+    args = parser.parse_args()
+
+    summary = summarize(load_spans(args.path, args.runs))
+    print(f'{"stage":<28} {"count":>6} {"errors":>6} {"p50 s":>9} {"p95 s":>9} {"max s":>9}')
+    for stage, stats in sorted(summary.items()):
+        print(f'{stage:<28} {stats["count"]:>6} {stats["errors"]:>6} {stats["p50_seconds"]:>9.3f} '
+              f'{stats["p95_seconds"]:>9.3f} {stats["max_seconds"]:>9.3f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+Outlook Module
+
+This module builds the rolling multi-day snow day outlook for a district: one
+prediction for each of the next settings.OUTLOOK_DAYS school days, for planning
+families and the ops team. Days without school (weekends, see
+settings.OUTLOOK_SCHOOL_WEEKDAYS) are skipped; a Monday is predicted from the
+Sunday night before it. No emails are sent.
+
+The forecast for every night is fetched in a single (cached) request. Each night
+is then compared with the snapshot of the forecast its stored prediction was made
+from, hour by hour and field by field (see weatherapi.forecast_delta). Only days
+that are new, or whose forecast changed by more than settings.OUTLOOK_DELTA_THRESHOLDS,
+are predicted again; the others reuse their stored prediction. Predictions for
+tomorrow made by the nightly run count too, so the outlook never predicts a day
+the nightly run already covered with the same weather.
+
+The outlook is written to settings.OUTLOOK_FILE, one line per school day.
+
+Dependencies:
+- logging: To log application events and errors.
+- datetime: To work out the school day and the time span of each night.
+- pytz: To place each night in the school's timezone (imported when needed).
+- weatherapi: For the forecast fetch, the night windows and the forecast deltas.
+- general_functions: For the prediction, the prediction store, districts and metrics.
+- settings: To access application-specific settings.
+"""
+
+import logging
+import datetime
+import weatherapi.weather_api_calls as weather_api
+from weatherapi import forecast_delta
+from weatherapi import forecast_stream
+from weatherapi import weather_data
+from general_functions import general_functions
+from general_functions import districts
+from general_functions import metrics
+from general_functions import prediction_store
+from settings import settings
+
+def get_school_days(days, first_date=None):
+    """
+    Returns the next school days, skipping the weekdays not in settings.OUTLOOK_SCHOOL_WEEKDAYS.
+
+    Args:
+        days (int): How many school days.
+        first_date (date, optional): The first day to consider. Defaults to tomorrow.
+
+    Returns:
+        list of date: The school days, in order.
+    """
+    school_day = first_date or datetime.date.fromisoformat(prediction_store.get_target_date())
+    school_days = []
+    while len(school_days) < days:
+        if school_day.weekday() in settings.OUTLOOK_SCHOOL_WEEKDAYS:
+            school_days.append(school_day)
+        school_day += datetime.timedelta(days=1)
+    return school_days
+
+def get_night_period(school_day):
+    """
+    Returns the (start, end) of the night before a school day in the school's timezone,
+    from the start of the first to the end of the last of weather_data.RELEVANT_WINDOWS.
+    """
+    import pytz
+    school_timezone = pytz.timezone(settings.SCHOOL_TIMEZONE)
+    night = school_day - datetime.timedelta(days=1)
+    first_day, start_hour, _ = weather_data.RELEVANT_WINDOWS[0]
+    last_day, _, end_hour = weather_data.RELEVANT_WINDOWS[-1]
+    start = datetime.datetime.combine(night + datetime.timedelta(days=first_day), datetime.time())
+    end = datetime.datetime.combine(night + datetime.timedelta(days=last_day), datetime.time())
+    return (school_timezone.localize(start + datetime.timedelta(hours=start_hour)),
+            school_timezone.localize(end + datetime.timedelta(hours=end_hour)))
+
+def fetch_nights(district, school_days, use_cache=None):
+    """
+    Fetches the relevant weather information for the nights before the given school days.
+
+    Args:
+        district (dict): The district config.
+        school_days (list of date): The school days, from tomorrow on (see get_school_days()).
+        use_cache (bool, optional): Overrides settings.FORECAST_CACHE_ENABLED.
+
+    Returns:
+        list of dict or None: The relevant weather information for each night, in
+        order, or None if the forecast could not be fetched. Each night only carries
+        a weather alert that is in effect during it.
+    """
+    today = datetime.date.fromisoformat(prediction_store.get_target_date()) - datetime.timedelta(days=1)
+    windows = [window for school_day in school_days
+               for window in weather_data.get_night_windows((school_day - today).days)]
+    night_periods = [get_night_period(school_day) for school_day in school_days]
+    forecast_windows = weather_api.get_forecast_windows(windows, district['zip_code'], use_cache, night_periods)
+    if forecast_windows is None:
+        return None
+
+    hourly_windows, night_alerts = forecast_windows
+    night_length = len(weather_data.RELEVANT_WINDOWS)
+    return [forecast_stream.merge_forecast_windows(hourly_windows[night * night_length:(night + 1) * night_length],
+                                                   alert_data)
+            for night, alert_data in enumerate(night_alerts)]
+
+def update_day(district, weather_info, target_date, use_cache=None):
+    """
+    Brings the outlook for one school day up to date.
+
+    Returns:
+        dict: The day's stored or new prediction, with 'status' ('new', 'changed' or
+        'unchanged') and 'reasons' (the meaningful changes, if any).
+    """
+    snapshot = forecast_delta.take_snapshot(weather_info)
+    latest = prediction_store.get_latest_prediction(district['id'], target_date)
+    previous_snapshot = prediction_store.get_snapshot(latest['id']) if latest else None
+
+    if previous_snapshot is None:
+        status, reasons = 'new', []
+    else:
+        reasons = forecast_delta.get_change_reasons(forecast_delta.compute_delta(previous_snapshot, snapshot))
+        status = 'changed' if reasons else 'unchanged'
+    if status == 'unchanged':
+        return dict(latest, status=status, reasons=reasons)
+
+    # Tomorrow is predicted exactly like the nightly run so the two share cached predictions
+    prompt_date = None if target_date == prediction_store.get_target_date() else target_date
+    prediction = general_functions.predict_snow_day(district, weather_info, use_cache, prompt_date)
+    features = weather_data.get_prediction_features(weather_info)
+    prediction_id = prediction_store.append_prediction(district['id'], prediction, features, target_date, snapshot)
+    logging.info('Outlook for %s on %s: %s%% (%s%s)', district['id'], target_date, prediction['probability'],
+                 status, f": {'; '.join(reasons)}" if reasons else '')
+    return dict(prediction, id=prediction_id, target_date=target_date, status=status, reasons=reasons)
+
+def format_outlook(outlook):
+    """
+    Formats the outlook as text, one line per school day.
+    """
+    lines = []
+    for day in outlook:
+        school_day = datetime.date.fromisoformat(day['target_date'])
+        probability = 'no probability' if day['probability'] is None else f"{day['probability']:g}%"
+        lines.append(f"{school_day:%a %Y-%m-%d}: {probability} chance of a snow day. {day['rationale']}")
+    return '\n'.join(lines)
+
+def run_outlook(district=None, days=None, use_cache=None):
+    """
+    Updates the rolling outlook for a district and writes it to settings.OUTLOOK_FILE.
+
+    Args:
+        district (dict, optional): The district config. Defaults to the school in settings.
+        days (int, optional): How many school days, starting tomorrow. Defaults to settings.OUTLOOK_DAYS.
+        use_cache (bool, optional): Whether to reuse cached predictions for the days that are predicted.
+
+    Returns:
+        list of dict: The prediction for each school day (see update_day()).
+    """
+    district = district or districts.get_default_district()
+    days = days or settings.OUTLOOK_DAYS
+    with metrics.span('outlook', district=district['id'], days=days) as span:
+        school_days = get_school_days(days)
+        nights = fetch_nights(district, school_days)
+        if nights is None:
+            raise ValueError('No forecast available to build the outlook from')
+
+        outlook = []
+        for school_day, weather_info in zip(school_days, nights):
+            target_date = school_day.isoformat()
+            if not weather_info['hourly']:
+                logging.warning('The forecast does not reach %s, stopping the outlook there', target_date)
+                break
+            day = update_day(district, weather_info, target_date, use_cache)
+            metrics.increment(**{day['status']: 1})
+            outlook.append(day)
+        span['predicted'] = sum(1 for day in outlook if day['status'] != 'unchanged')
+
+    general_functions.write_prediction_to_file(format_outlook(outlook), settings.OUTLOOK_FILE)
+    print(format_outlook(outlook))
+    return outlook
@@ -0,0 +1,207 @@
+"""
+Overnight Watch Module
+
+This module keeps watching the forecast after the nightly prediction. The nightly
+run happens once at 7 PM, so a storm that changes overnight would otherwise only
+show up in the next day's prediction.
+
+`python main.py --watch` stays running until settings.WATCH_END_HOUR on the school
+day and checks the forecast every settings.WATCH_INTERVAL_SECONDS. Each check
+fetches a fresh forecast for the rest of the night (over the shared, kept-alive
+HTTP session) and compares its commute window features and weather alert with the
+features of the newest stored prediction for the school day. Nothing else happens
+unless one of them moved by at least settings.WATCH_CHANGE_THRESHOLDS (or the alert
+changed): then the snow day is predicted again, recorded, and a follow-up is sent
+when the new prediction warrants emails or families were already emailed about the
+old one. A check where nothing changed is one HTTP request and one SQLite query.
+
+Every check is recorded as a 'watch_cycle' metrics span and flushed straight away,
+so the metrics file is current while the watch runs.
+
+Dependencies:
+- logging: To log application events and errors.
+- datetime: To work out the school day and when to stop.
+- time: To wait between checks.
+- pytz: For the school's timezone.
+- weatherapi: For the forecast fetch, the night windows and the features.
+- general_functions: For the prediction, prediction store, HTTP deadline and metrics helpers.
+- email_functions: For the recipients and sending.
+- settings: To access application-specific settings.
+"""
+
+import logging
+import datetime
+import time
+import weatherapi.weather_api_calls as weather_api
+from weatherapi import forecast_stream
+from weatherapi import weather_data
+from general_functions import general_functions
+from general_functions import districts
+from general_functions import http_client
+from general_functions import metrics
+from general_functions import prediction_store
+from email_functions import email_helpers
+from settings import settings
+
+ALERT_FEATURES = ('weather_alert_event', 'weather_alert_severity')
+
+def get_watch_windows(target_date, today):
+    """
+    Returns the relevant windows for the night before target_date that are still
+    in the forecast: after midnight the evening before is no longer forecast.
+    """
+    day_offset = (target_date - today).days
+    return tuple(window for window in weather_data.get_night_windows(day_offset) if window[0] >= 0)
+
+def get_change_reasons(previous, current, thresholds=None):
+    """
+    Compares the commute window features and weather alert of two feature dictionaries.
+
+    Args:
+        previous (dict): The features of the stored prediction.
+        current (dict): The features of the fresh forecast.
+        thresholds (dict, optional): Feature name -> smallest change that counts.
+            Defaults to settings.WATCH_CHANGE_THRESHOLDS.
+
+    Returns:
+        list of str: The meaningful changes. An empty list means the stored prediction still stands.
+    """
+    thresholds = thresholds or settings.WATCH_CHANGE_THRESHOLDS
+    reasons = []
+    for name in ALERT_FEATURES:
+        if previous.get(name) != current.get(name):
+            reasons.append(f'{name} {previous.get(name)} -> {current.get(name)}')
+
+    for name, threshold in thresholds.items():
+        old_value, new_value = previous.get(name), current.get(name)
+        if old_value is None or new_value is None:
+            if old_value != new_value:
+                reasons.append(f'{name} {old_value} -> {new_value}')
+        elif abs(new_value - old_value) >= threshold:
+            reasons.append(f'{name} {old_value:g} -> {new_value:g}')
+    return reasons
+
+def was_delivered(district_id, target_date):
+    """
+    Returns whether any prediction for the school day was emailed to someone.
+    """
+    predictions = prediction_store.get_predictions(district_id, target_date, target_date, latest_only=False)
+    return any(prediction['delivered'] for prediction in predictions)
+
+def send_follow_up(district, prediction_id, message):
+    """
+    Sends a prediction to the district's recipients and records the delivery.
+    """
+    recipients = email_helpers.fetch_email_recipients(district.get('sign_up_form_id'))
+    logging.info('Sending the overnight update to %s recipients', len(recipients))
+    results = email_helpers.send_emails(recipients, message)
+    delivered = sum(1 for result in results.values() if result['delivered'])
+    prediction_store.append_delivery(prediction_id, delivered, len(results) - delivered)
+    return delivered
+
+def check_forecast(district, target_date, use_cache=None, now=None):
+    """
+    Runs one watch cycle: fetches the forecast and predicts again if it changed.
+
+    Args:
+        district (dict): The district config.
+        target_date (str): The school day being watched (ISO date).
+        use_cache (bool, optional): Whether to reuse a cached prediction.
+        now (datetime, optional): The current time in the school's timezone.
+
+    Returns:
+        dict or None: The new prediction, or None if the forecast didn't change
+        (or couldn't be fetched).
+    """
+    import pytz
+    now = now or datetime.datetime.now(pytz.timezone(settings.SCHOOL_TIMEZONE))
+    with metrics.span('watch_cycle', district=district['id'], target_date=target_date, changed=False) as span:
+        http_client.start_run(settings.WATCH_CYCLE_DEADLINE_SECONDS)
+        windows = get_watch_windows(datetime.date.fromisoformat(target_date), now.date())
+        # The forecast cache would hand back the forecast the last check already saw
+        forecast_windows = weather_api.get_forecast_windows(windows, district['zip_code'], use_cache=False)
+        if forecast_windows is None:
+            logging.warning('No forecast for %s this cycle, trying again next cycle', district['id'])
+            span['no_forecast'] = True
+            return None
+        weather_info = forecast_stream.merge_forecast_windows(*forecast_windows)
+        features = weather_data.get_prediction_features(weather_info)
+
+        latest = prediction_store.get_latest_prediction(district['id'], target_date)
+        reasons = get_change_reasons(latest['features'], features) if latest else ['no prediction yet']
+        if not reasons:
+            logging.info('The forecast for %s on %s has not changed', district['id'], target_date)
+            return None
+        span['changed'] = True
+        logging.info('The forecast for %s on %s changed: %s', district['id'], target_date, '; '.join(reasons))
+
+        # Before midnight the school day is still tomorrow, which is predicted exactly like the nightly run
+        prompt_date = None if target_date == prediction_store.get_target_date(now) else target_date
+        prediction = general_functions.predict_snow_day(district, weather_info, use_cache, prompt_date)
+        prediction_id = general_functions.record_prediction(district, weather_info, prediction,
+                                                            target_date=target_date)
+        span['probability'] = prediction['probability']
+
+        # Families that were told about the old prediction hear about the new one either way
+        send = email_helpers.should_send_email(prediction)
+        if latest and was_delivered(district['id'], target_date):
+            send = True
+        if send:
+            message = prediction['message']
+            if latest:
+                previous = 'no probability' if latest['probability'] is None else f"{latest['probability']:g}% chance"
+                message = settings.WATCH_FOLLOW_UP_TEMPLATE.format(previous=previous, message=message)
+            span['delivered'] = send_follow_up(district, prediction_id, message)
+        return prediction
+
+def run_watch(district=None, use_cache=None, interval_seconds=None, end_hour=None, max_cycles=None):
+    """
+    Watches the forecast for the coming school day until settings.WATCH_END_HOUR on that day.
+
+    Args:
+        district (dict, optional): The district config. Defaults to the school in settings.
+        use_cache (bool, optional): Whether to reuse a cached prediction.
+        interval_seconds (float, optional): The time between checks. Defaults to
+            settings.WATCH_INTERVAL_SECONDS.
+        end_hour (int, optional): The local hour on the school day when the watch
+            stops. Defaults to settings.WATCH_END_HOUR.
+        max_cycles (int, optional): Stops after this many checks.
+
+    Returns:
+        int: The number of checks made.
+    """
+    import pytz
+    district = district or districts.get_default_district()
+    interval_seconds = settings.WATCH_INTERVAL_SECONDS if interval_seconds is None else interval_seconds
+    end_hour = settings.WATCH_END_HOUR if end_hour is None else end_hour
+    timezone = pytz.timezone(settings.SCHOOL_TIMEZONE)
+    now = datetime.datetime.now(timezone)
+    # Started after midnight, the night being watched is the one before today
+    target_date = prediction_store.get_school_day(now, end_hour)
+    end_time = timezone.localize(datetime.datetime.combine(datetime.date.fromisoformat(target_date),
+                                                           datetime.time(end_hour)))
+    logging.info('Watching the forecast for %s on %s every %ss until %s',
+                 district['id'], target_date, interval_seconds, end_time)
+
+    cycles = 0
+    try:
+        while True:
+            started_at = time.monotonic()
+            try:
+                check_forecast(district, target_date, use_cache)
+            except Exception as ex:
+                logging.error('The watch cycle failed, trying again next cycle: %s', ex)
+            finally:
+                metrics.flush()
+            cycles += 1
+
+            wait_seconds = interval_seconds - (time.monotonic() - started_at)
+            seconds_left = (end_time - datetime.datetime.now(timezone)).total_seconds()
+            if (max_cycles and cycles >= max_cycles) or seconds_left <= max(wait_seconds, 0):
+                break
+            if wait_seconds > 0:
+                time.sleep(wait_seconds)
+    except KeyboardInterrupt:
+        logging.info('Watch stopped')
+    logging.info('Watch finished after %s checks', cycles)
+    return cycles
@@ -0,0 +1,219 @@
+"""
+Pipeline Module
+
+This module runs the single district prediction pipeline with asyncio so stages
+that don't depend on each other overlap instead of running back to back.
+
+While the forecast is fetched and the prediction is made, the pipeline also
+- looks up the assistant ID and the factor file upload (warming the metadata
+  cache the prediction reads; the prediction waits for it so the two never
+  upload at the same time),
+- fetches the email recipients from the sign up form,
+- opens and logs in the first SMTP session.
+None of those depend on the prediction, so by the time we know whether to send,
+the recipients and the mail server are usually already waiting. When there is no
+forecast the forecast stage fails and the pipeline stops there. If the prediction
+says not to send, the speculative work is cancelled or closed.
+
+Every stage runs its blocking calls on a worker thread under its own timeout from
+settings.PIPELINE_STAGE_TIMEOUT_SECONDS. A stage that times out is cancelled (the
+awaiting task stops waiting; the underlying call ends on its own client timeout).
+A stage-timing breakdown is logged and printed when the pipeline finishes, and
+every stage is recorded as a 'pipeline.<stage>' metrics span.
+
+Dependencies:
+- asyncio: To run the stages concurrently.
+- functools: To bind stage arguments.
+- logging: To log application events and errors.
+- time: To time the stages.
+- concurrent.futures: For the worker threads that run blocking calls.
+- weatherapi.weather_api_calls: To fetch the forecast.
+- openai_actions.open_ai_api_calls: For the assistant and file lookups.
+- general_functions: For the prediction, prediction store, HTTP deadline and metrics helpers.
+- email_functions: For the recipients, SMTP sessions and sending.
+- settings.settings: To access application-specific settings.
+"""
+
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+import weatherapi.weather_api_calls as weather_api
+from openai_actions import open_ai_api_calls as openai_api
+from general_functions import general_functions
+from general_functions import districts
+from general_functions import http_client
+from general_functions import metrics
+from general_functions import prediction_store
+from email_functions import email_delivery
+from email_functions import email_helpers
+from settings import settings
+
+class StageTimer:
+    """
+    Runs pipeline stages on worker threads under a timeout and records when each
+    stage started (relative to the start of the pipeline), how long it took and
+    how it ended ('ok', 'failed', 'timed out' or 'cancelled').
+    """
+
+    def __init__(self, executor, timeouts=None):
+        self.executor = executor
+        self.timeouts = timeouts or settings.PIPELINE_STAGE_TIMEOUT_SECONDS
+        self.started_at = time.perf_counter()
+        self.stages = {}
+
+    async def run(self, name, func, *args):
+        """
+        Runs a blocking function as the named stage.
+
+        Raises:
+            TimeoutError: If the stage runs longer than its timeout.
+        """
+        loop = asyncio.get_event_loop()
+        timeout = self.timeouts.get(name)
+        start_time = time.perf_counter()
+        status = 'ok'
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(self.executor, functools.partial(func, *args)), timeout)
+        except asyncio.TimeoutError:
+            status = 'timed out'
+            raise TimeoutError(f'The {name} stage timed out after {timeout} seconds') from None
+        except asyncio.CancelledError:
+            status = 'cancelled'
+            raise
+        except Exception:
+            status = 'failed'
+            raise
+        finally:
+            self.stages[name] = {
+                'start_seconds': start_time - self.started_at,
+                'seconds': time.perf_counter() - start_time,
+                'status': status,
+            }
+            metrics.record(f'pipeline.{name}', self.stages[name]['seconds'], status)
+
+    def summary(self):
+        """
+        Returns the stage-timing breakdown as a printable table.
+        """
+        total_seconds = time.perf_counter() - self.started_at
+        lines = [f'{"stage":<18} {"start":>8} {"seconds":>8}  status']
+        for name, stage in sorted(self.stages.items(), key=lambda item: item[1]['start_seconds']):
+            lines.append(f'{name:<18} {stage["start_seconds"]:>8.2f} {stage["seconds"]:>8.2f}  {stage["status"]}')
+        busy_seconds = sum(stage['seconds'] for stage in self.stages.values())
+        lines.append(f'{"total":<18} {0:>8.2f} {total_seconds:>8.2f}  '
+                     f'({busy_seconds:.2f}s of stage work, {busy_seconds - total_seconds:.2f}s overlapped)')
+        return '\n'.join(lines)
+
+def fetch_forecast(zip_code):
+    """
+    Fetches the forecast for the prediction, failing the stage when there is none.
+
+    Raises:
+        ValueError: If the forecast couldn't be fetched.
+    """
+    weather_info = weather_api.get_relevant_forecast(zip_code)
+    if weather_info is None:
+        raise ValueError('No forecast available to create the snow day prediction from')
+    return weather_info
+
+def look_up_assistant():
+    """
+    Looks up the assistant ID and the factor file upload so the prediction finds
+    both in the metadata cache.
+    """
+    return openai_api.get_assistant(), openai_api.get_helping_files()
+
+async def _discard(task, close=None):
+    """
+    Cancels a speculative stage that is no longer needed. A stage whose result
+    holds a resource is awaited instead and the result is closed.
+    """
+    if close is None:
+        task.cancel()
+    try:
+        result = await task
+    except (asyncio.CancelledError, Exception):
+        return
+    if close and result is not None:
+        close(result)
+
+async def run_pipeline(district=None, use_cache=None, timeouts=None):
+    """
+    Runs the prediction pipeline for a district with independent stages overlapped.
+
+    Args:
+        district (dict, optional): The district config. Defaults to the school in settings.
+        use_cache (bool, optional): Whether to reuse a cached prediction.
+        timeouts (dict, optional): Stage name -> timeout in seconds. Defaults to
+            settings.PIPELINE_STAGE_TIMEOUT_SECONDS.
+
+    Returns:
+        dict: The structured prediction.
+    """
+    district = district or districts.get_default_district()
+    http_client.start_run()
+    executor = ThreadPoolExecutor(max_workers=settings.PIPELINE_MAX_WORKERS, thread_name_prefix='pipeline')
+    timer = StageTimer(executor, timeouts)
+
+    # Speculative stages that don't depend on the prediction
+    lookup_task = asyncio.ensure_future(timer.run('assistant_lookup', look_up_assistant))
+    recipients_task = asyncio.ensure_future(timer.run('recipients', email_helpers.fetch_email_recipients,
+                                                      district.get('sign_up_form_id')))
+    smtp_task = asyncio.ensure_future(timer.run('smtp_login', email_delivery.open_smtp_pool))
+    pool_taken = False
+    try:
+        weather_info = await timer.run('forecast', fetch_forecast, district['zip_code'])
+        # The prediction reads the same metadata cache, so the lookup has to finish first
+        try:
+            await lookup_task
+        except Exception as ex:
+            logging.warning('The early assistant lookup failed, the prediction looks them up again: %s', ex)
+        prediction = await timer.run('prediction', general_functions.predict_snow_day,
+                                     district, weather_info, use_cache)
+        email_message = prediction['message']
+        prediction_id = await timer.run('write_prediction', general_functions.record_prediction,
+                                        district, weather_info, prediction)
+
+        send = email_helpers.should_send_email(prediction)
+        if send:
+            logging.info('Chance of a snow day is at least %s%%', settings.SNOW_DAY_PROBABILITY_THRESHOLD)
+        else:
+            logging.info('There is a less than %s percent chance of a snow day. Not sending emails.',
+                         settings.SNOW_DAY_PROBABILITY_THRESHOLD)
+            if settings.TESTING_MODE:
+                logging.info('Application is in testing mode, sending the email anyways!')
+                # TESTING ONLY: Send email even if the snow day chance is low
+                send = True
+
+        if send:
+            recipients = await recipients_task
+            logging.info('Sending to %s recipients', len(recipients))
+            pool_taken = True
+            try:
+                pool = await smtp_task
+            except Exception as ex:
+                # Sending opens its own pool and reports the login failure per recipient
+                logging.warning('The early SMTP login failed, logging in again to send: %s', ex)
+                pool = None
+            results = await timer.run('send', email_helpers.send_emails, recipients, email_message, pool)
+            delivered = sum(1 for result in results.values() if result['delivered'])
+            prediction_store.append_delivery(prediction_id, delivered, len(results) - delivered)
+        return prediction
+    finally:
+        await _discard(lookup_task)
+        await _discard(recipients_task)
+        if not pool_taken:
+            await _discard(smtp_task, close=lambda pool: pool.close())
+        executor.shutdown(wait=False)
+        summary = timer.summary()
+        logging.info('Pipeline stage timings:\n%s', summary)
+        print(summary)
+
+def run(district=None, use_cache=None, timeouts=None):
+    """
+    Runs the pipeline on a new event loop. See run_pipeline().
+    """
+    return asyncio.run(run_pipeline(district, use_cache, timeouts))
@@ -0,0 +1,447 @@
+"""
+Prediction Server Module
+
+This module serves the latest prediction and the recent prediction history over
+HTTP straight from the prediction store, so the site doesn't have to wait for
+prediction.txt to be committed and deployed.
+
+Routes (all take an optional ?district=<id>, defaulting to the school in settings):
+- /api/prediction: The newest prediction for the coming school day as JSON. Until
+  settings.WATCH_END_HOUR that is today, from then on tomorrow.
+- /api/history: The newest prediction for each of the last settings.SERVER_HISTORY_DAYS
+  school days as JSON (?days=N for fewer).
+- /prediction.txt: The newest prediction's message as text, like the committed file.
+- POST /api/feedback: Records an "Are you confident?" vote (district, date and vote
+  'yes' or 'no', as a form or JSON body) and answers 202 with the school day's counts.
+- GET /api/feedback?district=<id>&date=<ISO date>: The live counts of a school day's votes.
+
+Every response body is built once and kept in memory together with its gzip (and,
+if the brotli package is installed, brotli) compressed copies and a strong ETag per
+encoding. Requests pick the best encoding from Accept-Encoding and get a 304 when
+If-None-Match matches, so a storm-night spike is served without touching SQLite
+or compressing anything. The store is checked for new predictions or deliveries
+at most every settings.SERVER_REFRESH_SECONDS, which drops the cached bodies.
+
+Votes go into a feedback_store.VoteBuffer: they are counted in memory straight away
+and written to the feedback store in batches, so a burst of votes never waits on
+SQLite. The counts are served from memory too.
+
+Usage:
+    python main.py --serve [--port 8000]
+
+Dependencies:
+- gzip, hashlib, json: To build, compress and tag the response bodies.
+- logging: To log application events and errors.
+- threading, time: To share and refresh the cache across request threads.
+- datetime: To format timestamps and history ranges.
+- http.server, urllib.parse: For the threaded HTTP server and query strings.
+- pytz: For the school's timezone.
+- brotli (optional): For the brotli compressed bodies.
+- general_functions: For the districts, the prediction store and the feedback store.
+- settings: To access application-specific settings.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+from general_functions import districts
+from general_functions import feedback_store
+from general_functions import prediction_store
+from settings import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content encodings in order of preference
+ENCODINGS = ('br', 'gzip')
+
+FEEDBACK_PATH = '/api/feedback'
+
+JSON_CONTENT_TYPE = 'application/json; charset=utf-8'
+TEXT_CONTENT_TYPE = 'text/plain; charset=utf-8'
+
+class NotFound(Exception):
+    """
+    Raised by a route when the district has no predictions yet.
+    """
+
+def _format_time(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat(timespec='seconds')
+
+def _to_json(payload):
+    return JSON_CONTENT_TYPE, json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def _get_latest(district_id, target_date):
+    latest = prediction_store.get_latest_prediction(district_id, target_date)
+    if latest is None:
+        # Before the nightly run, the last school day that was predicted
+        start_date = datetime.date.fromisoformat(target_date) - datetime.timedelta(days=settings.SERVER_HISTORY_DAYS)
+        predictions = prediction_store.get_predictions(district_id, start_date.isoformat(), target_date)
+        latest = predictions[-1] if predictions else None
+    if latest is None:
+        raise NotFound(f'No prediction for {district_id} yet')
+    return latest
+
+def build_prediction(district_id, days, target_date):
+    """
+    Builds the /api/prediction body: the district's newest prediction for the coming school day.
+    """
+    latest = _get_latest(district_id, target_date)
+    return _to_json({
+        'district': district_id,
+        'target_date': latest['target_date'],
+        'probability': latest['probability'],
+        'rationale': latest['rationale'],
+        'message': latest['message'],
+        'source': latest['source'],
+        'created_at': _format_time(latest['created_at']),
+    })
+
+def build_history(district_id, days, target_date):
+    """
+    Builds the /api/history body: the newest prediction for each of the last days school days.
+    """
+    end_date = datetime.date.fromisoformat(_get_latest(district_id, target_date)['target_date'])
+    start_date = end_date - datetime.timedelta(days=days - 1)
+    predictions = prediction_store.get_predictions(district_id, start_date.isoformat(), end_date.isoformat())
+    return _to_json({
+        'district': district_id,
+        'predictions': [{
+            'target_date': prediction['target_date'],
+            'probability': prediction['probability'],
+            'rationale': prediction['rationale'],
+            'created_at': _format_time(prediction['created_at']),
+        } for prediction in reversed(predictions)],
+    })
+
+def build_prediction_text(district_id, days, target_date):
+    """
+    Builds the /prediction.txt body: the newest prediction's message.
+    """
+    return TEXT_CONTENT_TYPE, _get_latest(district_id, target_date)['message'].encode('utf-8')
+
+ROUTES = {
+    '/api/prediction': build_prediction,
+    '/api/history': build_history,
+    '/prediction.txt': build_prediction_text,
+}
+
+def make_entry(content_type, body):
+    """
+    Builds a cached response: the body in every encoding that makes it smaller,
+    each with its own strong ETag (a strong ETag names the exact bytes sent).
+
+    Returns:
+        dict: 'content_type', and 'bodies' and 'etags' keyed by encoding (None for identity).
+    """
+    bodies = {None: body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        bodies['br'] = brotli.compress(body, quality=11)
+    bodies = {encoding: data for encoding, data in bodies.items() if encoding is None or len(data) < len(body)}
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    return {
+        'content_type': content_type,
+        'bodies': bodies,
+        'etags': {encoding: f'"{digest}-{encoding}"' if encoding else f'"{digest}"' for encoding in bodies},
+    }
+
+def choose_encoding(accept_encoding, available):
+    """
+    Picks the preferred encoding the client accepts from an Accept-Encoding header.
+    Returns None for the identity encoding.
+    """
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, parameters = part.partition(';')
+        quality = 1.0
+        parameters = parameters.strip()
+        if parameters.startswith('q='):
+            try:
+                quality = float(parameters[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in ENCODINGS:
+        if encoding in available and accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+def etag_matches(if_none_match, etag):
+    """
+    Checks an If-None-Match header against an ETag (weak comparison, as RFC 9110 asks).
+    """
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.replace('W/', '', 1) == etag:
+            return True
+    return False
+
+def _get_today():
+    import pytz
+    return datetime.datetime.now(pytz.timezone(settings.SCHOOL_TIMEZONE)).date()
+
+def parse_vote(body, content_type, district_ids, today=None):
+    """
+    Reads and checks a vote from a request body.
+
+    Args:
+        body (bytes): The body, form encoded or JSON.
+        content_type (str): The request's Content-Type header.
+        district_ids (set): The known districts.
+        today (date, optional): Today in the school's timezone.
+
+    Returns:
+        tuple: The district, the school day (ISO date) and the vote.
+
+    Raises:
+        ValueError: If the vote is malformed, for an unknown district or for a
+            school day further than settings.FEEDBACK_MAX_AGE_DAYS from today.
+    """
+    if content_type.startswith('application/json'):
+        fields = json.loads(body.decode('utf-8'))
+        if not isinstance(fields, dict):
+            raise ValueError('The vote must be a JSON object')
+    else:
+        fields = {name: values[0] for name, values in parse_qs(body.decode('utf-8')).items()}
+    district_id = str(fields.get('district') or settings.DISTRICT_ID)
+    vote = str(fields.get('vote', '')).lower()
+    if district_id not in district_ids:
+        raise ValueError(f'Unknown district {district_id}')
+    if vote not in feedback_store.VOTES:
+        raise ValueError(f'The vote must be one of {", ".join(feedback_store.VOTES)}')
+    target_date = datetime.date.fromisoformat(str(fields.get('date', '')))
+    if abs((target_date - (today or _get_today())).days) > settings.FEEDBACK_MAX_AGE_DAYS:
+        raise ValueError(f'Votes for {target_date} are closed')
+    return district_id, target_date.isoformat(), vote
+
+class ResponseCache:
+    """
+    Keeps the built responses in memory, keyed by route, district, days and the
+    school day being served (so the responses roll over with it). The
+    prediction store is checked for changes at most every refresh_seconds; a
+    change drops every cached response so the next request rebuilds it.
+    """
+
+    def __init__(self, refresh_seconds=None):
+        self.refresh_seconds = settings.SERVER_REFRESH_SECONDS if refresh_seconds is None else refresh_seconds
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._last_change = None
+        self._checked_at = float('-inf')
+
+    def _check_store(self):
+        if time.monotonic() - self._checked_at < self.refresh_seconds:
+            return
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.refresh_seconds:
+                return
+            last_change = prediction_store.get_last_change()
+            if last_change != self._last_change:
+                if self._last_change is not None:
+                    logging.info('The prediction store changed, rebuilding the cached responses')
+                self._last_change = last_change
+                self._entries = {}
+            self._checked_at = time.monotonic()
+
+    def get(self, path, district_id, days):
+        """
+        Returns the cached response for a route, building it on first use.
+
+        Raises:
+            NotFound: If the district has no predictions yet.
+        """
+        self._check_store()
+        target_date = prediction_store.get_school_day()
+        key = (path, district_id, days, target_date)
+        entry = self._entries.get(key)
+        if entry is None:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = make_entry(*ROUTES[path](district_id, days, target_date))
+                    self._entries[key] = entry
+        return entry
+
+class PredictionRequestHandler(BaseHTTPRequestHandler):
+    """
+    Answers GET and HEAD requests from the server's ResponseCache.
+    """
+    protocol_version = 'HTTP/1.1'
+    server_version = 'Blizzard'
+    # The headers and body are separate writes; with Nagle on, keep-alive clients wait on a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.partition('?')[0] == FEEDBACK_PATH:
+            self._send_feedback_counts()
+        else:
+            self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def do_POST(self):
+        if self.path.partition('?')[0] != FEEDBACK_PATH:
+            self._send_error(404, f'Unknown path {self.path}', True)
+            return
+        length = self.headers.get('Content-Length', '0')
+        if not length.isdigit():
+            self.close_connection = True
+            self._send_error(411, 'The vote needs a Content-Length', True)
+            return
+        length = int(length)
+        if length > settings.FEEDBACK_MAX_BODY_BYTES:
+            # The body is left unread, so the connection can't be reused
+            self.close_connection = True
+            self._send_error(413, 'The vote is too large', True)
+            return
+        body = self.rfile.read(length)
+        try:
+            district_id, target_date, vote = parse_vote(body, self.headers.get('Content-Type', ''),
+                                                        self.server.district_ids)
+        except ValueError as ex:
+            self._send_error(400, str(ex), True)
+            return
+        counts = self.server.feedback.add(district_id, target_date, vote)
+        if counts is None:
+            self._send_error(503, 'Votes are not being accepted right now', True)
+            return
+        self._send_json(202, {'district': district_id, 'date': target_date, 'counts': counts})
+
+    def do_OPTIONS(self):
+        # The CORS preflight for JSON votes from the site
+        self.send_response(204)
+        self.send_header('Access-Control-Allow-Origin', settings.SERVER_ALLOWED_ORIGIN)
+        self.send_header('Access-Control-Allow-Methods', 'GET, HEAD, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Max-Age', '86400')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _send_common_headers(self, etag):
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', f'public, max-age={settings.SERVER_MAX_AGE_SECONDS}')
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Access-Control-Allow-Origin', settings.SERVER_ALLOWED_ORIGIN)
+        self.send_header('Access-Control-Expose-Headers', 'ETag')
+
+    def _send_error(self, status, message, send_body):
+        self._send_json(status, {'error': message}, send_body)
+
+    def _send_json(self, status, payload, send_body=True):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', JSON_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.send_header('Access-Control-Allow-Origin', settings.SERVER_ALLOWED_ORIGIN)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _send_feedback_counts(self):
+        params = parse_qs(self.path.partition('?')[2])
+        district_id = params.get('district', [settings.DISTRICT_ID])[0]
+        try:
+            target_date = datetime.date.fromisoformat(params.get('date', [''])[0]).isoformat()
+        except ValueError:
+            self._send_error(400, 'The date must be an ISO date', True)
+            return
+        self._send_json(200, {'district': district_id, 'date': target_date,
+                              'counts': self.server.feedback.get_counts(district_id, target_date)})
+
+    def _respond(self, send_body):
+        path, _, query = self.path.partition('?')
+        if path not in ROUTES:
+            self._send_error(404, f'Unknown path {path}', send_body)
+            return
+        params = parse_qs(query)
+        district_id = params.get('district', [settings.DISTRICT_ID])[0]
+        if district_id not in self.server.district_ids:
+            self._send_error(404, f'Unknown district {district_id}', send_body)
+            return
+        # Only known values make it into the cache key, so odd query strings can't grow the cache
+        days = settings.SERVER_HISTORY_DAYS
+        if path == '/api/history' and params.get('days', [''])[0].isdigit():
+            days = max(1, min(days, int(params['days'][0])))
+        try:
+            entry = self.server.cache.get(path, district_id, days)
+        except NotFound as ex:
+            self._send_error(404, str(ex), send_body)
+            return
+        except Exception as ex:
+            logging.error('Could not build the response for %s: %s', self.path, ex)
+            self._send_error(500, 'The prediction is unavailable', send_body)
+            return
+
+        encoding = choose_encoding(self.headers.get('Accept-Encoding', ''), entry['bodies'])
+        etag = entry['etags'][encoding]
+        if etag_matches(self.headers.get('If-None-Match', ''), etag):
+            self.send_response(304)
+            self._send_common_headers(etag)
+            self.end_headers()
+            return
+
+        body = entry['bodies'][encoding]
+        self.send_response(200)
+        self.send_header('Content-Type', entry['content_type'])
+        self.send_header('Content-Length', str(len(body)))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self._send_common_headers(etag)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+def make_server(host=None, port=None, cache=None, feedback=None):
+    """
+    Creates the threaded prediction server (without starting it).
+
+    Args:
+        host (str, optional): The address to bind. Defaults to settings.SERVER_HOST.
+        port (int, optional): The port to bind (0 picks a free one). Defaults to settings.SERVER_PORT.
+        cache (ResponseCache, optional): The response cache. Defaults to a new one.
+        feedback (VoteBuffer, optional): The vote buffer. Defaults to a new one, with the
+            counts of the school days still open for votes.
+
+    Returns:
+        ThreadingHTTPServer: The server, with the cache, the vote buffer and the known
+        district IDs as its cache, feedback and district_ids attributes. Close the vote
+        buffer when the server stops, so the waiting votes are written.
+    """
+    host = settings.SERVER_HOST if host is None else host
+    port = settings.SERVER_PORT if port is None else port
+    server = ThreadingHTTPServer((host, port), PredictionRequestHandler)
+    server.daemon_threads = True
+    server.cache = cache or ResponseCache()
+    start_date = _get_today() - datetime.timedelta(days=settings.FEEDBACK_MAX_AGE_DAYS)
+    server.feedback = feedback or feedback_store.VoteBuffer(start_date=start_date.isoformat())
+    server.district_ids = {district['id'] for district in districts.get_batch_districts()}
+    return server
+
+def run_server(host=None, port=None):
+    """
+    Serves predictions until interrupted.
+    """
+    server = make_server(host, port)
+    logging.info('Serving predictions on http://%s:%s (brotli %s)', *server.server_address[:2],
+                 'enabled' if brotli is not None else 'not installed')
+    print(f'Serving predictions on http://{server.server_address[0]}:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info('Prediction server stopped')
+    finally:
+        server.server_close()
+        server.feedback.close()
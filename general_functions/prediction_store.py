@@ -0,0 +1,197 @@
+"""
+Prediction Store Module
+
+This module keeps the history of every prediction in an append-only SQLite
+database, indexed by district and target date (the school day the prediction
+is for). Each prediction row holds the weather features it was made from, the
+probability, rationale and message, where it came from (assistant, cache or
+pre-screen), the model and how long it took. Email deliveries are appended to
+their own table against the prediction they sent, so rows are never updated.
+The forecast snapshot a prediction was made from (see weatherapi.forecast_delta)
+can be stored alongside it, so the multi-day outlook can tell whether a school
+day's forecast changed since it was last predicted.
+
+prediction.txt is rendered from the newest stored prediction (see
+general_functions.record_prediction()), and a whole season of predictions
+for a district is a single indexed range query.
+
+Dependencies:
+- datetime, pytz: To find the target date in the school's timezone.
+- json: To store the weather features.
+- threading: To keep writes safe across worker threads.
+- time: To timestamp rows.
+- general_functions.storage: To open the SQLite store.
+- settings: To access application-specific settings.
+"""
+
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from general_functions import storage
+from settings import settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    district TEXT NOT NULL,
+    target_date TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    probability REAL,
+    rationale TEXT NOT NULL,
+    message TEXT NOT NULL,
+    source TEXT,
+    model TEXT,
+    latency_seconds REAL,
+    features TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS predictions_by_district_date ON predictions (district, target_date, created_at);
+CREATE TABLE IF NOT EXISTS deliveries (
+    prediction_id INTEGER NOT NULL REFERENCES predictions (id),
+    created_at REAL NOT NULL,
+    delivered INTEGER NOT NULL,
+    failed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deliveries_by_prediction ON deliveries (prediction_id);
+CREATE TABLE IF NOT EXISTS forecast_snapshots (
+    prediction_id INTEGER PRIMARY KEY REFERENCES predictions (id),
+    snapshot TEXT NOT NULL
+);
+"""
+
+PREDICTION_COLUMNS = ('id', 'district', 'target_date', 'created_at', 'probability', 'rationale', 'message',
+                      'source', 'model', 'latency_seconds', 'features', 'delivered')
+
+# Deliveries are summed per prediction so a prediction sent in several passes reports its total
+SELECT_PREDICTIONS = """
+SELECT p.id, p.district, p.target_date, p.created_at, p.probability, p.rationale, p.message,
+       p.source, p.model, p.latency_seconds, p.features,
+       (SELECT SUM(d.delivered) FROM deliveries d WHERE d.prediction_id = p.id)
+FROM predictions p
+"""
+
+_lock = threading.Lock()
+
+def open_store(path=None):
+    """
+    Opens the prediction store (creating it if needed), commits when the block
+    succeeds and closes the connection afterwards.
+    """
+    return storage.open_sqlite(path or settings.PREDICTION_STORE_PATH, SCHEMA)
+
+def get_target_date(now=None):
+    """
+    Returns the school day a prediction made now is for: the next day in the school's timezone.
+    """
+    import pytz
+    now = now or datetime.now(pytz.timezone(settings.SCHOOL_TIMEZONE))
+    return (now.date() + timedelta(days=1)).isoformat()
+
+def get_school_day(now=None, end_hour=None):
+    """
+    Returns the school day people are asking about now: today until end_hour
+    (settings.WATCH_END_HOUR) in the school's timezone, tomorrow from then on.
+    """
+    import pytz
+    now = now or datetime.now(pytz.timezone(settings.SCHOOL_TIMEZONE))
+    end_hour = settings.WATCH_END_HOUR if end_hour is None else end_hour
+    return now.date().isoformat() if now.hour < end_hour else get_target_date(now)
+
+def _to_dict(row):
+    prediction = dict(zip(PREDICTION_COLUMNS, row))
+    prediction['features'] = json.loads(prediction['features'])
+    return prediction
+
+def append_prediction(district_id, prediction, features, target_date=None, snapshot=None):
+    """
+    Appends a prediction to the store.
+
+    Args:
+        district_id (str): The district the prediction is for.
+        prediction (dict): The structured prediction from predict_snow_day().
+        features (dict): The weather features the prediction was made from.
+        target_date (str, optional): The school day (ISO date). Defaults to get_target_date().
+        snapshot (dict, optional): The forecast snapshot the prediction was made from.
+
+    Returns:
+        int: The ID of the stored prediction.
+    """
+    with _lock, open_store() as connection:
+        cursor = connection.execute(
+            """
+            INSERT INTO predictions (district, target_date, created_at, probability, rationale, message,
+                                     source, model, latency_seconds, features)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (district_id, target_date or get_target_date(), time.time(), prediction.get('probability'),
+             prediction.get('rationale', ''), prediction['message'], prediction.get('source'),
+             prediction.get('model'), prediction.get('latency_seconds'), json.dumps(features, default=str))
+        )
+        if snapshot is not None:
+            connection.execute('INSERT INTO forecast_snapshots (prediction_id, snapshot) VALUES (?, ?)',
+                               (cursor.lastrowid, json.dumps(snapshot)))
+        return cursor.lastrowid
+
+def append_delivery(prediction_id, delivered, failed):
+    """
+    Records how many emails a stored prediction was delivered to.
+    """
+    with _lock, open_store() as connection:
+        connection.execute('INSERT INTO deliveries (prediction_id, created_at, delivered, failed) VALUES (?, ?, ?, ?)',
+                           (prediction_id, time.time(), delivered, failed))
+
+def get_latest_prediction(district_id, target_date=None):
+    """
+    Returns the newest stored prediction for a district (for the given target date,
+    if any), or None if there isn't one.
+    """
+    query = f'{SELECT_PREDICTIONS} WHERE p.district = ?'
+    parameters = (district_id,)
+    if target_date:
+        query += ' AND p.target_date = ?'
+        parameters += (target_date,)
+    with open_store() as connection:
+        row = connection.execute(f'{query} ORDER BY p.target_date DESC, p.created_at DESC LIMIT 1',
+                                 parameters).fetchone()
+    return _to_dict(row) if row else None
+
+def get_last_change():
+    """
+    Returns a token that changes whenever a prediction or delivery is appended:
+    the newest prediction ID and the number of deliveries.
+    """
+    with open_store() as connection:
+        return connection.execute(
+            'SELECT (SELECT MAX(id) FROM predictions), (SELECT COUNT(*) FROM deliveries)').fetchone()
+
+def get_snapshot(prediction_id):
+    """
+    Returns the forecast snapshot a stored prediction was made from, or None if it wasn't stored.
+    """
+    with open_store() as connection:
+        row = connection.execute('SELECT snapshot FROM forecast_snapshots WHERE prediction_id = ?',
+                                 (prediction_id,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def get_predictions(district_id, start_date, end_date, latest_only=True):
+    """
+    Returns a district's predictions for the target dates from start_date to end_date (inclusive).
+
+    Args:
+        district_id (str): The district.
+        start_date (str): The first target date (ISO date).
+        end_date (str): The last target date (ISO date).
+        latest_only (bool): Only return the newest prediction for each target date.
+
+    Returns:
+        list of dict: The predictions, oldest target date first.
+    """
+    query = f'{SELECT_PREDICTIONS} WHERE p.district = ? AND p.target_date BETWEEN ? AND ?'
+    if latest_only:
+        query += """
+            AND p.created_at = (SELECT MAX(latest.created_at) FROM predictions latest
+                                WHERE latest.district = p.district AND latest.target_date = p.target_date)
+        """
+    query += ' ORDER BY p.target_date, p.created_at'
+    with open_store() as connection:
+        return [_to_dict(row) for row in connection.execute(query, (district_id, start_date, end_date))]
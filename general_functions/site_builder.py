@@ -0,0 +1,241 @@
+"""
+Site Builder Module
+
+This module pre-renders the prediction pages of the site. index.html fills in the
+prediction and the date with JavaScript once the page has loaded, which costs an
+extra request and moves the page around before parents see the answer. The built
+pages have the prediction, the school day and the recent history in the HTML.
+
+Every time a prediction is recorded (see general_functions.record_prediction()),
+the district's page is written to settings.SITE_DIRECTORY/<district>/index.html.
+GitHub Pages serves the root directory, so the default district's page is also
+written to settings.SITE_INDEX_PAGE (index.html), the page the site opens on.
+The page template is HTML/prediction_template.html.
+
+The stylesheets in settings.SITE_ASSETS are minified and written to
+settings.SITE_DIRECTORY/assets with a hash of their content in the file name
+(style.<hash>.css), so they can be cached for as long as the host allows: a
+changed stylesheet gets a new name. Hashed files no page refers to any more are
+removed. When settings.SITE_FEEDBACK_URL is set, js/feedbackButtons.js is built
+the same way and the page's confidence buttons send their votes there.
+
+Usage:
+    python -m general_functions.site_builder    Rebuilds the page of every district.
+
+Dependencies:
+- datetime: To format the school day and the update time.
+- hashlib: To hash the asset contents.
+- html: To escape the prediction text.
+- logging: To log application events and errors.
+- os, re: For the files and the minification.
+- threading: To name the temporary files of concurrent builds apart.
+- string: For the page template.
+- pytz: For the school's timezone.
+- general_functions: For the districts, the prediction store and the root directory.
+- settings: To access application-specific settings.
+"""
+
+import datetime
+import hashlib
+import html
+import logging
+import os
+import re
+import threading
+from string import Template
+from general_functions import districts
+from general_functions import prediction_store
+from general_functions import storage
+from settings import settings
+
+TEMPLATE_PATH = os.path.join(storage.ROOT_DIRECTORY, 'HTML', 'prediction_template.html')
+ASSETS_DIRECTORY = 'assets'
+FEEDBACK_SCRIPT = 'js/feedbackButtons.js'
+
+HASHED_ASSET = re.compile(r'^.+\.[0-9a-f]{10}\.(css|js)$')
+CSS_STRING = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')')
+
+def minify_css(text):
+    """
+    Removes the comments and the whitespace a stylesheet doesn't need. Quoted
+    strings are left as they are.
+    """
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    # split() keeps the strings at the odd positions
+    parts = CSS_STRING.split(text)
+    for index in range(0, len(parts), 2):
+        part = re.sub(r'\s+', ' ', parts[index])
+        parts[index] = re.sub(r'\s*([{}:;,>])\s*', r'\1', part)
+    return ''.join(parts).replace(';}', '}').strip()
+
+def minify_html(text):
+    """
+    Removes the comments and the whitespace between tags of an HTML page. Only the
+    template is minified, so the prediction text keeps its line breaks.
+    """
+    text = re.sub(r'<!--.*?-->', '', text, flags=re.S)
+    text = re.sub(r'>\s+<', '><', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+def _write_file(path, content):
+    # Written next to the target and renamed, so a page is never served half written
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary_path, 'w', encoding='utf-8') as file:
+        file.write(content)
+    os.replace(temporary_path, path)
+
+def build_asset(source_path, site_directory):
+    """
+    Minifies an asset and writes it under a content-hashed name.
+
+    Args:
+        source_path (str): The asset, relative to the root directory.
+        site_directory (str): The absolute site directory.
+
+    Returns:
+        str: The hashed file name, relative to the site directory.
+    """
+    with open(os.path.join(storage.ROOT_DIRECTORY, source_path), encoding='utf-8') as file:
+        content = file.read()
+    stem, extension = os.path.splitext(os.path.basename(source_path))
+    if extension == '.css':
+        content = minify_css(content)
+    digest = hashlib.sha256(content.encode('utf-8')).hexdigest()[:10]
+    file_name = f'{ASSETS_DIRECTORY}/{stem}.{digest}{extension}'
+    path = os.path.join(site_directory, file_name)
+    if not os.path.exists(path):
+        _write_file(path, content)
+    return file_name
+
+def remove_stale_assets(site_directory, assets):
+    """
+    Removes the hashed assets that aren't in the current build.
+    """
+    assets_directory = os.path.join(site_directory, ASSETS_DIRECTORY)
+    current = {os.path.basename(file_name) for file_name in assets.values()}
+    for file_name in os.listdir(assets_directory):
+        if HASHED_ASSET.match(file_name) and file_name not in current:
+            os.remove(os.path.join(assets_directory, file_name))
+
+def get_index_path(site_directory):
+    """
+    Returns the absolute path of the page the Blizzard link goes to: settings.SITE_INDEX_PAGE,
+    or the default district's page when that is turned off.
+    """
+    if settings.SITE_INDEX_PAGE:
+        return os.path.join(storage.ROOT_DIRECTORY, settings.SITE_INDEX_PAGE)
+    return os.path.join(site_directory, settings.DISTRICT_ID, 'index.html')
+
+def get_asset_paths():
+    """
+    Returns the assets the pages use, relative to the root directory.
+    """
+    return tuple(settings.SITE_ASSETS) + ((FEEDBACK_SCRIPT,) if settings.SITE_FEEDBACK_URL else ())
+
+def _format_probability(probability):
+    return 'No prediction' if probability is None else f'{probability:g}%'
+
+def render_page(district, latest, history, assets, site_directory, page_directory):
+    """
+    Renders a district's prediction page.
+
+    Args:
+        district (dict): The district config.
+        latest (dict): The district's newest stored prediction.
+        history (list of dict): The newest prediction for each recent school day, newest first.
+        assets (dict): Asset source path -> hashed file name relative to the site directory.
+        site_directory (str): The absolute site directory.
+        page_directory (str): The absolute directory the page is written to (links are relative to it).
+
+    Returns:
+        str: The page.
+    """
+    import pytz
+    with open(TEMPLATE_PATH, encoding='utf-8') as file:
+        template = Template(minify_html(file.read()))
+    school_day = datetime.date.fromisoformat(latest['target_date'])
+    updated = datetime.datetime.fromtimestamp(latest['created_at'], pytz.timezone(settings.SCHOOL_TIMEZONE))
+
+    def link(path):
+        return os.path.relpath(path, page_directory).replace(os.sep, '/')
+
+    history_rows = ''.join(
+        f'<tr><td>{datetime.date.fromisoformat(prediction["target_date"]):%a %b %d}</td>'
+        f'<td>{_format_probability(prediction["probability"])}</td></tr>'
+        for prediction in history
+    )
+    return template.substitute(
+        school_name=html.escape(district['school_name']),
+        home=link(get_index_path(site_directory)),
+        root=link(storage.ROOT_DIRECTORY) + '/',
+        stylesheet=link(os.path.join(site_directory, assets[settings.SITE_ASSETS[0]])),
+        target_date=f'{school_day:%A, %B} {school_day.day}, {school_day.year}',
+        prediction=html.escape(latest['message']),
+        updated=f'{updated:%b} {updated.day}, {updated.hour % 12 or 12}:{updated:%M %p %Z}',
+        history_rows=history_rows,
+        feedback_script=(
+            f'<script src="{link(os.path.join(site_directory, assets[FEEDBACK_SCRIPT]))}" '
+            f'data-feedback-url="{html.escape(settings.SITE_FEEDBACK_URL)}" '
+            f'data-district="{html.escape(district["id"])}" data-date="{latest["target_date"]}"></script>'
+            if FEEDBACK_SCRIPT in assets else ''
+        ),
+    )
+
+def build_district_page(district, target_date=None, site_directory=None, assets=None):
+    """
+    Writes a district's prediction page (and the site's index page for the default district).
+
+    Args:
+        district (dict): The district config.
+        target_date (str, optional): The school day (ISO date) the page is about.
+            Defaults to tomorrow, so outlook predictions for later days don't replace it.
+        site_directory (str, optional): The site directory, relative to the root
+            directory. Defaults to settings.SITE_DIRECTORY.
+        assets (dict, optional): The built assets. Built if not passed in.
+
+    Returns:
+        str or None: The path of the district's page, or None if it has no prediction yet.
+    """
+    site_directory = os.path.join(storage.ROOT_DIRECTORY, site_directory or settings.SITE_DIRECTORY)
+    target_date = target_date or prediction_store.get_target_date()
+    latest = prediction_store.get_latest_prediction(district['id'], target_date)
+    if latest is None:
+        logging.info('No prediction for %s on %s, not building its page', district['id'], target_date)
+        return None
+    if assets is None:
+        assets = {source_path: build_asset(source_path, site_directory) for source_path in get_asset_paths()}
+        remove_stale_assets(site_directory, assets)
+
+    end_date = datetime.date.fromisoformat(latest['target_date'])
+    start_date = end_date - datetime.timedelta(days=settings.SITE_HISTORY_DAYS - 1)
+    history = prediction_store.get_predictions(district['id'], start_date.isoformat(), end_date.isoformat())
+    history.reverse()
+
+    page_directory = os.path.join(site_directory, district['id'])
+    _write_file(os.path.join(page_directory, 'index.html'),
+                render_page(district, latest, history, assets, site_directory, page_directory))
+    if district['id'] == settings.DISTRICT_ID and settings.SITE_INDEX_PAGE:
+        index_path = get_index_path(site_directory)
+        _write_file(index_path, render_page(district, latest, history, assets, site_directory,
+                                            os.path.dirname(index_path)))
+    logging.info('Built the prediction page for %s', district['id'])
+    return os.path.join(page_directory, 'index.html')
+
+def build_site(site_directory=None):
+    """
+    Rebuilds the page of every district and removes the stale assets.
+
+    Returns:
+        list of str: The paths of the pages that were built.
+    """
+    absolute_directory = os.path.join(storage.ROOT_DIRECTORY, site_directory or settings.SITE_DIRECTORY)
+    assets = {source_path: build_asset(source_path, absolute_directory) for source_path in get_asset_paths()}
+    pages = [build_district_page(district, site_directory=site_directory, assets=assets)
+             for district in districts.get_batch_districts()]
+    remove_stale_assets(absolute_directory, assets)
+    return [page for page in pages if page]
+
+if __name__ == '__main__':
+    for page in build_site():
+        print(page)
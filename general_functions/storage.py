@@ -0,0 +1,38 @@
+"""
+Storage Module
+
+This module holds what the modules that keep files on disk share: the root
+directory of the project, which every path in settings is relative to, and
+open_sqlite(), which opens the local SQLite stores.
+
+Dependencies:
+- contextlib: To open a store with a with block.
+- os: For file and directory operations.
+- sqlite3: For the stores.
+"""
+
+import os
+import sqlite3
+from contextlib import contextmanager
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@contextmanager
+def open_sqlite(path, schema):
+    """
+    Opens a SQLite store (creating it and its tables if needed), commits when the
+    block succeeds and closes the connection afterwards.
+
+    Args:
+        path (str): The store, relative to the root directory (or absolute).
+        schema (str): The CREATE ... IF NOT EXISTS statements of its tables.
+    """
+    path = os.path.join(ROOT_DIRECTORY, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    connection = sqlite3.connect(path)
+    try:
+        connection.executescript(schema)
+        with connection:
+            yield connection
+    finally:
+        connection.close()
@@ -10,12 +10,19 @@ Key Features:
 - Authentication using OAuth2 to ensure secure access to Google Forms data.
 - Ability to refresh expired tokens automatically.
 - Parsing of form responses to extract relevant data, such as email addresses and names.
+- Incremental, paginated sync of new responses into the local recipient store.
 
 Dependencies:
 - google.oauth2.credentials: For handling OAuth2 credentials.
 - google.auth.transport.requests: To make authorized requests.
-- requests: For making HTTP requests to the Google Forms API.
-- settings.app_secrets: To access application-specific secrets and configurations.
+- general_functions.http_client: For making HTTP requests to the Google Forms API
+  over the shared, pooled session (with retries).
+- requests: For the request exceptions.
+- google_functions.recipient_store: The local index of synced sign ups.
+- settings: To access application-specific settings.
+
+The Google and requests libraries are slow to import, so they are imported in the
+functions that use them and only load when sign ups are actually fetched.
 
 Note: 
 Ensure that the 'token.json' file with authentication credentials is present in the root directory 
@@ -25,79 +32,145 @@ before deploying.
 
 import logging
 import os.path
-import requests
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
+from google_functions import recipient_store
+from general_functions import http_client
+from settings import settings
 
 GOOGLE_FORMS_API_BASE_URL = "https://forms.googleapis.com/v1/forms"
+SCOPES = ["https://www.googleapis.com/auth/forms.responses.readonly"]
+# Using a placeholder for the key; replace with the actual key from your form
+NAME_ANSWER_KEY = '778b574a'
 
 def _load_credentials(scopes):
     """
     Load or refresh Google API credentials.
     """
+    from google.oauth2.credentials import Credentials
     creds = None
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', scopes)
+    if os.path.exists(settings.GOOGLE_TOKEN_PATH):
+        creds = Credentials.from_authorized_user_file(settings.GOOGLE_TOKEN_PATH, scopes)
     return creds
 
-def get_sign_up_responses():
+def _get_valid_credentials():
     """
-    Fetches sign-up responses from a specified Google Form.
-    
-    This function retrieves form responses using the Google Forms API.
-    It returns a dictionary where the keys are the emails of the respondents
-    and the values are their corresponding names.
-    
-    The method first checks for valid credentials and refreshes them if needed.
-    Then, it queries the Google Forms API and processes the received responses.
-    
-    Returns:
-        dict: A dictionary with emails as keys and names as values. 
-              If there are any errors or if no data is found, it'll return an empty dictionary.
-              
+    Loads the Google API credentials, refreshing and saving them if they expired.
+
     Raises:
         ValueError: If there are invalid or missing credentials.
-        requests.HTTPError: If there's an HTTP error when making the request.
-        ConnectionError: If there's a connection issue when making the request.
-        requests.Timeout: If the request times out.
     """
-    scopes = ["https://www.googleapis.com/auth/forms.responses.readonly"]
-    creds = _load_credentials(scopes)
+    creds = _load_credentials(SCOPES)
 
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-            with open('token.json', 'w', encoding="utf-8") as token:
+            from google.auth.transport.requests import Request
+            creds.refresh(Request(session=http_client.get_session()))
+            with open(settings.GOOGLE_TOKEN_PATH, 'w', encoding="utf-8") as token:
                 token.write(creds.to_json())
         else:
             raise ValueError("Invalid or missing credentials")
 
-    url = f"{GOOGLE_FORMS_API_BASE_URL}/{os.environ.get('GOOGLE_SIGN_UP_FORM_ID')}/responses"
+    return creds
+
+def _parse_response(resp):
+    """
+    Reads the email, name and last submitted time from one form response.
+    Returns None if the response is missing the email or name.
+    """
+    email_answer = resp.get('respondentEmail')
+    name_answer = resp.get('answers', {}).get(NAME_ANSWER_KEY, {}).get('textAnswers', {}).get('answers', [{}])[0].get('value')
+    if email_answer and name_answer:
+        return email_answer, name_answer, resp.get('lastSubmittedTime', '')
+    return None
+
+def fetch_form_responses(form_id, creds, since=None):
+    """
+    Fetches form responses, following every page of results.
+
+    Args:
+        form_id (str): The Google Form ID.
+        creds: Valid Google API credentials.
+        since (str, optional): Only responses submitted at or after this RFC3339 time are fetched.
+
+    Yields:
+        dict: Each form response.
+    """
+    url = f"{GOOGLE_FORMS_API_BASE_URL}/{form_id}/responses"
     headers = {
         'Authorization': f'Bearer {creds.token}',
         'Accept': 'application/json'
     }
+    params = {'pageSize': settings.GOOGLE_FORMS_PAGE_SIZE}
+    if since:
+        # Responses at exactly the last synced time are fetched again; upserts make that harmless
+        params['filter'] = f'timestamp >= {since}'
 
-    try:
-        logging.info("Fetching sign-up responses from Google Form.")
-        response = requests.get(url, headers=headers, timeout=30)
+    while True:
+        response = http_client.get(url, headers=headers, params=params)
         response.raise_for_status()
         data = response.json()
-        responses = data.get('responses', [])
-        email_to_name = {}
-        for resp in responses:
-            email_answer = resp.get('respondentEmail')
-            # Using a placeholder for the key; replace with the actual key from your form
-            name_answer_key = '778b574a'
-            name_answer = resp.get('answers', {}).get(name_answer_key, {}).get('textAnswers', {}).get('answers', [{}])[0].get('value')
-
-            if email_answer and name_answer:
-                email_to_name[email_answer] = name_answer
-
-        return email_to_name
-    except (requests.HTTPError, ConnectionError, requests.Timeout):
-        logging.error('Specific error in get_form_responses')
-    except Exception:
-        logging.error('Unexpected error in get_form_responses.')
-
-    return {}
+        for resp in data.get('responses', []):
+            yield resp
+
+        next_page_token = data.get('nextPageToken')
+        if not next_page_token:
+            break
+        params['pageToken'] = next_page_token
+
+def sync_sign_up_responses(form_id=None):
+    """
+    Fetches the sign ups submitted since the last sync and upserts them into the
+    local recipient store.
+
+    Args:
+        form_id (str, optional): The form to sync. Defaults to the
+            GOOGLE_SIGN_UP_FORM_ID environment variable.
+
+    Returns:
+        int: The number of sign ups fetched.
+
+    Raises:
+        ValueError: If there are invalid or missing credentials.
+        requests.RequestException: If the Forms API request fails.
+    """
+    form_id = form_id or os.environ.get('GOOGLE_SIGN_UP_FORM_ID')
+    since = recipient_store.get_last_submitted_time(form_id)
+    creds = _get_valid_credentials()
+
+    logging.info("Fetching sign-up responses from Google Form submitted since %s.", since)
+    recipients = []
+    for resp in fetch_form_responses(form_id, creds, since):
+        recipient = _parse_response(resp)
+        if recipient:
+            recipients.append(recipient)
+
+    last_submitted_time = max((submitted for _, _, submitted in recipients), default=since)
+    recipient_store.upsert_recipients(form_id, recipients, last_submitted_time)
+    logging.info("Synced %s sign-up responses.", len(recipients))
+    return len(recipients)
+
+def get_sign_up_responses(form_id=None):
+    """
+    Fetches sign-up responses from a specified Google Form.
+    The form ID defaults to the GOOGLE_SIGN_UP_FORM_ID environment variable.
+    
+    New responses are synced incrementally into the local recipient store, then
+    every stored sign up is read back from it. If the sync fails (missing
+    credentials, a Forms API outage, ...), the sign ups already in the store are
+    still returned.
+    
+    Returns:
+        dict: A dictionary with emails as keys and names as values. 
+              If there are any errors and nothing was synced before, it'll return an empty dictionary.
+    """
+    import requests
+    form_id = form_id or os.environ.get('GOOGLE_SIGN_UP_FORM_ID')
+    try:
+        sync_sign_up_responses(form_id)
+    except ValueError as ex:
+        logging.error('Could not sync sign-up responses: %s', ex)
+    except (requests.HTTPError, requests.ConnectionError, requests.Timeout) as ex:
+        logging.error('Specific error in get_form_responses: %s', ex)
+    except Exception as ex:
+        logging.error('Unexpected error in get_form_responses: %s', ex)
+
+    return recipient_store.get_recipients(form_id)
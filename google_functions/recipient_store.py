@@ -0,0 +1,103 @@
+"""
+Recipient Store Module
+
+This module keeps a local SQLite index of the people who signed up through the
+Google Form. Sign ups are upserted by normalized email address, and the time of
+the newest synced response is remembered per form so each sync only has to ask
+the Forms API for newer responses. Reading recipients is a local query, so a
+Forms API outage still leaves us with everyone who signed up before it.
+
+Dependencies:
+- threading: To keep writes safe across worker threads.
+- time: To record when a form was last synced.
+- general_functions.storage: To open the SQLite store.
+- settings: To access application-specific settings.
+"""
+
+import threading
+import time
+from general_functions import storage
+from settings import settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recipients (
+    form_id TEXT NOT NULL,
+    email TEXT NOT NULL,
+    name TEXT NOT NULL,
+    last_submitted_time TEXT NOT NULL,
+    PRIMARY KEY (form_id, email)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    form_id TEXT PRIMARY KEY,
+    last_submitted_time TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+"""
+
+_lock = threading.Lock()
+
+def normalize_email(email):
+    """
+    Normalizes an email address so the same person is only stored once.
+    """
+    return email.strip().lower()
+
+def open_store(path=None):
+    """
+    Opens the recipient store (creating it if needed), commits when the block
+    succeeds and closes the connection afterwards.
+    """
+    return storage.open_sqlite(path or settings.RECIPIENT_STORE_PATH, SCHEMA)
+
+def get_last_submitted_time(form_id):
+    """
+    Returns the newest response time synced for a form, or None if it was never synced.
+    """
+    with open_store() as connection:
+        row = connection.execute('SELECT last_submitted_time FROM sync_state WHERE form_id = ?',
+                                 (form_id,)).fetchone()
+    return row[0] if row else None
+
+def upsert_recipients(form_id, recipients, last_submitted_time):
+    """
+    Inserts or updates sign ups and records how far the form has been synced.
+
+    Args:
+        form_id (str): The Google Form ID.
+        recipients (list of tuple): (email, name, last submitted time) for each response.
+        last_submitted_time (str): The newest response time in this sync (RFC3339).
+    """
+    rows = [(form_id, normalize_email(email), name, submitted) for email, name, submitted in recipients]
+    with _lock, open_store() as connection:
+        # Only replace a stored sign up with a newer response from the same person
+        connection.executemany(
+            """
+            INSERT INTO recipients (form_id, email, name, last_submitted_time) VALUES (?, ?, ?, ?)
+            ON CONFLICT (form_id, email) DO UPDATE SET
+                name = excluded.name,
+                last_submitted_time = excluded.last_submitted_time
+            WHERE excluded.last_submitted_time >= recipients.last_submitted_time
+            """,
+            rows
+        )
+        if last_submitted_time:
+            connection.execute(
+                """
+                INSERT INTO sync_state (form_id, last_submitted_time, synced_at) VALUES (?, ?, ?)
+                ON CONFLICT (form_id) DO UPDATE SET
+                    last_submitted_time = MAX(sync_state.last_submitted_time, excluded.last_submitted_time),
+                    synced_at = excluded.synced_at
+                """,
+                (form_id, last_submitted_time, time.time())
+            )
+
+def get_recipients(form_id):
+    """
+    Returns every stored sign up for a form.
+
+    Returns:
+        dict: A dictionary with emails as keys and names as values.
+    """
+    with open_store() as connection:
+        rows = connection.execute('SELECT email, name FROM recipients WHERE form_id = ?', (form_id,))
+        return dict(rows.fetchall())
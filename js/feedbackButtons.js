@@ -0,0 +1,47 @@
+// Sends the "Are you confident in this prediction?" vote to the feedback endpoint
+// named by the script tag's data-feedback-url, then shows the counts so far.
+const feedbackScript = document.currentScript;
+
+document.addEventListener('DOMContentLoaded', function() {
+  const { feedbackUrl, district, date } = feedbackScript.dataset;
+  const storageKey = `blizzard-vote-${district}-${date}`;
+  const query = document.querySelector('.confidence-query span');
+  const buttons = [document.getElementById('yesButton'), document.getElementById('noButton')];
+
+  function showCounts(counts) {
+    const total = counts.yes + counts.no;
+    query.textContent = `Thanks for voting! ${counts.yes} of ${total} ${total === 1 ? 'parent is' : 'parents are'} confident.`;
+    buttons.forEach(button => { button.disabled = true; });
+  }
+
+  if (localStorage.getItem(storageKey)) {
+    fetch(`${feedbackUrl}?district=${encodeURIComponent(district)}&date=${encodeURIComponent(date)}`)
+      .then(response => response.json())
+      .then(body => showCounts(body.counts))
+      .catch(error => console.error('Error fetching the votes:', error));
+    return;
+  }
+
+  buttons.forEach(button => {
+    button.addEventListener('click', function() {
+      const vote = button.id === 'yesButton' ? 'yes' : 'no';
+      buttons.forEach(other => { other.disabled = true; });
+      // A form body keeps this a simple request, so the browser skips the CORS preflight
+      fetch(feedbackUrl, { method: 'POST', body: new URLSearchParams({ district, date, vote }) })
+        .then(response => {
+          if (!response.ok) {
+            throw new Error('Network response was not ok');
+          }
+          return response.json();
+        })
+        .then(body => {
+          localStorage.setItem(storageKey, vote);
+          showCounts(body.counts);
+        })
+        .catch(error => {
+          console.error('Error sending the vote:', error);
+          buttons.forEach(other => { other.disabled = false; });
+        });
+    });
+  });
+});
@@ -8,17 +8,31 @@ via email. For ease of testing and deployment, a TESTING flag is included to swi
 between hard-coded email recipients and those fetched from Google Forms.
 
 Functions:
-    - main(): The primary function which orchestrates the entire flow of the application.
+    - main(): The primary function which orchestrates the entire flow of the application
+      through general_functions.pipeline, running independent stages concurrently.
     - fetch_snow_day_policy(): Retrieves the policy related to snow days.
+    - predict_snow_day(): Pre-screens the weather and predicts the chance of a snow day.
     - create_snow_day_message(policy): Generates a message indicating the possibility of a snow day.
     - generate_email_content(message): Prepares the content for the notification email.
-    - should_send_email(message): Determines if the conditions warrant sending out a
-      snow day notification.
+    - should_send_email(prediction): Determines if the predicted probability warrants
+      sending out a snow day notification.
     - fetch_email_recipients(): Fetches email recipients based on the testing mode.
     - fetch_email_recipients_for_testing(): Provides hard-coded email recipients 
       for testing purposes.
     - send_emails(recipients, message): Sends out the snow day notification emails.
 
+Usage:
+    python main.py            Runs the prediction for the school in settings.
+    python main.py --batch    Runs the prediction for every district in settings.DISTRICTS.
+    python main.py --no-cache Ignores cached predictions and asks the assistant again.
+    python main.py --outlook [--days 5]
+                              Updates the rolling multi-day outlook, only predicting the
+                              school days whose forecast changed.
+    python main.py --watch    Keeps checking the forecast overnight and predicts again (and
+                              sends a follow-up) when the commute window or alerts change.
+    python main.py --serve [--port 8000]
+                              Serves the latest prediction and history as JSON.
+
 Dependencies:
     - weatherapi: Used to fetch and process weather-related data.
     - openai_actions: Interfaces with OpenAI's GPT for generating and analyzing messages.
@@ -30,41 +44,67 @@ Note:
     Before deploying to production, ensure the TESTING flag is set appropriately.
 """
 
+import argparse
 import logging
 from general_functions import general_functions
-from email_functions import email_helpers
-from settings import settings
+from general_functions import batch_runner
+from general_functions import pipeline
+from general_functions import metrics
+from general_functions import outlook
+from general_functions import overnight_watch
+from general_functions import prediction_server
 
-def main():
+def main(use_cache=None):
     """
     The main function serving as the application's entry point.
     Orchestrates the process of fetching weather data, determining snow day possibilities,
-    generating relevant messages, and sending emails.
+    generating relevant messages, and sending emails. The stages run through the
+    asyncio pipeline, which overlaps the recipient fetch, SMTP login and assistant
+    lookups with the prediction and prints a stage-timing breakdown at the end.
+
+    Args:
+        use_cache (bool, optional): Whether to reuse a cached prediction. Defaults to
+            settings.PREDICTION_CACHE_ENABLED.
     """
     logging.info('---- APPLICATION START ----')
 
     try:
-        snowday_message = general_functions.create_snow_day_message()
-        email_message = email_helpers.generate_email_content(snowday_message)
-        general_functions.write_prediction_to_file(email_message)
-
-        if email_helpers.should_send_email(email_message):
-            logging.info('Chance of a snow day is greater than 50%')
-            recipients = email_helpers.fetch_email_recipients()
-            email_helpers.send_emails(recipients, email_message)
-        else:
-            logging.info('There is a less than 50 percent chance of a snow day. Not sending emails.')
-            if settings.TESTING_MODE:
-                logging.info('Application is in testing mode, sending the email anyways!')
-                # TESTING ONLY: Send email even if the snow day chance is low
-                recipients = email_helpers.fetch_email_recipients_for_testing()
-                logging.info('Testing users: %s', recipients)
-                email_helpers.send_emails(recipients, email_message)
+        pipeline.run(use_cache=use_cache)
     except Exception as e:
         logging.error("An unexpected error occurred: %s", e)
+    finally:
+        metrics.flush()
 
     logging.info('---- APPLICATION END ----')
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Blizzard snow day predictor')
+    parser.add_argument('--batch', action='store_true',
+                        help='run the prediction for every district in settings.DISTRICTS')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='ignore cached predictions and ask the assistant again')
+    parser.add_argument('--outlook', action='store_true',
+                        help='update the rolling multi-day outlook instead of the nightly prediction')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep checking the forecast overnight and follow up when it changes')
+    parser.add_argument('--serve', action='store_true',
+                        help='serve the latest prediction and history over HTTP')
+    parser.add_argument('--port', type=int, help='port for --serve (defaults to settings.SERVER_PORT)')
+    parser.add_argument('--days', type=int, help='school days in the outlook (defaults to settings.OUTLOOK_DAYS)')
+    args = parser.parse_args()
+    use_cache = False if args.no_cache else None
+
     general_functions.configure_logging()
-    main()
+    if args.outlook:
+        try:
+            outlook.run_outlook(days=args.days, use_cache=use_cache)
+        finally:
+            metrics.flush()
+    elif args.serve:
+        prediction_server.run_server(port=args.port)
+    elif args.watch:
+        overnight_watch.run_watch(use_cache=use_cache)
+    elif args.batch:
+        batch_runner.run_batch(use_cache=use_cache)
+    else:
+        main(use_cache)
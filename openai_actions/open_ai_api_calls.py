@@ -13,9 +13,12 @@ Key Features:
 Dependencies:
 - json: Utilized for parsing and constructing JSON payloads.
 - logging: Employed for logging application events and errors.
+- threading: So only one thread uploads the snow day factor file at a time.
 - requests: Required for making HTTP requests to OpenAI's API endpoints.
 (Note: Include this only if your module directly makes HTTP requests)
-- openai: The official Python client provided by OpenAI.
+- openai: The official Python client provided by OpenAI. It is by far the slowest
+  import of a run, so it is imported inside the functions that make API calls and
+  only loads once a call is actually made (cached assistant and file IDs don't need it).
 - settings: A module to access application-specific settings (from 'settings' package).
 - general_functions: A module comprising utility functions for the
 application (from 'general_functions' package).
@@ -34,8 +37,18 @@ Version: [Version of your module]
 """
 import os
 import logging
-import openai
+import threading
+import time
 from settings import settings
+from openai_actions import open_ai_metadata_cache as metadata_cache
+from general_functions import metrics
+
+# Run statuses after which the run will not make any more progress on its own
+RUN_END_STATUSES = ('completed', 'failed', 'cancelled', 'expired', 'requires_action')
+
+# Held while the factor file upload is checked or made, so worker threads with a
+# cold cache wait for one upload instead of each making (and cleaning up) their own
+_upload_lock = threading.Lock()
 
 def generate_chat_response(json_message):
     """
@@ -49,6 +62,7 @@ def generate_chat_response(json_message):
     Returns:
     str or None: The chat response with newline characters removed, or None if an error occurs.
     """
+    import openai
     try:
         logging.info('Generating the OpenAI chat completion message')
         openai.api_key = os.environ.get("OPENAI_API_KEY")
@@ -78,16 +92,41 @@ def get_assistant():
     Fetches the ID of the assistant named 'Blizzard' or
     'Blizzard_Testing' based on the testing mode.
 
+    The ID is kept in the local metadata cache. A cached ID is used as-is until it
+    is older than settings.OPENAI_METADATA_VALIDATION_SECONDS, then it is checked
+    with a single retrieve call. The full assistant list is only fetched when there
+    is no valid cached ID.
+
     Returns:
         str: The ID of the relevant assistant, or None if not found.
     """
     # Determine the name of the assistant based on the testing mode
     target_assistant_name = 'Blizzard_Testing' if settings.TESTING_MODE else 'Blizzard'
+
+    cached_assistant = metadata_cache.load_metadata()['assistants'].get(target_assistant_name)
+    if cached_assistant and not metadata_cache.needs_validation(cached_assistant):
+        return cached_assistant['id']
+
+    import openai
+    if cached_assistant:
+        try:
+            assistant = openai.beta.assistants.retrieve(cached_assistant['id'])
+            if assistant.name == target_assistant_name:
+                metadata_cache.update_metadata('assistants', target_assistant_name,
+                                               {'id': assistant.id, 'validated_at': time.time()})
+                return assistant.id
+        except openai.NotFoundError:
+            pass
+        logging.info("Cached assistant ID for '%s' is no longer valid", target_assistant_name)
+        metadata_cache.update_metadata('assistants', target_assistant_name, None)
+
     current_assistants = openai.beta.assistants.list()
 
     # Search for the assistant by name
     for assistant in current_assistants.data:
         if assistant.name == target_assistant_name:
+            metadata_cache.update_metadata('assistants', target_assistant_name,
+                                           {'id': assistant.id, 'validated_at': time.time()})
             return assistant.id
 
     # Log if the assistant was not found
@@ -104,6 +143,7 @@ def create_thread():
     Returns:
         openai.Thread: The created thread object.
     """
+    import openai
     thread = openai.beta.threads.create()
     return thread
 
@@ -120,6 +160,7 @@ def add_message_to_thread(thread_id, content):
     Returns:
         openai.ThreadMessage: The created message object.
     """
+    import openai
     file_ids = []
     file_id = get_helping_files()
     file_ids.append(file_id)
@@ -144,6 +185,7 @@ def run_assistant_on_thread(thread_id, assistant_id, instructions=None):
     Returns:
         openai.Run: The Run object created by executing the assistant.
     """
+    import openai
     run = openai.beta.threads.runs.create(
         thread_id=thread_id,
         assistant_id=assistant_id,
@@ -163,12 +205,110 @@ def check_run_status(thread_id, run_id):
     Returns:
         str: The status of the run ('queued', 'running', 'succeeded', 'failed', etc.).
     """
+    import openai
     run_status = openai.beta.threads.runs.retrieve(
         thread_id=thread_id,
         run_id=run_id
     )
     return run_status.status
 
+def wait_for_run_completion(thread_id, run_id, timeout_seconds=None):
+    """
+    Waits for a run to finish by polling its status with adaptive backoff.
+
+    Polling starts at settings.ASSISTANT_RUN_POLL_INITIAL_SECONDS and the interval grows
+    by settings.ASSISTANT_RUN_POLL_BACKOFF up to settings.ASSISTANT_RUN_POLL_MAX_SECONDS,
+    so short runs are picked up quickly without hammering the API on long ones. The wait
+    ends on any terminal status, not just 'completed'. If the run is still going after
+    the timeout, it is cancelled.
+
+    Args:
+        thread_id (str): The ID of the thread.
+        run_id (str): The ID of the run to wait for.
+        timeout_seconds (float, optional): Defaults to settings.ASSISTANT_RUN_TIMEOUT_SECONDS.
+
+    Returns:
+        tuple: The final status of the run ('timed_out' if it was cancelled because of
+        the timeout) and the number of seconds the wait took.
+    """
+    import openai
+    timeout_seconds = timeout_seconds or settings.ASSISTANT_RUN_TIMEOUT_SECONDS
+    poll_seconds = settings.ASSISTANT_RUN_POLL_INITIAL_SECONDS
+    start_time = time.perf_counter()
+
+    while True:
+        run = openai.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
+        status = run.status
+        elapsed_seconds = time.perf_counter() - start_time
+        if status in RUN_END_STATUSES:
+            break
+
+        if elapsed_seconds >= timeout_seconds:
+            logging.error('Run %s did not finish within %s seconds, cancelling it', run_id, timeout_seconds)
+            try:
+                openai.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+            except Exception as ex:
+                logging.warning('Could not cancel run %s: %s', run_id, ex)
+            status = 'timed_out'
+            break
+
+        time.sleep(poll_seconds)
+        poll_seconds = min(poll_seconds * settings.ASSISTANT_RUN_POLL_BACKOFF,
+                           settings.ASSISTANT_RUN_POLL_MAX_SECONDS)
+
+    logging.info('Run %s finished with status %s after %.2f seconds', run_id, status, elapsed_seconds)
+    record_run_usage(run)
+    return status, elapsed_seconds
+
+def run_assistant_and_wait(thread_id, assistant_id, instructions=None):
+    """
+    Runs the assistant on a thread and waits for the run to finish.
+
+    When the installed OpenAI client supports streamed runs, the run events are
+    streamed and the wait ends as soon as the final event arrives. Otherwise the
+    run is created normally and polled with wait_for_run_completion().
+
+    Args:
+        thread_id (str): The ID of the thread on which the assistant will run.
+        assistant_id (str): The ID of the assistant to be used.
+        instructions (str, optional): New instructions for this specific run, if any.
+
+    Returns:
+        tuple: The final status of the run and the number of seconds until it finished.
+    """
+    import openai
+    runs = openai.beta.threads.runs
+    if not hasattr(runs, 'stream'):
+        run = run_assistant_on_thread(thread_id, assistant_id, instructions)
+        return wait_for_run_completion(thread_id, run.id)
+
+    start_time = time.perf_counter()
+    with runs.stream(thread_id=thread_id, assistant_id=assistant_id, instructions=instructions) as stream:
+        stream.until_done()
+        run = stream.current_run
+    elapsed_seconds = time.perf_counter() - start_time
+    status = run.status if run else 'failed'
+
+    logging.info('Streamed run finished with status %s after %.2f seconds', status, elapsed_seconds)
+    record_run_usage(run)
+    return status, elapsed_seconds
+
+def record_run_usage(run):
+    """
+    Adds the token usage of a finished run to the open metrics span, if the API reported it.
+    """
+    # openai 1.7 has no usage field on Run, so the API's usage ends up in model_extra as a dict
+    usage = getattr(run, 'usage', None) or (getattr(run, 'model_extra', None) or {}).get('usage')
+    if not usage:
+        return
+    if not isinstance(usage, dict):
+        usage = usage.model_dump() if hasattr(usage, 'model_dump') else vars(usage)
+    metrics.increment(
+        prompt_tokens=usage.get('prompt_tokens') or 0,
+        completion_tokens=usage.get('completion_tokens') or 0,
+        total_tokens=usage.get('total_tokens') or 0,
+    )
+
 def get_messages(thread_id):
     """
     Retrieves a list of messages from a specified thread using the OpenAI API.
@@ -188,6 +328,7 @@ def get_messages(thread_id):
     Raises:
     Exception: Outputs an error message to the console if an exception occurs during the API call.
     """
+    import openai
     try:
         return openai.beta.threads.messages.list(
             thread_id=thread_id
@@ -196,18 +337,101 @@ def get_messages(thread_id):
         print(f'Error getting messages! Error: {e}')
         return None
 
-def get_helping_files():
+def get_factor_file_path():
     """
-    Uploads a file to OpenAI and returns the file ID.
-    Assumes the file is located in the root directory of the GitHub project.
+    Returns the path of the snow day factor file in the root directory of the project.
     """
     # Get the directory of the current script
     current_directory = os.path.dirname(os.path.abspath(__file__))
 
     # Go up one level to the root directory of the project
     root_directory = os.path.dirname(current_directory)
-    file_path = os.path.join(root_directory, 'rockford_snow_day_factor_information.txt')
+    return os.path.join(root_directory, settings.SNOW_DAY_FACTOR_FILE)
+
+def get_helping_files():
+    """
+    Returns the OpenAI file ID of the snow day factor file, uploading it only when needed.
+    Assumes the file is located in the root directory of the GitHub project.
+
+    Uploads are tracked in the local metadata cache by a hash of the file contents,
+    so the file is only uploaded again when its contents change (or the cached
+    upload no longer exists). After a new upload, old copies are cleaned up.
+    Only one thread checks or uploads the file at a time; threads that were waiting
+    use the upload it made.
+    """
+    file_path = get_factor_file_path()
+    file_hash = metadata_cache.get_file_hash(file_path)
+
+    cached_file = metadata_cache.load_metadata()['files'].get(file_hash)
+    if cached_file and not metadata_cache.needs_validation(cached_file):
+        return cached_file['id']
+
+    with _upload_lock:
+        # Another thread may have validated or uploaded the file while this one waited
+        cached_file = metadata_cache.load_metadata()['files'].get(file_hash)
+        if cached_file and not metadata_cache.needs_validation(cached_file):
+            return cached_file['id']
+
+        import openai
+        if cached_file:
+            try:
+                openai.files.retrieve(cached_file['id'])
+                cached_file['validated_at'] = time.time()
+                metadata_cache.update_metadata('files', file_hash, cached_file)
+                return cached_file['id']
+            except openai.NotFoundError:
+                logging.info('Cached upload %s no longer exists, uploading again', cached_file['id'])
+
+        with open(file_path, "rb") as file_data:
+            file = openai.files.create(file=file_data, purpose="assistants")
+
+        now = time.time()
+        metadata_cache.update_metadata('files', file_hash, {
+            'id': file.id,
+            'file_name': settings.SNOW_DAY_FACTOR_FILE,
+            'uploaded_at': now,
+            'validated_at': now,
+        })
+        logging.info('Uploaded %s as %s', settings.SNOW_DAY_FACTOR_FILE, file.id)
+        cleanup_stale_uploads(file)
+        return file.id
+
+def cleanup_stale_uploads(current_upload):
+    """
+    Deletes old uploads of the snow day factor file.
+
+    Only assistants files with the factor file's name that were uploaded before
+    current_upload, and more than settings.OPENAI_STALE_UPLOAD_GRACE_SECONDS ago,
+    are deleted from OpenAI. Another process (e.g. a backtest worker or an
+    overlapping run) may have just made its own copy and be about to attach it,
+    so recent copies are left alone until a later upload cleans them up. Cache
+    entries for other file contents are dropped from the metadata cache.
+
+    Args:
+        current_upload: The OpenAI file object of the upload that was just made.
+
+    Returns:
+        int: The number of uploads deleted.
+    """
+    import openai
+    current_hash = metadata_cache.get_file_hash(get_factor_file_path())
+    stale_before = min(current_upload.created_at, time.time() - settings.OPENAI_STALE_UPLOAD_GRACE_SECONDS)
+
+    deleted = 0
+    try:
+        for uploaded_file in openai.files.list(purpose='assistants'):
+            if (uploaded_file.filename != settings.SNOW_DAY_FACTOR_FILE
+                    or uploaded_file.id == current_upload.id
+                    or uploaded_file.created_at >= stale_before):
+                continue
+            openai.files.delete(uploaded_file.id)
+            deleted += 1
+    except Exception as ex:
+        logging.error('Error cleaning up stale uploads: %s', ex)
+
+    for file_hash in list(metadata_cache.load_metadata()['files']):
+        if file_hash != current_hash:
+            metadata_cache.update_metadata('files', file_hash, None)
 
-    with open(file_path, "rb") as file_data:
-        file = openai.files.create(file=file_data, purpose="assistants")
-    return file.id
+    logging.info('Deleted %s stale uploads of %s', deleted, settings.SNOW_DAY_FACTOR_FILE)
+    return deleted
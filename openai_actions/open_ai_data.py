@@ -8,152 +8,225 @@ messages that seek predictions about snow days, image generation prompts, and mo
 Dependencies:
 - json: For parsing and creating JSON payloads.
 - logging: To log application events and errors.
+- general_functions.districts: To access the school details of a district.
+- re: To find the probability in predictions that are not valid JSON.
+- textwrap: To lay out the prompt without source indentation.
+- pytz: For the school's timezone.
 - settings: To access application-specific settings.
-- openai_actions.open_ai_api_calls: To make calls to OpenAI's API.
 """
 
 import json
 import logging
-from datetime import datetime
-import pytz
+import re
+import textwrap
+from datetime import datetime, timedelta
+from general_functions import districts
 from settings import settings
 
+PREDICTION_RESPONSE_FORMAT = (
+    'Respond with ONLY a JSON object (no other text) with these keys: '
+    '"probability": the percentage chance of a snow day tomorrow as a number from 0 to 100, '
+    '"rationale": one or two sentences on the factors that drove the probability, '
+    '"message": the full prediction message for parents and students, including the percentage.'
+)
+
+# The hourly weather columns sent in the prompt: (field, header, decimals).
+# UV index is left out since the window is overnight.
+HOURLY_SUMMARY_COLUMNS = (
+    ('temp_f', 'temp', 0),
+    ('feelslike_f', 'feels', 0),
+    ('windchill_f', 'chill', 0),
+    ('dewpoint_f', 'dew', 0),
+    ('chance_of_snow', 'snow%', 0),
+    ('chance_of_rain', 'rain%', 0),
+    ('snow_cm', 'snow_cm', 1),
+    ('wind_mph', 'wind', 0),
+    ('gust_mph', 'gust', 0),
+    ('visibility_miles', 'vis', 1),
+    ('humidity', 'hum%', 0),
+    ('cloud', 'cloud%', 0),
+    ('pressure_in', 'pres', 2),
+)
+HOURLY_SUMMARY_UNITS = 'Units: temp/feels/chill/dew in °F, wind/gust in MPH, vis in miles, pres in inches'
+
+# Used when the JSON answer has a probability but no message, so the raw JSON never reaches parents
+PREDICTION_MESSAGE_TEMPLATE = 'Blizzard predicts a {probability:.0f}% chance of a snow day. {rationale}'
+# Used when the prediction is not valid JSON, e.g. "a 40% chance of a snow day"
+PROBABILITY_PATTERN = re.compile(r'(\d{1,3}(?:\.\d+)?)\s*%\s*chance', re.IGNORECASE)
+# Used when the JSON probability is text, e.g. "40%" or "about 40 percent"
+PERCENT_PATTERN = re.compile(r'(\d{1,3}(?:\.\d+)?)\s*(?:%|percent)', re.IGNORECASE)
+
+def format_weather_value(value, decimals=1):
+    '''
+    Formats a numeric weather value to at most the given decimals, without trailing zeros.
+    '''
+    text = f'{value:.{decimals}f}'
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    return '0' if text == '-0' else text
+
 def create_hourly_weather_summary(current_weather_data):
     '''
-    Creates a summary string of detailed hourly weather data.
+    Creates a compact table of the hourly weather data: a header row, then one
+    pipe-separated line per hour. Columns with the same value every hour are pulled
+    out into a single "same every hour" line, and fields that don't matter overnight
+    (see HOURLY_SUMMARY_COLUMNS) are left out.
+    '''
+    hourly_data = current_weather_data.get('hourly')
+    if not hourly_data:
+        return 'No data'
+
+    columns = [('hour', [str(hour) for hour in hourly_data.hours]),
+               ('condition', list(hourly_data.conditions))]
+    for field, header, decimals in HOURLY_SUMMARY_COLUMNS:
+        columns.append((header, [format_weather_value(value, decimals) for value in hourly_data.column(field)]))
+
+    varying_columns = [columns[0]]
+    constant_values = []
+    for header, values in columns[1:]:
+        if len(hourly_data) > 1 and len(set(values)) == 1:
+            constant_values.append(f'{header}={values[0]}')
+        else:
+            varying_columns.append((header, values))
+
+    lines = [HOURLY_SUMMARY_UNITS, '|'.join(header for header, _ in varying_columns)]
+    lines.extend('|'.join(row) for row in zip(*(values for _, values in varying_columns)))
+    if constant_values:
+        lines.append(f'Same every hour: {", ".join(constant_values)}')
+    return '\n'.join(lines)
+
+def create_weather_alert_summary(current_weather_data):
     '''
-    hourly_summary = ""
-
-    # Loop for 7 PM to Midnight (19 to 23 hours)
-    for hour in range(19, 24):
-        summary = " ".join([
-            f"Hour {hour}:",
-            f"Condition: {current_weather_data.get(f'hour_{hour}_condition', 'No data')},",
-            f"Temp: {current_weather_data.get(f'hour_{hour}_temp_f', 'No data')}°F,",
-            f"Chance of Snow: {current_weather_data.get(f'hour_{hour}_chance_of_snow', 'No data')}%,",
-            f"Chance of Rain: {current_weather_data.get(f'hour_{hour}_chance_of_rain', 'No data')}%,",
-            f"Wind Speed: {current_weather_data.get(f'hour_{hour}_wind_mph', 'No data')}MPH,",
-            f"Visibility: {current_weather_data.get(f'hour_{hour}_visibility_miles', 'No data')} miles,",
-            f"Snowfall: {current_weather_data.get(f'hour_{hour}_snow_cm', 'No data')}cm,",
-            f"Humidity: {current_weather_data.get(f'hour_{hour}_humidity', 'No data')}%,",
-            f"Cloud Cover: {current_weather_data.get(f'hour_{hour}_cloud', 'No data')}%,",
-            f"Pressure: {current_weather_data.get(f'hour_{hour}_pressure_in', 'No data')}in,",
-            f"Feels Like: {current_weather_data.get(f'hour_{hour}_feelslike_f', 'No data')}°F,",
-            f"Wind Chill: {current_weather_data.get(f'hour_{hour}_windchill_f', 'No data')}°F,",
-            f"Gusts: {current_weather_data.get(f'hour_{hour}_gust_mph', 'No data')}MPH,",
-            f"UV Index: {current_weather_data.get(f'hour_{hour}_uv', 'No data')}"
-        ])
-        hourly_summary += summary + " "
-
-    # Loop for Midnight to 8 AM (0 to 7 hours)
-    for hour in range(0, 8):
-        summary = " ".join([
-            f"Hour {hour}:",
-            f"Condition: {current_weather_data.get(f'hour_{hour}_condition', 'No data')},",
-            f"Temp: {current_weather_data.get(f'hour_{hour}_temp_f', 'No data')}°F,",
-            f"Chance of Snow: {current_weather_data.get(f'hour_{hour}_chance_of_snow', 'No data')}%,",
-            f"Chance of Rain: {current_weather_data.get(f'hour_{hour}_chance_of_rain', 'No data')}%,",
-            f"Wind Speed: {current_weather_data.get(f'hour_{hour}_wind_mph', 'No data')}MPH,",
-            f"Visibility: {current_weather_data.get(f'hour_{hour}_visibility_miles', 'No data')} miles,",
-            f"Snowfall: {current_weather_data.get(f'hour_{hour}_snow_cm', 'No data')}cm,",
-            f"Humidity: {current_weather_data.get(f'hour_{hour}_humidity', 'No data')}%,",
-            f"Cloud Cover: {current_weather_data.get(f'hour_{hour}_cloud', 'No data')}%,",
-            f"Pressure: {current_weather_data.get(f'hour_{hour}_pressure_in', 'No data')}in,",
-            f"Feels Like: {current_weather_data.get(f'hour_{hour}_feelslike_f', 'No data')}°F,",
-            f"Wind Chill: {current_weather_data.get(f'hour_{hour}_windchill_f', 'No data')}°F,",
-            f"Gusts: {current_weather_data.get(f'hour_{hour}_gust_mph', 'No data')}MPH,",
-            f"UV Index: {current_weather_data.get(f'hour_{hour}_uv', 'No data')}"
-        ])
-        hourly_summary += summary + " "
-
-    return hourly_summary.strip()  # Remove any trailing space
-
-def create_open_ai_snow_day_message(current_weather_data):
+    Creates the weather alert lines for the prompt, or a single line if there is no alert.
+    '''
+    if not current_weather_data.get('weather_alert_event'):
+        return 'Weather alert: none'
+
+    return '\n'.join([
+        'Weather alert (ENSURE THE ALERT IS FOR THE COUNTY THE SCHOOL IS LISTED IN):',
+        f"- Event: {current_weather_data.get('weather_alert_event')}; "
+        f"Severity: {current_weather_data.get('weather_alert_severity', 'No data')}; "
+        f"Certainty: {current_weather_data.get('weather_alert_certainty', 'No data')}; "
+        f"Urgency: {current_weather_data.get('weather_alert_urgency', 'No data')}",
+        f"- Description: {' '.join(str(current_weather_data.get('weather_alert_desc', 'No data')).split())}",
+    ])
+
+def create_open_ai_snow_day_message(current_weather_data, district=None, now=None, school_day=None):
     '''
     This method is used to create the JSON message we are
     going to send to the OpenAI engine.
+    The school details come from the district config, which defaults to the
+    school in the settings file. The prompt is dated now unless another
+    (timezone aware) time is passed in, e.g. when replaying archived forecasts.
+    The prediction is for tomorrow unless another school day (a date) is passed
+    in, e.g. for the multi-day outlook; the weather is the night before it.
     '''
+    import pytz
     logging.info('Creating the request message to send to OpenAI')
+    district = district or districts.get_default_district()
     try:
-        est = pytz.timezone('America/New_York')
-        now_utc = datetime.now(pytz.utc)
-        now_est = now_utc.astimezone(est)
+        now_utc = now or datetime.now(pytz.utc)
+        now_local = now_utc.astimezone(pytz.timezone(settings.SCHOOL_TIMEZONE))
         hourly_summary = create_hourly_weather_summary(current_weather_data)
-        month = now_est.month
-        school_state = settings.SCHOOL_DISTRICT_STATE
-        school_city_town = settings.SCHOOL_DISTRICT_TOWN_OR_CITY
-        school_name = settings.SCHOOL_NAME
-        school_county = settings.SCHOOL_DISTRICT_COUNTY
-        school_start_time = settings.SCHOOL_START_TIME
-        school_zip_code = settings.ZIP_CODE
-        current_time = now_est
+        alert_summary = create_weather_alert_summary(current_weather_data)
+        month = now_local.month
+        school_state = district['school_district_state']
+        school_city_town = district['school_district_town_or_city']
+        school_name = district['school_name']
+        school_county = district['school_district_county']
+        school_start_time = district['school_start_time']
+        school_zip_code = district['zip_code']
+        current_time = now_local.strftime('%Y-%m-%d %H:%M %Z')
+        if school_day is None or school_day == now_local.date() + timedelta(days=1):
+            school_day_text = 'tomorrow'
+        else:
+            school_day_text = (f'on {school_day:%A %Y-%m-%d}. That is the day being predicted: read '
+                               f'"tomorrow" below as that day and the hourly weather as the night before it')
         print(current_time)
 
-        message = f'''
-        -----------------------------------------------------------------
-        Here is the information about the school and weather:
-
-        - Current date and time: {current_time}
-        - School name: {school_name}.
-        - The school is located in the state of {school_state} - this is important
-        - The school is located in the town or city of {school_city_town}
-        - The school is located in {school_county} county
-        - Current month: {month} (of 12) - take notice here of the month and state to understand the weather more
-        - School starts at {school_start_time} tomorrow
-        - School zip code is {school_zip_code}
-
-        -----------------------------------------------------------------
+        message = textwrap.dedent(f'''\
+            School and weather information:
+            - Current date and time: {current_time}
+            - School: {school_name}, {school_city_town}, {school_county} County, {school_state} (zip {school_zip_code}). The state is important.
+            - Current month: {month} of 12. Use the month and state to understand the weather.
+            - School starts at {school_start_time} {school_day_text}.
 
-        Here are the hourly weather conditions from 7 PM to 8 AM. The hours are in military time.
-        {hourly_summary}
+            Hourly weather from 7 PM to 8 AM (24 hour clock):
+            {{hourly_summary}}
 
-        -----------------------------------------------------------------
+            {{alert_summary}}
 
-        Current weather alerts (if applicable). ENSURE THE ALERT IS FOR THE COUNTY THE SCHOOL IS LISTED IN:
-        - Event: {current_weather_data.get('weather_alert_event', 'No data')}
-        - Description: {current_weather_data.get('weather_alert_desc', 'No data')}
-        - Severity: {current_weather_data.get('weather_alert_severity', 'No data')}
-        - Certainty: {current_weather_data.get('weather_alert_certainty', 'No data')}
-        - Urgency: {current_weather_data.get('weather_alert_urgency', 'No data')}
+            Attached is a file which explains what constitutes a snow day at the school.
 
-        -----------------------------------------------------------------
-
-        Attached is a file which explains what constitues a snow day at the school.
-        '''
-        message = message.replace("\n", "\\n").strip()
+            {{response_format}}''')
+        # The tables are filled in after dedent so their own lines don't affect it. replace() rather
+        # than format(), since braces in the district fields would break format()
+        for placeholder, value in (('{hourly_summary}', hourly_summary), ('{alert_summary}', alert_summary),
+                                   ('{response_format}', PREDICTION_RESPONSE_FORMAT)):
+            message = message.replace(placeholder, value)
     except KeyError as ex:
         logging.error('An error occurred while creating message: %s', str(ex))
         message = None
 
     return message
 
-def create_open_ai_prediction_check_message(prediction_message):
+def read_probability(value):
+    """
+    Reads the probability from the JSON answer: a number, or text with an "NN%" in it.
+    Returns the probability clamped to 0-100, or None if there isn't one.
     """
-    Generates a formatted message to check OpenAI's prediction about the chance of a snow day.
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        probability = float(value)
+    except (ValueError, TypeError):
+        percent_match = PERCENT_PATTERN.search(str(value))
+        if not percent_match:
+            logging.warning('The prediction probability %r is not a number, leaving it out', value)
+            return None
+        probability = float(percent_match.group(1))
+    return min(max(probability, 0.0), 100.0)
+
+def parse_snow_day_prediction(response_text):
+    """
+    Parses the assistant's structured snow day prediction.
+
+    The assistant is asked (see PREDICTION_RESPONSE_FORMAT) to answer with a JSON object
+    holding the probability, rationale and message. Code fences or text around the
+    object are ignored. A probability that isn't a number is read from an "NN%" in
+    it, or left out (see read_probability()). An object without a message gets one
+    from PREDICTION_MESSAGE_TEMPLATE, or an empty message and no probability if it
+    has no probability either, so the JSON itself is never sent. If the response is
+    not valid JSON, the whole text is used as the message and the probability is
+    read from the first "NN% chance" in it.
 
     Parameters:
-    - prediction_message (str): A message containing prediction details.
+    - response_text (str): The text of the assistant's reply.
 
     Returns:
-    - dict: A JSON-like dictionary object containing a formatted message for OpenAI's analysis.
-    
-    Raises:
-    - Exception: If any error occurs during message formatting or JSON conversion.
-
-    Note:
-    The response from OpenAI should be either "True" or "False", indicating if there's a greater
-    than 50% chance of a snow day.
+    - dict: The prediction with the keys 'probability' (float from 0 to 100, or None if
+      it could not be found), 'rationale' and 'message'.
     """
+    response_text = (response_text or '').strip()
     try:
-        message = f'''
-        Analyze the following message and respond with ONLY the word "True" or "False". Tell me
-        if there is a greater than or equal to 75% chance of a snow day. Here is the message:
-        {prediction_message}
-        '''
-        message = message.replace("\n", "\\n")
-        message = message.strip()
-        message_object = json.loads(json.dumps([{"role": "user", "content": message}]))
-        return message_object
-    except Exception as ex:
-        logging.error('There was an error in create_open_ai_prediction_check_message. Error: %s', ex)
-        return None
+        prediction = json.loads(response_text[response_text.index('{'):response_text.rindex('}') + 1])
+        probability = read_probability(prediction.get('probability'))
+        rationale = str(prediction.get('rationale') or '').strip()
+        message = str(prediction.get('message') or '').strip()
+    except (ValueError, TypeError, AttributeError) as ex:
+        logging.warning('The prediction was not valid JSON, reading it as text. Error: %s', ex)
+    else:
+        if not message:
+            if probability is None:
+                logging.error('The prediction has neither a message nor a probability: %s', response_text)
+            else:
+                logging.warning('The prediction has no message, using the template')
+                message = PREDICTION_MESSAGE_TEMPLATE.format(probability=probability, rationale=rationale).strip()
+        return {'probability': probability, 'rationale': rationale, 'message': message}
+
+    probability_match = PROBABILITY_PATTERN.search(response_text)
+    return {
+        'probability': read_probability(probability_match.group(1)) if probability_match else None,
+        'rationale': '',
+        'message': response_text,
+    }
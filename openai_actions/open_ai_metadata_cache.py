@@ -0,0 +1,97 @@
+"""
+OpenAI Metadata Cache Module
+
+This module keeps a small JSON file with the OpenAI object IDs the application
+reuses between runs, so they don't have to be looked up or re-created every night:
+
+- assistants: assistant name -> {'id', 'validated_at'}
+- files: sha256 of the file contents -> {'id', 'file_name', 'uploaded_at', 'validated_at'}
+
+The file lives in the local cache directory, which the workflow restores between
+runs. Entries carry a 'validated_at' timestamp so callers can decide when an ID
+needs to be checked against the API again.
+
+Dependencies:
+- hashlib: To hash file contents.
+- json: To read and write the metadata file.
+- logging: To log application events and errors.
+- os: For file and directory operations.
+- threading: To keep updates safe across worker threads.
+- time: To timestamp entries.
+- general_functions.storage: For the root directory of the project.
+- settings: To access application-specific settings.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from general_functions import storage
+from settings import settings
+
+_lock = threading.Lock()
+
+def _metadata_path():
+    return os.path.join(storage.ROOT_DIRECTORY, settings.OPENAI_METADATA_CACHE_PATH)
+
+def load_metadata():
+    """
+    Reads the metadata file.
+
+    Returns:
+        dict: The metadata with 'assistants' and 'files' sections. Missing or
+        unreadable files give empty sections.
+    """
+    try:
+        with open(_metadata_path(), 'r', encoding='utf-8') as metadata_file:
+            metadata = json.load(metadata_file)
+    except (OSError, ValueError):
+        metadata = {}
+
+    metadata.setdefault('assistants', {})
+    metadata.setdefault('files', {})
+    return metadata
+
+def save_metadata(metadata):
+    """
+    Writes the metadata file atomically.
+    """
+    path = _metadata_path()
+    temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp_path, 'w', encoding='utf-8') as metadata_file:
+            json.dump(metadata, metadata_file, indent=2, sort_keys=True)
+        os.replace(temp_path, path)
+    except OSError as ex:
+        logging.warning('Could not save the OpenAI metadata cache: %s', ex)
+
+def update_metadata(section, key, entry):
+    """
+    Sets (or with entry=None, removes) one entry and saves the file.
+    """
+    with _lock:
+        metadata = load_metadata()
+        if entry is None:
+            metadata[section].pop(key, None)
+        else:
+            metadata[section][key] = entry
+        save_metadata(metadata)
+
+def needs_validation(entry):
+    """
+    Tells whether a cached entry is old enough to be checked against the API again.
+    """
+    return time.time() - entry.get('validated_at', 0) > settings.OPENAI_METADATA_VALIDATION_SECONDS
+
+def get_file_hash(file_path):
+    """
+    Returns the sha256 hex digest of a file's contents.
+    """
+    file_hash = hashlib.sha256()
+    with open(file_path, 'rb') as file_data:
+        for chunk in iter(lambda: file_data.read(65536), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
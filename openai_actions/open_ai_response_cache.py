@@ -0,0 +1,120 @@
+"""
+OpenAI Response Cache Module
+
+This module stores finished assistant predictions on disk so a re-triggered run,
+or a run whose forecast hasn't materially changed, can reuse the last prediction
+instead of paying for a fresh assistant run.
+
+Predictions are content addressed: the cache key is a hash of the normalized
+inputs that decide the prediction, which are
+- the district and the forecast date (in the school's timezone),
+- every forecast hour with its numeric values rounded into buckets
+  (settings.PREDICTION_CACHE_BUCKETS), so small wiggles between forecast
+  updates still land on the same key,
+- the weather alert event and severity,
+- the assistant model and the contents of the snow day factor file, so a policy
+  or model change never reuses an old answer.
+
+Entries live in a DiskCache, so they expire after the configured TTL and the
+least recently used entries are evicted once the cache is full.
+
+Dependencies:
+- json: To serialize the structured predictions.
+- logging: To log application events and errors.
+- os: To locate the snow day factor file.
+- datetime, pytz: To find the forecast date in the school's timezone.
+- general_functions.storage: For the root directory of the project.
+- general_functions.disk_cache: For the on-disk TTL/LRU cache.
+- openai_actions.open_ai_metadata_cache: To hash the snow day factor file.
+- settings: To access application-specific settings.
+"""
+
+import json
+import logging
+import os
+from datetime import datetime
+from general_functions.disk_cache import DiskCache
+from general_functions import storage
+from openai_actions import open_ai_metadata_cache
+from settings import settings
+
+response_cache = DiskCache(settings.PREDICTION_CACHE_DIRECTORY,
+                           settings.PREDICTION_CACHE_TTL_SECONDS,
+                           settings.PREDICTION_CACHE_MAX_ENTRIES,
+                           settings.PREDICTION_CACHE_MAX_BYTES)
+
+def quantize(value, step):
+    """
+    Rounds a value to the nearest multiple of step and returns the bucket number.
+    """
+    return round(value / step)
+
+def normalize_weather_info(weather_info, buckets=None):
+    """
+    Reduces the relevant weather information to the bucketed values that decide a prediction.
+
+    Args:
+        weather_info (dict): The relevant weather information.
+        buckets (dict, optional): Field -> bucket size. Defaults to settings.PREDICTION_CACHE_BUCKETS.
+
+    Returns:
+        list: One entry per hour (hour of day followed by the bucket of each field),
+        then the alert event and severity.
+    """
+    buckets = buckets or settings.PREDICTION_CACHE_BUCKETS
+    hourly = weather_info['hourly']
+    columns = [(hourly.column(field), step) for field, step in sorted(buckets.items())]
+    normalized = [
+        (hour, *(quantize(column[index], step) for column, step in columns))
+        for index, hour in enumerate(hourly.hours)
+    ]
+    normalized.append((weather_info.get('weather_alert_event'), weather_info.get('weather_alert_severity')))
+    return normalized
+
+def _get_factor_file_hash():
+    try:
+        return open_ai_metadata_cache.get_file_hash(os.path.join(storage.ROOT_DIRECTORY, settings.SNOW_DAY_FACTOR_FILE))
+    except OSError:
+        return None
+
+def make_prediction_key(district, weather_info, target_date=None):
+    """
+    Builds the cache key for a district's prediction from its normalized inputs.
+    Predictions for a later school day than tomorrow (target_date, an ISO date)
+    get their own keys.
+
+    Returns:
+        str: A hex digest that is the same for identical or near-identical inputs.
+    """
+    import pytz
+    forecast_date = datetime.now(pytz.timezone(settings.SCHOOL_TIMEZONE)).date().isoformat()
+    parts = [
+        district['id'],
+        forecast_date,
+        settings.ENGINE_NAME,
+        _get_factor_file_hash(),
+        normalize_weather_info(weather_info),
+    ]
+    if target_date:
+        parts.append(target_date)
+    return DiskCache.make_key(*parts)
+
+def get_cached_prediction(cache_key):
+    """
+    Returns the stored structured prediction for a cache key, or None on a miss.
+    """
+    data = response_cache.get(cache_key)
+    if data is None:
+        return None
+    try:
+        return json.loads(data)
+    except ValueError as ex:
+        logging.warning('Discarding an unreadable cached prediction: %s', ex)
+        response_cache.delete(cache_key)
+        return None
+
+def cache_prediction(cache_key, prediction):
+    """
+    Stores a structured prediction under a cache key.
+    """
+    response_cache.set(cache_key, json.dumps(prediction).encode('utf-8'))
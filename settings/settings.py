@@ -14,10 +14,160 @@ SCHOOL_DISTRICT_STATE = 'Michigan'
 SCHOOL_DISTRICT_TOWN_OR_CITY = 'Rockford'
 SCHOOL_DISTRICT_COUNTY = 'Kent'
 SCHOOL_START_TIME = '7:40 AM EST'
+DISTRICT_ID = 'rockford'
+# The file the latest prediction is written to (relative to the root directory)
+PREDICTION_FILE = 'prediction.txt'
+# The append-only prediction history that the prediction file is rendered from
+PREDICTION_STORE_PATH = 'history/predictions.sqlite3'
+
+# Batch mode data
+# Each entry is a district config dict using the same keys that
+# general_functions.districts.get_default_district() returns. Missing keys
+# fall back to the single-school values above, except 'id', which every entry
+# needs and no two entries may share.
+DISTRICTS = []
+BATCH_MAX_WORKERS = 8
+BATCH_PREDICTIONS_DIRECTORY = 'predictions'
+
+# Pipeline data
+# Per-stage timeouts (seconds) for the single district pipeline in main.py
+PIPELINE_STAGE_TIMEOUT_SECONDS = {
+    'forecast': 60,
+    'assistant_lookup': 60,
+    'recipients': 120,
+    'smtp_login': 60,
+    'prediction': 15 * 60,
+    'write_prediction': 10,
+    'send': 30 * 60,
+}
+PIPELINE_MAX_WORKERS = 8
+
+# Metrics data
+# Stage spans are appended to this JSON lines file on every run (never truncated)
+METRICS_ENABLED = True
+METRICS_PATH = 'metrics/metrics.jsonl'
 
 # Weather API data
 ZIP_CODE = '49341'
 WEATHER_API_BASE = 'http://api.weatherapi.com/v1/'
+SCHOOL_TIMEZONE = 'America/New_York'
+FORECAST_DAYS = 2
+# The hours (24 hour clock, end exclusive) that families and buses are on the road
+COMMUTE_WINDOW_START_HOUR = 5
+COMMUTE_WINDOW_END_HOUR = 8
+FORECAST_CACHE_ENABLED = True
+FORECAST_CACHE_DIRECTORY = 'cache/forecasts'
+FORECAST_CACHE_TTL_SECONDS = 30 * 60
+FORECAST_CACHE_MAX_ENTRIES = 256
+FORECAST_CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+# Outlook data
+# python main.py --outlook predicts this many school days ahead, starting tomorrow
+OUTLOOK_DAYS = 3
+OUTLOOK_FILE = 'outlook.txt'
+# The weekdays with school (Monday is 0); the outlook skips the others
+OUTLOOK_SCHOOL_WEEKDAYS = (0, 1, 2, 3, 4)
+# A day is only predicted again when a forecast hour moved by at least this much
+# since the forecast its stored prediction was made from (or the alert changed)
+OUTLOOK_DELTA_THRESHOLDS = {
+    'temp_f': 4,
+    'windchill_f': 6,
+    'chance_of_snow': 20,
+    'chance_of_rain': 20,
+    'snow_cm': 1,
+    'wind_mph': 10,
+    'gust_mph': 10,
+    'visibility_miles': 2,
+}
+
+# Overnight watch data
+# python main.py --watch checks the forecast this often until WATCH_END_HOUR (local) on the school day
+WATCH_INTERVAL_SECONDS = 30 * 60
+WATCH_END_HOUR = 6
+# The HTTP time budget of a single check
+WATCH_CYCLE_DEADLINE_SECONDS = 60
+# The school day is only predicted again when a commute window feature moved by at least
+# this much since the stored prediction (or the weather alert changed)
+WATCH_CHANGE_THRESHOLDS = {
+    'commute_min_temp_f': 4,
+    'commute_min_windchill_f': 6,
+    'commute_max_chance_of_snow': 20,
+    'commute_total_snow_cm': 1,
+    'commute_max_gust_mph': 10,
+    'commute_min_visibility_miles': 2,
+}
+WATCH_FOLLOW_UP_TEMPLATE = ('Overnight update from Blizzard: the forecast has changed since our last prediction '
+                            '({previous}). {message}')
+
+# Site data
+# Prediction pages are pre-rendered here (relative to the root directory) whenever a prediction is recorded
+SITE_BUILD_ENABLED = True
+SITE_DIRECTORY = 'site'
+# The default district's page is also written here (relative to the root directory), the page
+# GitHub Pages opens on; None leaves it alone
+SITE_INDEX_PAGE = 'index.html'
+# Minified and written to SITE_DIRECTORY/assets under content-hashed names; the first is the page stylesheet
+SITE_ASSETS = ('CSS/style.css',)
+SITE_HISTORY_DAYS = 14
+# The prediction server's POST /api/feedback URL the pages send votes to (None leaves the buttons inert)
+SITE_FEEDBACK_URL = None
+
+# Prediction server data
+# python main.py --serve answers /api/prediction, /api/history and /prediction.txt
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8000
+# How often the server checks the prediction store for new predictions
+SERVER_REFRESH_SECONDS = 5
+SERVER_HISTORY_DAYS = 30
+SERVER_MAX_AGE_SECONDS = 60
+SERVER_ALLOWED_ORIGIN = '*'
+
+# Feedback data
+# The "Are you confident?" votes taken by POST /api/feedback
+FEEDBACK_STORE_PATH = 'history/feedback.sqlite3'
+# Votes are written in batches: every FEEDBACK_FLUSH_SECONDS, or once FEEDBACK_FLUSH_MAX_VOTES are waiting
+FEEDBACK_FLUSH_SECONDS = 1
+FEEDBACK_FLUSH_MAX_VOTES = 5000
+# New votes are refused once this many are waiting (the store keeps failing)
+FEEDBACK_MAX_PENDING_VOTES = 500000
+# Votes are taken for school days this many days either side of today
+FEEDBACK_MAX_AGE_DAYS = 7
+FEEDBACK_MAX_BODY_BYTES = 1024
+
+# HTTP data
+# Every WeatherAPI and Google Forms request goes through general_functions.http_client
+HTTP_TIMEOUT_SECONDS = 30
+# The HTTP time budget of a whole run; requests fail fast once it is used up
+HTTP_RUN_DEADLINE_SECONDS = 20 * 60
+HTTP_MAX_CONNECTIONS_PER_HOST = 8
+HTTP_HOST_CONNECTION_LIMITS = {
+    'api.weatherapi.com': 4,
+    'forms.googleapis.com': 4,
+}
+# Attempts (including the first) for GET requests that fail to connect or get one of these statuses
+HTTP_RETRY_ATTEMPTS = 4
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+HTTP_RETRY_BASE_SECONDS = 0.5
+HTTP_RETRY_MAX_SECONDS = 10
+
+# Weather pre-screen data
+# Nights that trip none of these rules skip the assistant and get a templated prediction
+PRESCREEN_ENABLED = True
+PRESCREEN_RULES = {
+    'max_chance_of_snow': 10,
+    'max_total_snow_cm': 0,
+    'ice_temp_band_f': (26, 35),
+    'max_ice_chance_of_rain': 20,
+    'min_windchill_f': -15,
+    'alert_severities': ('Severe', 'Extreme'),
+    'alert_keywords': ('winter', 'snow', 'ice', 'freez', 'blizzard', 'wind chill', 'cold', 'sleet'),
+}
+PRESCREEN_CLEAR_PROBABILITY = 1
+PRESCREEN_MESSAGE_TEMPLATE = ('Blizzard here with tonight\'s prediction for {school_name}: there is about a '
+                              '{probability}% chance of a snow day tomorrow. {rationale} '
+                              'Plan on a normal school day!')
+PRESCREEN_ESTIMATED_ASSISTANT_SECONDS = 30
+PRESCREEN_STATS_PATH = 'cache/prescreen_stats.json'
 
 # OpenAI data
 ENGINE_NAME = 'gpt-4-1106-preview'
@@ -33,14 +183,73 @@ ENGINE_LOGIT_BIAS = None
 ENGINE_USER = None
 CHAT_COMPLETIONS_URL = 'https://api.openai.com/v1/chat/completions'
 IMAGE_GENERATION_URL = 'https://api.openai.com/v1/images/generations'
+ASSISTANT_RUN_POLL_INITIAL_SECONDS = 0.25
+ASSISTANT_RUN_POLL_MAX_SECONDS = 5
+ASSISTANT_RUN_POLL_BACKOFF = 1.5
+ASSISTANT_RUN_TIMEOUT_SECONDS = 10 * 60
+OPENAI_METADATA_CACHE_PATH = 'cache/openai_metadata.json'
+OPENAI_METADATA_VALIDATION_SECONDS = 24 * 60 * 60
+# Uploads of the factor file younger than this are never cleaned up, since another
+# process may be about to attach them to a message
+OPENAI_STALE_UPLOAD_GRACE_SECONDS = 60 * 60
+SNOW_DAY_FACTOR_FILE = 'rockford_snow_day_factor_information.txt'
+# The lowest predicted snow day probability (percent) that sends the prediction emails
+SNOW_DAY_PROBABILITY_THRESHOLD = 75
+# Finished predictions are reused while the bucketed forecast for a district stays the same
+PREDICTION_CACHE_ENABLED = True
+PREDICTION_CACHE_DIRECTORY = 'cache/predictions'
+PREDICTION_CACHE_TTL_SECONDS = 6 * 60 * 60
+PREDICTION_CACHE_MAX_ENTRIES = 512
+PREDICTION_CACHE_MAX_BYTES = 5 * 1024 * 1024
+PREDICTION_CACHE_BUCKETS = {
+    'temp_f': 2,
+    'windchill_f': 3,
+    'chance_of_snow': 10,
+    'chance_of_rain': 10,
+    'snow_cm': 0.5,
+    'wind_mph': 5,
+    'gust_mph': 5,
+    'visibility_miles': 1,
+}
 AI_RESPONSE_THEMES = [
                       'A weather bot'
                       ]
 
+# Backtest data
+# Worker processes for python -m general_functions.backtest (None uses every CPU)
+BACKTEST_MAX_WORKERS = None
+# Assistant answers for the cached backtest predictor, keyed by prompt, model, factor file and themes
+BACKTEST_CACHE_DIRECTORY = 'cache/backtest'
+BACKTEST_CACHE_TTL_SECONDS = 365 * 24 * 60 * 60
+BACKTEST_CACHE_MAX_ENTRIES = 20000
+BACKTEST_CALIBRATION_BINS = 10
+
+# Google Forms data
+GOOGLE_TOKEN_PATH = 'token.json'
+GOOGLE_FORMS_PAGE_SIZE = 5000
+RECIPIENT_STORE_PATH = 'cache/recipients.sqlite3'
+
 # Communication data
 SMTP_SERVER = 'smtp.gmail.com'
 SMTP_PORT = 587
+SMTP_USE_TLS = True
+# Log in with SENDER_EMAIL and SENDER_EMAIL_PASSWORD (only a local test server goes without)
+SMTP_AUTH_ENABLED = True
+SMTP_TIMEOUT_SECONDS = 30
+SMTP_POOL_SIZE = 4
+SMTP_MAX_MESSAGES_PER_CONNECTION = 90
+SMTP_RETRY_DELAY_SECONDS = 0.5
 VERIZON_DOMAIN = '@vtext.com'
 ATT_DOMAIN = '@txt.att.net'
 TMOBILE_DOMAIN = '@tmomail.net'
 SPRINT_DOMAIN = '@messaging.sprintpcs.com'
+# Each carrier's SMS gateway gets its own queue, rate limit and SMTP sessions
+SMS_CARRIERS = {
+    'verizon': {'domain': VERIZON_DOMAIN, 'messages_per_second': 1, 'burst': 5, 'concurrency': 1},
+    'att': {'domain': ATT_DOMAIN, 'messages_per_second': 1, 'burst': 5, 'concurrency': 1},
+    'tmobile': {'domain': TMOBILE_DOMAIN, 'messages_per_second': 2, 'burst': 10, 'concurrency': 2},
+    'sprint': {'domain': SPRINT_DOMAIN, 'messages_per_second': 1, 'burst': 5, 'concurrency': 1},
+}
+SMS_MAX_LENGTH = 160
+SMS_OPT_OUT_NOTE = 'Reply STOP to opt out.'
+SMS_MAX_RETRIES = 2
@@ -0,0 +1,82 @@
+import gzip
+import json
+import os
+import pytest
+from benchmarks import sample_forecasts
+from general_functions import backtest
+from settings import settings
+
+def make_result(target_date, probability, district='rockford', error=None):
+    return {'district': district, 'target_date': target_date, 'probability': probability, 'error': error}
+
+def test_counts_the_confusion_matrix_at_the_threshold():
+    results = [make_result('2024-01-08', 90), make_result('2024-01-09', 60),
+               make_result('2024-01-10', 20), make_result('2024-01-11', 10)]
+    outcomes = {('rockford', '2024-01-08'): True, ('rockford', '2024-01-09'): False,
+                ('rockford', '2024-01-10'): True, ('rockford', '2024-01-11'): False}
+    summary = backtest.score_predictions(results, outcomes, threshold=50, bins=2)
+    assert (summary['true_positives'], summary['false_positives'],
+            summary['true_negatives'], summary['false_negatives']) == (1, 1, 1, 1)
+    assert summary['accuracy'] == 0.5
+    assert summary['precision'] == 0.5
+    assert summary['recall'] == 0.5
+    assert summary['base_rate'] == 0.5
+
+def test_brier_score_and_calibration():
+    results = [make_result('2024-01-08', 100), make_result('2024-01-09', 0)]
+    outcomes = {('rockford', '2024-01-08'): True, ('rockford', '2024-01-09'): False}
+    summary = backtest.score_predictions(results, outcomes, threshold=50, bins=2)
+    assert summary['brier_score'] == 0
+    assert summary['brier_skill_score'] == 1
+    assert summary['expected_calibration_error'] == 0
+    assert [(row['lower'], row['upper'], row['count']) for row in summary['calibration']] == [
+        (0.0, 0.5, 1), (0.5, 1.0, 1)]
+
+def test_skips_missing_probabilities_and_outcomes():
+    results = [make_result('2024-01-08', None, error='timed out'), make_result('2024-01-09', 40),
+               make_result('2024-01-10', 70)]
+    outcomes = {('rockford', '2024-01-10'): True}
+    summary = backtest.score_predictions(results, outcomes, threshold=50, bins=10)
+    assert summary['forecasts'] == 3
+    assert summary['errors'] == 1
+    assert summary['without_outcome'] == 1
+    assert summary['scored'] == 1
+    assert summary['brier_score'] == pytest.approx(0.09)
+    # Every scored day was a closure, so there is no spread to compare against
+    assert summary['brier_skill_score'] is None
+
+def test_nothing_to_score():
+    summary = backtest.score_predictions([make_result('2024-01-08', 50)], {}, threshold=50, bins=10)
+    assert summary == {'forecasts': 1, 'errors': 0, 'without_outcome': 1, 'scored': 0, 'threshold': 50}
+
+def test_reads_the_archive_and_outcomes(tmp_path):
+    archive = tmp_path / 'archive'
+    (archive / 'lakeview').mkdir(parents=True)
+    (archive / '2024-01-08.json').write_bytes(sample_forecasts.make_forecast_bytes(days=2))
+    with gzip.open(archive / 'lakeview' / '2024-01-08.json.gz', 'wb') as forecast_file:
+        forecast_file.write(sample_forecasts.make_forecast_bytes(days=2))
+    (archive / 'notes.txt').write_text('skipped', encoding='utf-8')
+    files = backtest.find_forecast_files(str(archive))
+    assert [(district_id, os.path.basename(path)) for district_id, path in files] == [
+        ('lakeview', '2024-01-08.json.gz'), (settings.DISTRICT_ID, '2024-01-08.json')]
+    assert backtest.load_forecast(files[0][1]) == backtest.load_forecast(files[1][1])
+
+    outcomes_path = tmp_path / 'outcomes.csv'
+    outcomes_path.write_text('date,district,closed\n2024-01-09,,yes\n2024-01-10,lakeview,0\nsoon,,1\n',
+                             encoding='utf-8')
+    assert backtest.load_outcomes(str(outcomes_path)) == {
+        (settings.DISTRICT_ID, '2024-01-09'): True, ('lakeview', '2024-01-10'): False}
+
+def test_prompt_time_is_the_evening_before():
+    assert backtest.get_prompt_time('2024-01-08').isoformat() == '2024-01-08T19:00:00-05:00'
+
+def test_replays_a_forecast_with_the_stub(tmp_path, monkeypatch):
+    path = tmp_path / 'snowy.json'
+    path.write_bytes(sample_forecasts.make_forecast_bytes(days=2, snowy=True))
+    monkeypatch.setattr(backtest, '_worker', {'predictor': backtest.stub_prediction, 'prescreen': True,
+                                              'offline': True, 'districts': {}})
+    result = backtest.replay_forecast('rockford', str(path))
+    assert result['error'] is None
+    assert result['source'] == 'predictor'
+    assert 1 <= result['probability'] <= 99
+    assert result['target_date'] == json.loads(path.read_bytes())['forecast']['forecastday'][1]['date']
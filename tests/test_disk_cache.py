@@ -0,0 +1,67 @@
+import os
+import time
+from general_functions import disk_cache
+from general_functions.disk_cache import DiskCache
+
+def age(cache, key, modified_ago=0, accessed_ago=0):
+    now = time.time()
+    os.utime(cache._path(key), (now - accessed_ago, now - modified_ago))
+
+def test_round_trip_and_counters(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl_seconds=60, max_entries=10)
+    key = DiskCache.make_key('forecast', '49341')
+    assert cache.get(key) is None
+    cache.set(key, b'snow')
+    assert cache.get(key) == b'snow'
+    assert cache.stats == {'hits': 1, 'misses': 1, 'writes': 1, 'evictions': 0}
+
+def test_make_key_is_stable():
+    assert DiskCache.make_key('a', 1) == DiskCache.make_key('a', '1')
+    assert DiskCache.make_key('a', 1) != DiskCache.make_key('a', 2)
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl_seconds=60, max_entries=10)
+    cache.set('old', b'old')
+    age(cache, 'old', modified_ago=61)
+    assert cache.get('old') is None
+
+def test_evicts_the_least_recently_used_entries(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl_seconds=3600, max_entries=10)
+    for index in range(10):
+        cache.set(f'key{index}', b'x')
+        age(cache, f'key{index}', accessed_ago=100 - index)
+    # key0 is the oldest write, but reading it makes it recent
+    assert cache.get('key0') == b'x'
+    cache.set('key10', b'x')
+    remaining = {name[:-len(disk_cache.ENTRY_SUFFIX)] for name in os.listdir(tmp_path)}
+    # Over the limit, the scan evicts down to 90% of max_entries
+    assert remaining == {'key0', 'key3', 'key4', 'key5', 'key6', 'key7', 'key8', 'key9', 'key10'}
+    assert cache.stats['evictions'] == 2
+
+def test_evicts_by_bytes(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl_seconds=3600, max_entries=100, max_bytes=100)
+    for index in range(4):
+        cache.set(f'key{index}', b'x' * 30)
+        age(cache, f'key{index}', accessed_ago=100 - index)
+    assert sorted(os.listdir(tmp_path)) == [f'key{index}{disk_cache.ENTRY_SUFFIX}' for index in (1, 2, 3)]
+
+def test_writes_only_scan_the_directory_when_full(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path), ttl_seconds=3600, max_entries=100)
+    scans = []
+    real_listdir = os.listdir
+    monkeypatch.setattr(disk_cache.os, 'listdir', lambda path: scans.append(path) or real_listdir(path))
+    for index in range(200):
+        cache.set(f'key{index}', b'x')
+    # One scan to learn the size, then one every time the count passes the limit
+    assert len(scans) <= 1 + 200 // (100 - int(100 * disk_cache.EVICTION_TARGET_RATIO))
+    assert len(real_listdir(tmp_path)) <= 100
+
+def test_overwrite_and_delete_keep_the_count(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl_seconds=3600, max_entries=2)
+    cache.set('a', b'1')
+    cache.set('a', b'22')
+    cache.set('b', b'1')
+    cache.delete('b')
+    cache.delete('missing')
+    assert (cache._entry_count, cache._byte_count) == (1, 2)
+    assert cache.get('a') == b'22'
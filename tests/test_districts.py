@@ -0,0 +1,25 @@
+import pytest
+from general_functions import districts
+from settings import settings
+
+def test_no_districts_runs_the_default_school(monkeypatch):
+    monkeypatch.setattr(settings, 'DISTRICTS', [])
+    assert [district['id'] for district in districts.get_batch_districts()] == [settings.DISTRICT_ID]
+
+def test_districts_are_layered_on_the_default_school(monkeypatch):
+    monkeypatch.setattr(settings, 'DISTRICTS', [{'id': ' kentwood ', 'zip_code': 49508},
+                                                {'id': 'caledonia', 'sign_up_form_id': 'form'}])
+    kentwood, caledonia = districts.get_batch_districts()
+    assert (kentwood['id'], kentwood['zip_code'], kentwood['sign_up_form_id']) == ('kentwood', '49508', None)
+    assert (caledonia['id'], caledonia['zip_code']) == ('caledonia', str(settings.ZIP_CODE))
+    assert caledonia['school_name'] == settings.SCHOOL_NAME
+
+@pytest.mark.parametrize('configured', [
+    [{'zip_code': '49341'}],
+    [{'id': '  '}],
+    [{'id': 'kentwood'}, {'id': 'kentwood', 'zip_code': '49508'}],
+])
+def test_missing_or_duplicate_ids_are_rejected(monkeypatch, configured):
+    monkeypatch.setattr(settings, 'DISTRICTS', configured)
+    with pytest.raises(ValueError):
+        districts.get_batch_districts()
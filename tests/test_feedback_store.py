@@ -0,0 +1,99 @@
+import threading
+import time
+import pytest
+from general_functions import feedback_store
+from settings import settings
+
+@pytest.fixture(autouse=True)
+def fixture_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'FEEDBACK_STORE_PATH', str(tmp_path / 'feedback.sqlite3'))
+
+@pytest.fixture(name='make_buffer')
+def fixture_make_buffer():
+    buffers = []
+
+    def make_buffer(**kwargs):
+        # A long interval, so only a full batch or close() wakes the flush thread
+        buffer = feedback_store.VoteBuffer(**dict({'flush_seconds': 60}, **kwargs))
+        buffers.append(buffer)
+        return buffer
+    yield make_buffer
+    for buffer in buffers:
+        if not buffer._closed:
+            buffer.close()
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+def test_counts_start_from_the_store(make_buffer):
+    feedback_store.append_votes([('rockford', '2024-01-09', 'yes', 1.0), ('rockford', '2024-01-09', 'no', 2.0)])
+    buffer = make_buffer()
+    assert buffer.add('rockford', '2024-01-09', 'yes') == {'yes': 2, 'no': 1}
+    assert buffer.get_counts('rockford', '2024-01-09') == {'yes': 2, 'no': 1}
+    assert buffer.get_counts('rockford', '2024-01-10') == {'yes': 0, 'no': 0}
+    assert buffer.pending == 1
+
+def test_full_buffer_refuses_votes(make_buffer):
+    buffer = make_buffer(max_pending_votes=2)
+    assert buffer.add('rockford', '2024-01-09', 'yes')
+    assert buffer.add('rockford', '2024-01-09', 'no')
+    assert buffer.add('rockford', '2024-01-09', 'yes') is None
+    assert buffer.get_counts('rockford', '2024-01-09') == {'yes': 1, 'no': 1}
+
+def test_full_batch_is_flushed_by_the_thread(make_buffer):
+    buffer = make_buffer(flush_max_votes=3)
+    for vote in ('yes', 'yes', 'no'):
+        buffer.add('rockford', '2024-01-09', vote)
+    wait_for(lambda: buffer.pending == 0)
+    assert feedback_store.get_counts() == {('rockford', '2024-01-09'): {'yes': 2, 'no': 1}}
+
+def test_close_writes_the_pending_votes(make_buffer):
+    buffer = make_buffer()
+    buffer.add('rockford', '2024-01-09', 'yes')
+    buffer.add('grand_rapids', '2024-01-10', 'no')
+    buffer.close()
+    assert not buffer._thread.is_alive()
+    assert buffer.add('rockford', '2024-01-09', 'yes') is None
+    assert feedback_store.get_counts(start_date='2024-01-10') == {('grand_rapids', '2024-01-10'): {'yes': 0, 'no': 1}}
+    assert len(feedback_store.get_counts()) == 2
+
+def test_failed_flush_keeps_the_votes(make_buffer, monkeypatch):
+    buffer = make_buffer()
+    buffer.add('rockford', '2024-01-09', 'yes')
+    append_votes = feedback_store.append_votes
+
+    def fail(votes):
+        raise OSError('disk full')
+    monkeypatch.setattr(feedback_store, 'append_votes', fail)
+    assert buffer.flush() == 0
+    buffer.add('rockford', '2024-01-09', 'no')
+    assert buffer.pending == 2
+
+    monkeypatch.setattr(feedback_store, 'append_votes', append_votes)
+    assert buffer.flush() == 2
+    assert feedback_store.get_counts() == {('rockford', '2024-01-09'): {'yes': 1, 'no': 1}}
+
+def test_flush_thread_survives_a_failure(make_buffer):
+    buffer = make_buffer(flush_max_votes=1)
+    flush = buffer.flush
+    calls = []
+    flushed = threading.Event()
+
+    def flaky_flush():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise RuntimeError('flush broke')
+        written = flush()
+        flushed.set()
+        return written
+    buffer.flush = flaky_flush
+
+    buffer.add('rockford', '2024-01-09', 'yes')
+    wait_for(lambda: calls)
+    buffer.add('rockford', '2024-01-09', 'no')
+    assert flushed.wait(5)
+    assert buffer._thread.is_alive()
+    assert feedback_store.get_counts() == {('rockford', '2024-01-09'): {'yes': 1, 'no': 1}}
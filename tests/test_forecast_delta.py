@@ -0,0 +1,33 @@
+from weatherapi import forecast_delta
+
+THRESHOLDS = {'temp_f': 4, 'chance_of_snow': 20}
+
+def make_delta(changes, hours_changed=False, alert_changed=False):
+    return {'hours_changed': hours_changed, 'alert_changed': alert_changed, 'changes': changes}
+
+def test_small_changes_keep_the_stored_prediction():
+    delta = make_delta({'temp_f': {22: 3.9, 23: -2}, 'chance_of_snow': {22: 19}})
+    assert forecast_delta.get_change_reasons(delta, THRESHOLDS) == []
+
+def test_reports_the_largest_change_of_each_field():
+    delta = make_delta({'temp_f': {22: 4, 23: -6.5}, 'chance_of_snow': {1: 10}})
+    assert forecast_delta.get_change_reasons(delta, THRESHOLDS) == ['temp_f -6.5 at 23:00']
+
+def test_change_at_the_threshold_counts():
+    delta = make_delta({'chance_of_snow': {5: 20}})
+    assert forecast_delta.get_change_reasons(delta, THRESHOLDS) == ['chance_of_snow +20 at 05:00']
+
+def test_hours_and_alert_changes_come_first():
+    delta = make_delta({'temp_f': {7: 10}}, hours_changed=True, alert_changed=True)
+    assert forecast_delta.get_change_reasons(delta, THRESHOLDS) == [
+        'different forecast hours', 'weather alert changed', 'temp_f +10 at 07:00']
+
+def test_fields_without_changes_or_thresholds_are_ignored():
+    delta = make_delta({'temp_f': {}, 'wind_mph': {3: 50}})
+    assert forecast_delta.get_change_reasons(delta, THRESHOLDS) == []
+
+def test_compute_delta_feeds_get_change_reasons():
+    previous = {'hours': [22, 23], 'alert': [None, None], 'fields': {'temp_f': [30, 28]}}
+    current = {'hours': [22, 23], 'alert': [None, None], 'fields': {'temp_f': [30, 22]}}
+    delta = forecast_delta.compute_delta(previous, current)
+    assert forecast_delta.get_change_reasons(delta, THRESHOLDS) == ['temp_f -6 at 23:00']
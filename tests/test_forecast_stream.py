@@ -0,0 +1,100 @@
+import io
+import json
+from datetime import date
+import ijson
+import pytest
+from benchmarks import sample_forecasts
+from general_functions import http_client
+from general_functions import outlook
+from general_functions import prediction_store
+from weatherapi import forecast_stream
+from weatherapi import weather_api_calls
+from weatherapi import weather_data
+
+def assert_same_weather(streamed, parsed):
+    assert list(streamed['hourly'].hours) == list(parsed['hourly'].hours)
+    assert streamed['hourly'].conditions == parsed['hourly'].conditions
+    for field, column in parsed['hourly'].columns.items():
+        assert list(streamed['hourly'].column(field)) == list(column), field
+    assert {key: value for key, value in streamed.items() if key != 'hourly'} == \
+        {key: value for key, value in parsed.items() if key != 'hourly'}
+
+@pytest.mark.parametrize('snowy, alerts', [(True, 1), (True, 3), (False, 0)])
+def test_stream_matches_the_dict_parse(snowy, alerts):
+    forecast = sample_forecasts.make_forecast(days=3, snowy=snowy, alerts=alerts, seed=7)
+    streamed = forecast_stream.parse_relevant_weather_information(io.BytesIO(json.dumps(forecast).encode('utf-8')))
+    assert_same_weather(streamed, weather_data.get_relevant_weather_information(forecast))
+    assert ('weather_alert_event' in streamed) == bool(alerts)
+
+def test_windows_on_later_days():
+    forecast = sample_forecasts.make_forecast(days=4, seed=3)
+    windows = weather_data.get_night_windows(3)
+    hourly_windows, _ = forecast_stream.parse_forecast_windows(
+        io.BytesIO(json.dumps(forecast).encode('utf-8')), windows)
+    assert [list(window.hours) for window in hourly_windows] == [list(range(19, 24)), list(range(0, 8))]
+    assert hourly_windows[1].column('temp_f')[0] == forecast['forecast']['forecastday'][3]['hour'][0]['temp_f']
+
+def test_windows_past_the_forecast_are_empty():
+    body = sample_forecasts.make_forecast_bytes(days=2)
+    hourly_windows, _ = forecast_stream.parse_forecast_windows(io.BytesIO(body), [(5, 0, 8)])
+    assert len(hourly_windows[0]) == 0
+
+def make_two_alert_forecast():
+    forecast = sample_forecasts.make_forecast(days=4, alerts=2)
+    # The first alert runs from 15:00 on Jan 9 to 19:00 on Jan 10, the second covers Jan 11 early morning
+    forecast['alerts']['alert'][1].update(event='Winter Weather Advisory', effective='2024-01-11T02:00:00-05:00',
+                                          expires='2024-01-11T10:00:00-05:00')
+    return forecast
+
+def test_alerts_are_picked_per_period():
+    body = json.dumps(make_two_alert_forecast()).encode('utf-8')
+    periods = [outlook.get_night_period(date(2024, 1, day)) for day in (10, 11, 12)]
+    _, period_alerts = forecast_stream.parse_forecast_windows(io.BytesIO(body), [], periods)
+    # The first alert expires right as the second night starts, so it only covers the first
+    assert [alert_data.get('weather_alert_event') for alert_data in period_alerts] == \
+        ['Winter Storm Warning', 'Winter Weather Advisory', None]
+
+def test_alert_without_times_is_open_ended():
+    start, end = outlook.get_night_period(date(2024, 1, 10))
+    assert weather_data.alert_overlaps({'event': 'Winter Storm Watch'}, start, end)
+    assert not weather_data.alert_overlaps({'effective': '2024-01-10T08:00:00-05:00'}, start, end)
+
+def test_cut_off_body_raises():
+    body = sample_forecasts.make_forecast_bytes(days=2)
+    with pytest.raises(ijson.JSONError):
+        forecast_stream.parse_relevant_weather_information(io.BytesIO(body[:len(body) // 2]))
+
+class FakeResponse:
+    def __init__(self, body):
+        self.raw = io.BytesIO(body)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+def test_fetch_returns_none_for_a_cut_off_body(monkeypatch):
+    body = sample_forecasts.make_forecast_bytes(days=2)
+    monkeypatch.setattr(http_client, 'get', lambda url, **kwargs: FakeResponse(body[:len(body) // 2]))
+    assert weather_api_calls.get_forecast_windows(weather_data.RELEVANT_WINDOWS, '49341', use_cache=False) is None
+
+def test_fetch_streams_a_whole_body(monkeypatch):
+    forecast = sample_forecasts.make_forecast(days=2)
+    body = json.dumps(forecast).encode('utf-8')
+    monkeypatch.setattr(http_client, 'get', lambda url, **kwargs: FakeResponse(body))
+    streamed = weather_api_calls.get_relevant_forecast('49341', use_cache=False)
+    assert_same_weather(streamed, weather_data.get_relevant_weather_information(forecast))
+
+def test_outlook_nights_only_carry_their_own_alert(monkeypatch):
+    body = json.dumps(make_two_alert_forecast()).encode('utf-8')
+    monkeypatch.setattr(http_client, 'get', lambda url, **kwargs: FakeResponse(body))
+    monkeypatch.setattr(prediction_store, 'get_target_date', lambda now=None: '2024-01-10')
+    nights = outlook.fetch_nights({'zip_code': '49341'}, [date(2024, 1, day) for day in (10, 11, 12)],
+                                  use_cache=False)
+    assert [night.get('weather_alert_event') for night in nights] == \
+        ['Winter Storm Warning', 'Winter Weather Advisory', None]
+    assert [list(night['hourly'].hours) for night in nights] == [list(range(19, 24)) + list(range(8))] * 3
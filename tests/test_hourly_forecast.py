@@ -0,0 +1,73 @@
+from array import array
+import random
+from datetime import date
+import pytest
+from benchmarks import sample_forecasts
+from weatherapi import weather_data
+from weatherapi.hourly_forecast import HourlyForecast, NUMERIC_FIELDS
+
+def make_hours(hours_of_day, **overrides):
+    rng = random.Random(1)
+    hours = []
+    for hour_of_day in hours_of_day:
+        hour = sample_forecasts.make_hour(rng, date(2024, 1, 9), hour_of_day, snowy=True)
+        hour.update(overrides)
+        hours.append(hour)
+    return hours
+
+def make_forecast(hours_of_day):
+    forecast = HourlyForecast()
+    for hour in make_hours(hours_of_day):
+        forecast.append(int(hour['time'][-5:-3]), hour)
+    return forecast
+
+def test_append_keeps_one_column_per_field():
+    hours = make_hours([22, 23])
+    forecast = HourlyForecast()
+    for hour in hours:
+        forecast.append(int(hour['time'][-5:-3]), hour)
+    assert len(forecast) == 2
+    assert list(forecast.hours) == [22, 23]
+    assert forecast.conditions == [hour['condition']['text'] for hour in hours]
+    for field, source_key in NUMERIC_FIELDS.items():
+        assert list(forecast.column(field)) == [pytest.approx(hour.get(source_key, 0)) for hour in hours]
+
+def test_missing_snow_defaults_to_zero_but_other_fields_are_required():
+    hour = make_hours([1])[0]
+    del hour['snow_cm']
+    forecast = HourlyForecast()
+    forecast.append(1, hour)
+    assert list(forecast.column('snow_cm')) == [0]
+    del hour['temp_f']
+    with pytest.raises(KeyError):
+        forecast.append(2, hour)
+
+def test_select_keeps_the_order_of_the_forecast():
+    forecast = make_forecast([22, 23, 0, 1, 5, 6, 7])
+    commute = forecast.select(range(5, 8))
+    assert list(commute.hours) == [5, 6, 7]
+    assert list(commute.column('temp_f')) == list(forecast.column('temp_f'))[4:]
+    assert commute.conditions == forecast.conditions[4:]
+
+def test_aggregates():
+    forecast = HourlyForecast()
+    forecast.columns['temp_f'] = array('d', [20, 12.5, 31])
+    assert forecast.minimum('temp_f') == 12.5
+    assert forecast.maximum('temp_f') == 31
+    assert forecast.total('temp_f') == 63.5
+    assert HourlyForecast().minimum('temp_f', default=None) is None
+    assert HourlyForecast().total('snow_cm') == 0
+
+def test_extend_and_records():
+    evening, morning = make_forecast([22, 23]), make_forecast([0, 1])
+    evening.extend(morning)
+    records = list(evening.records())
+    assert [hour_of_day for hour_of_day, _, _ in records] == [22, 23, 0, 1]
+    assert records[2][2]['temp_f'] == morning.column('temp_f')[0]
+    assert set(records[0][2]) == set(NUMERIC_FIELDS)
+
+def test_dict_parse_fills_the_relevant_windows():
+    forecast = sample_forecasts.make_forecast(days=2, alerts=1)
+    relevant = weather_data.get_relevant_weather_information(forecast)
+    assert list(relevant['hourly'].hours) == list(range(19, 24)) + list(range(0, 8))
+    assert relevant['weather_alert_event'] == 'Winter Storm Warning'
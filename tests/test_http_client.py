@@ -0,0 +1,113 @@
+from types import SimpleNamespace
+import pytest
+import requests
+from general_functions import http_client
+from general_functions import metrics
+from settings import settings
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+class FakeSession:
+    '''
+    Answers requests from a list of responses (or exceptions to raise) and records the timeouts.
+    '''
+    def __init__(self, clock, answers, seconds_per_request=0.0):
+        self.clock = clock
+        self.answers = list(answers)
+        self.seconds_per_request = seconds_per_request
+        self.timeouts = []
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+        self.clock.now += self.seconds_per_request
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+@pytest.fixture(name='clock')
+def fixture_clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0, sleeps=[])
+
+    def sleep(seconds):
+        clock.sleeps.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr(http_client, 'time', SimpleNamespace(monotonic=lambda: clock.now, sleep=sleep))
+    monkeypatch.setattr(http_client, '_deadline', None)
+    monkeypatch.setattr(http_client.random, 'uniform', lambda low, high: high)
+    return clock
+
+def use_session(monkeypatch, clock, answers, seconds_per_request=0.0):
+    session = FakeSession(clock, answers, seconds_per_request)
+    monkeypatch.setattr(http_client, '_session', session)
+    return session
+
+URL = 'https://api.weatherapi.com/v1/forecast.json'
+
+def test_retries_server_errors_with_backoff(clock, monkeypatch):
+    first, second = FakeResponse(503), FakeResponse(502)
+    use_session(monkeypatch, clock, [first, second, FakeResponse(200)])
+    with metrics.span('forecast_fetch') as span:
+        assert http_client.get(URL).status_code == 200
+    base = settings.HTTP_RETRY_BASE_SECONDS
+    assert clock.sleeps == [base, base * 2]
+    assert first.closed and second.closed
+    assert span['http_retries'] == 2
+
+def test_retry_after_is_honored(clock, monkeypatch):
+    use_session(monkeypatch, clock, [FakeResponse(429, {'Retry-After': '3'}), FakeResponse(200)])
+    assert http_client.get(URL).status_code == 200
+    assert clock.sleeps == [3.0]
+
+def test_last_retryable_response_is_returned(clock, monkeypatch):
+    use_session(monkeypatch, clock, [FakeResponse(500) for _ in range(settings.HTTP_RETRY_ATTEMPTS)])
+    assert http_client.get(URL).status_code == 500
+    assert len(clock.sleeps) == settings.HTTP_RETRY_ATTEMPTS - 1
+
+def test_connection_errors_are_retried_then_raised(clock, monkeypatch):
+    errors = [requests.ConnectionError('refused') for _ in range(settings.HTTP_RETRY_ATTEMPTS)]
+    use_session(monkeypatch, clock, errors)
+    with pytest.raises(requests.ConnectionError):
+        http_client.get(URL)
+    assert len(clock.sleeps) == settings.HTTP_RETRY_ATTEMPTS - 1
+
+def test_posts_are_not_retried(clock, monkeypatch):
+    use_session(monkeypatch, clock, [FakeResponse(503)])
+    assert http_client.request('POST', URL).status_code == 503
+    assert clock.sleeps == []
+
+def test_timeout_is_cut_to_the_deadline(clock, monkeypatch):
+    session = use_session(monkeypatch, clock, [FakeResponse(200), FakeResponse(200)], seconds_per_request=8)
+    http_client.start_run(10)
+    http_client.get(URL, timeout=30)
+    http_client.get(URL, timeout=30)
+    assert session.timeouts == [10, 2]
+
+def test_passed_deadline_fails_fast(clock, monkeypatch):
+    session = use_session(monkeypatch, clock, [])
+    http_client.start_run(5)
+    clock.now += 5
+    with pytest.raises(requests.Timeout, match='deadline passed'):
+        http_client.get(URL)
+    assert session.timeouts == []
+
+def test_no_retry_past_the_deadline(clock, monkeypatch):
+    use_session(monkeypatch, clock, [FakeResponse(503, {'Retry-After': '8'}), FakeResponse(200)])
+    http_client.start_run(5)
+    with pytest.raises(requests.Timeout, match='no time to retry'):
+        http_client.get(URL)
+    assert clock.sleeps == []
+
+def test_start_run_without_a_deadline(clock):
+    http_client.start_run(0)
+    assert http_client.remaining_seconds() is None
+    http_client.start_run(60)
+    assert http_client.remaining_seconds() == 60
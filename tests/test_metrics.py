@@ -0,0 +1,76 @@
+import json
+import threading
+import pytest
+from general_functions import metrics
+from settings import settings
+
+@pytest.fixture(autouse=True)
+def fixture_spans(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, '_spans', [])
+    monkeypatch.setattr(settings, 'METRICS_PATH', str(tmp_path / 'metrics.jsonl'))
+
+def test_span_records_attributes_and_errors():
+    with metrics.span('forecast_fetch', zip_code='49341') as span:
+        span['bytes'] = 100
+    with pytest.raises(ValueError):
+        with metrics.span('prompt_build'):
+            raise ValueError('bad prompt')
+    forecast, prompt = metrics._spans
+    assert (forecast['stage'], forecast['status'], forecast['zip_code'], forecast['bytes']) == \
+        ('forecast_fetch', 'ok', '49341', 100)
+    assert (prompt['stage'], prompt['status']) == ('prompt_build', 'error')
+    assert forecast['run_id'] == metrics.RUN_ID
+
+def test_annotate_and_increment_the_innermost_span():
+    metrics.annotate(ignored=True)
+    with metrics.span('prediction'):
+        with metrics.span('assistant_run'):
+            metrics.increment(total_tokens=700)
+            metrics.increment(total_tokens=150)
+        metrics.annotate(source='cache')
+    assistant_run, prediction = metrics._spans
+    assert assistant_run['total_tokens'] == 850
+    assert prediction['source'] == 'cache'
+    assert 'total_tokens' not in prediction and 'ignored' not in prediction
+
+def test_spans_are_kept_per_thread():
+    def worker():
+        with metrics.span('worker'):
+            metrics.increment(sent=1)
+    with metrics.span('main'):
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+    worker_span, main_span = metrics._spans
+    assert worker_span['sent'] == 1 and 'sent' not in main_span
+
+def test_flush_appends_and_clears(tmp_path):
+    metrics.record('batch', 1.5, districts=3)
+    assert metrics.flush() == 1
+    metrics.record('batch', 2.5)
+    assert metrics.flush() == 1
+    assert metrics.flush() == 0
+    lines = (tmp_path / 'metrics.jsonl').read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line)['seconds'] for line in lines] == [1.5, 2.5]
+
+def test_flush_when_disabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'METRICS_ENABLED', False)
+    metrics.record('batch', 1)
+    assert metrics.flush() == 0
+    assert metrics._spans == []
+    assert not (tmp_path / 'metrics.jsonl').exists()
+
+def test_load_spans_of_the_last_runs(tmp_path):
+    path = tmp_path / 'metrics.jsonl'
+    lines = [json.dumps({'run_id': run_id, 'stage': 'batch', 'seconds': seconds})
+             for run_id, seconds in (('a', 1), ('b', 2), ('b', 3), ('c', 4))]
+    path.write_text('\n'.join(lines[:2] + ['not json'] + lines[2:]) + '\n', encoding='utf-8')
+    assert len(metrics.load_spans()) == 4
+    assert [entry['seconds'] for entry in metrics.load_spans(runs=2)] == [2, 3, 4]
+    assert metrics.load_spans(str(tmp_path / 'missing.jsonl')) == []
+
+def test_summarize():
+    spans = [{'stage': 'send', 'seconds': seconds, 'status': 'ok'} for seconds in range(1, 21)]
+    spans.append({'stage': 'send', 'seconds': 30, 'status': 'error'})
+    summary = metrics.summarize(spans)['send']
+    assert summary == {'count': 21, 'errors': 1, 'p50_seconds': 11, 'p95_seconds': 20, 'max_seconds': 30}
@@ -0,0 +1,69 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import openai
+import pytest
+from openai_actions import open_ai_api_calls as openai_api
+from openai_actions import open_ai_metadata_cache as metadata_cache
+from settings import settings
+
+class FakeFiles:
+    def __init__(self, uploads=()):
+        self.uploads = {upload.id: upload for upload in uploads}
+        self.created = []
+        self.deleted = []
+        self._lock = threading.Lock()
+
+    def create(self, file, purpose):
+        file.read()
+        # Leave time for other threads to get past the cache check
+        time.sleep(0.05)
+        with self._lock:
+            upload = make_upload(f'file-{len(self.created)}', time.time())
+            self.created.append(upload.id)
+            self.uploads[upload.id] = upload
+        return upload
+
+    def list(self, purpose):
+        return list(self.uploads.values())
+
+    def delete(self, file_id):
+        self.deleted.append(file_id)
+        self.uploads.pop(file_id)
+
+def make_upload(file_id, created_at, filename=None):
+    return SimpleNamespace(id=file_id, created_at=int(created_at), filename=filename or settings.SNOW_DAY_FACTOR_FILE)
+
+@pytest.fixture(name='fake_files')
+def fixture_fake_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'OPENAI_METADATA_CACHE_PATH', str(tmp_path / 'openai_metadata.json'))
+    fake_files = FakeFiles()
+    monkeypatch.setattr(openai, 'files', fake_files)
+    return fake_files
+
+def test_concurrent_callers_share_one_upload(fake_files):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        file_ids = list(executor.map(lambda _: openai_api.get_helping_files(), range(8)))
+    assert fake_files.created == ['file-0']
+    assert set(file_ids) == {'file-0'}
+    assert fake_files.deleted == []
+
+def test_cached_upload_is_reused(fake_files):
+    assert openai_api.get_helping_files() == openai_api.get_helping_files()
+    assert len(fake_files.created) == 1
+    file_hash = metadata_cache.get_file_hash(openai_api.get_factor_file_path())
+    assert metadata_cache.load_metadata()['files'][file_hash]['id'] == 'file-0'
+
+def test_cleanup_leaves_recent_uploads_alone(fake_files):
+    now = time.time()
+    grace = settings.OPENAI_STALE_UPLOAD_GRACE_SECONDS
+    for upload in (make_upload('old', now - grace - 60), make_upload('recent', now - 60),
+                   make_upload('other', now - grace - 60, filename='other.txt')):
+        fake_files.uploads[upload.id] = upload
+    metadata_cache.update_metadata('files', 'outdated-hash', {'id': 'old', 'validated_at': now})
+
+    openai_api.get_helping_files()
+    assert fake_files.deleted == ['old']
+    assert set(fake_files.uploads) == {'recent', 'other', 'file-0'}
+    assert 'outdated-hash' not in metadata_cache.load_metadata()['files']
@@ -0,0 +1,46 @@
+from datetime import date
+from benchmarks import sample_forecasts
+from general_functions import overnight_watch
+from weatherapi import weather_data
+from settings import settings
+
+THRESHOLDS = {'commute_min_temp_f': 4, 'commute_max_chance_of_snow': 20}
+
+def make_features(**changes):
+    features = {'commute_min_temp_f': 20.0, 'commute_max_chance_of_snow': 60,
+                'weather_alert_event': None, 'weather_alert_severity': None}
+    features.update(changes)
+    return features
+
+def test_small_changes_keep_the_prediction():
+    current = make_features(commute_min_temp_f=23.9, commute_max_chance_of_snow=41)
+    assert overnight_watch.get_change_reasons(make_features(), current, THRESHOLDS) == []
+
+def test_change_at_the_threshold_counts():
+    current = make_features(commute_min_temp_f=16.0, commute_max_chance_of_snow=80)
+    assert overnight_watch.get_change_reasons(make_features(), current, THRESHOLDS) == [
+        'commute_min_temp_f 20 -> 16', 'commute_max_chance_of_snow 60 -> 80']
+
+def test_alert_changes_come_first():
+    current = make_features(weather_alert_event='Winter Storm Warning', weather_alert_severity='Moderate',
+                            commute_min_temp_f=10.5)
+    assert overnight_watch.get_change_reasons(make_features(), current, THRESHOLDS) == [
+        'weather_alert_event None -> Winter Storm Warning', 'weather_alert_severity None -> Moderate',
+        'commute_min_temp_f 20 -> 10.5']
+
+def test_missing_values_count_as_a_change():
+    previous = make_features(commute_min_temp_f=None)
+    assert overnight_watch.get_change_reasons(previous, make_features(), THRESHOLDS) == [
+        'commute_min_temp_f None -> 20.0']
+    both_missing = make_features(commute_min_temp_f=None)
+    assert overnight_watch.get_change_reasons(previous, both_missing, THRESHOLDS) == []
+
+def test_default_thresholds_cover_the_prediction_features():
+    forecast = sample_forecasts.make_forecast(days=2, seed=5)
+    features = weather_data.get_prediction_features(weather_data.get_relevant_weather_information(forecast))
+    assert set(settings.WATCH_CHANGE_THRESHOLDS) <= set(features)
+    assert overnight_watch.get_change_reasons(features, dict(features)) == []
+
+def test_watch_windows_drop_the_evening_after_midnight():
+    assert overnight_watch.get_watch_windows(date(2024, 1, 10), date(2024, 1, 9)) == weather_data.RELEVANT_WINDOWS
+    assert overnight_watch.get_watch_windows(date(2024, 1, 10), date(2024, 1, 10)) == ((0, 0, 8),)
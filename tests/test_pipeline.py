@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from email_functions import email_delivery
+from email_functions import email_helpers
+from general_functions import general_functions
+from general_functions import pipeline
+
+@pytest.fixture(name='timer')
+def fixture_timer():
+    executor = ThreadPoolExecutor(max_workers=2)
+    yield pipeline.StageTimer(executor, {'slow': 0.05, 'fast': 1})
+    executor.shutdown(wait=False)
+
+def run_stage(timer, name, func, *args):
+    return asyncio.run(timer.run(name, func, *args))
+
+def test_stage_result_and_timing(timer):
+    assert run_stage(timer, 'fast', lambda value: value * 2, 21) == 42
+    assert timer.stages['fast']['status'] == 'ok'
+    assert timer.stages['fast']['seconds'] < 1
+
+def test_stage_timeout(timer):
+    release = threading.Event()
+    with pytest.raises(TimeoutError, match='The slow stage timed out after 0.05 seconds'):
+        run_stage(timer, 'slow', release.wait, 5)
+    release.set()
+    assert timer.stages['slow']['status'] == 'timed out'
+    assert timer.stages['slow']['seconds'] < 1
+
+def test_stage_without_a_timeout_waits(timer):
+    assert run_stage(timer, 'unlisted', lambda: time.sleep(0.1) or 'done') == 'done'
+
+def test_failed_stage(timer):
+    def fail():
+        raise ValueError('no forecast')
+    with pytest.raises(ValueError):
+        run_stage(timer, 'fast', fail)
+    assert timer.stages['fast']['status'] == 'failed'
+    assert 'fast' in timer.summary()
+
+class FakePool:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+def test_forecast_timeout_stops_the_pipeline(monkeypatch):
+    release = threading.Event()
+    pool = FakePool()
+    monkeypatch.setattr(pipeline, 'fetch_forecast', lambda zip_code: release.wait(5))
+    monkeypatch.setattr(pipeline, 'look_up_assistant', lambda: None)
+    monkeypatch.setattr(email_helpers, 'fetch_email_recipients', lambda form_id: {})
+    monkeypatch.setattr(email_delivery, 'open_smtp_pool', lambda: pool)
+    monkeypatch.setattr(general_functions, 'predict_snow_day',
+                        lambda *args: pytest.fail('predicted without a forecast'))
+
+    start_time = time.perf_counter()
+    with pytest.raises(TimeoutError, match='forecast'):
+        pipeline.run(timeouts={'forecast': 0.1})
+    release.set()
+    assert time.perf_counter() - start_time < 2
+    # The speculative SMTP login was never used, so its pool is closed
+    assert pool.closed
@@ -0,0 +1,45 @@
+import json
+import pytest
+from openai_actions.open_ai_data import parse_snow_day_prediction, read_probability
+
+@pytest.mark.parametrize('value, expected', [
+    (40, 40.0),
+    ('62.5', 62.5),
+    ('about 40%', 40.0),
+    ('40 percent', 40.0),
+    (140, 100.0),
+    (-5, 0.0),
+    ('250%', 100.0),
+    ('likely', None),
+    (None, None),
+    (True, None),
+])
+def test_read_probability(value, expected):
+    assert read_probability(value) == expected
+
+def test_structured_prediction():
+    prediction = parse_snow_day_prediction(json.dumps(
+        {'probability': 85, 'rationale': ' Heavy snow overnight. ', 'message': 'An 85% chance!'}))
+    assert prediction == {'probability': 85.0, 'rationale': 'Heavy snow overnight.', 'message': 'An 85% chance!'}
+
+def test_code_fences_are_ignored():
+    response = '```json\n{"probability": "40%", "rationale": "", "message": "Maybe."}\n```'
+    assert parse_snow_day_prediction(response)['probability'] == 40.0
+
+def test_missing_message_uses_the_template():
+    response = json.dumps({'probability': 72.4, 'rationale': 'Icy roads.'})
+    prediction = parse_snow_day_prediction(response)
+    assert prediction['message'] == 'Blizzard predicts a 72% chance of a snow day. Icy roads.'
+    assert '{' not in prediction['message']
+
+def test_missing_message_and_probability_is_a_failure():
+    prediction = parse_snow_day_prediction('{"rationale": "no idea", "message": null}')
+    assert prediction == {'probability': None, 'rationale': 'no idea', 'message': ''}
+
+def test_text_fallback_is_clamped():
+    prediction = parse_snow_day_prediction('There is a 150% chance of a snow day tomorrow!')
+    assert prediction['probability'] == 100.0
+    assert prediction['message'] == 'There is a 150% chance of a snow day tomorrow!'
+
+def test_text_without_a_probability():
+    assert parse_snow_day_prediction(None) == {'probability': None, 'rationale': '', 'message': ''}
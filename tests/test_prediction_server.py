@@ -0,0 +1,71 @@
+import json
+from datetime import date
+import pytest
+from general_functions import prediction_server
+from settings import settings
+
+TODAY = date(2026, 1, 5)
+DISTRICT_IDS = {'rockford', 'grand_rapids'}
+
+@pytest.mark.parametrize('accept_encoding, available, expected', [
+    ('gzip, deflate, br', {None, 'gzip', 'br'}, 'br'),
+    ('gzip, deflate, br', {None, 'gzip'}, 'gzip'),
+    ('br;q=0, gzip', {None, 'gzip', 'br'}, 'gzip'),
+    ('GZIP;q=0.5', {None, 'gzip'}, 'gzip'),
+    ('*', {None, 'gzip'}, 'gzip'),
+    ('*, gzip;q=0', {None, 'gzip'}, None),
+    ('identity', {None, 'gzip'}, None),
+    ('gzip;q=oops', {None, 'gzip'}, None),
+    ('', {None, 'gzip'}, None),
+])
+def test_choose_encoding(accept_encoding, available, expected):
+    assert prediction_server.choose_encoding(accept_encoding, available) == expected
+
+@pytest.mark.parametrize('if_none_match, expected', [
+    ('"abc-gzip"', True),
+    ('W/"abc-gzip"', True),
+    ('"other", "abc-gzip"', True),
+    ('*', True),
+    ('"abc"', False),
+    ('abc-gzip', False),
+])
+def test_etag_matches(if_none_match, expected):
+    assert prediction_server.etag_matches(if_none_match, '"abc-gzip"') is expected
+
+def test_make_entry_tags_every_encoding_apart():
+    entry = prediction_server.make_entry('text/plain', b'snow ' * 100)
+    assert entry['bodies'][None] == b'snow ' * 100
+    assert len(set(entry['etags'].values())) == len(entry['bodies'])
+    assert entry['etags']['gzip'].endswith('-gzip"')
+
+def test_parse_vote_form():
+    body = b'district=grand_rapids&date=2026-01-06&vote=YES'
+    assert prediction_server.parse_vote(body, 'application/x-www-form-urlencoded', DISTRICT_IDS, TODAY) == (
+        'grand_rapids', '2026-01-06', 'yes')
+
+def test_parse_vote_json_defaults_to_the_school_district():
+    body = json.dumps({'date': '2026-01-05', 'vote': 'no'}).encode('utf-8')
+    assert prediction_server.parse_vote(body, 'application/json; charset=utf-8',
+                                        {settings.DISTRICT_ID}, TODAY) == (settings.DISTRICT_ID, '2026-01-05', 'no')
+
+@pytest.mark.parametrize('body, content_type', [
+    (b'district=nowhere&date=2026-01-05&vote=yes', 'application/x-www-form-urlencoded'),
+    (b'district=rockford&date=2026-01-05&vote=maybe', 'application/x-www-form-urlencoded'),
+    (b'district=rockford&date=tomorrow&vote=yes', 'application/x-www-form-urlencoded'),
+    (b'district=rockford&vote=yes', 'application/x-www-form-urlencoded'),
+    (b'["rockford", "yes"]', 'application/json'),
+    (b'{"district": "rockford", "vote": "yes"', 'application/json'),
+])
+def test_parse_vote_rejects_bad_votes(body, content_type):
+    with pytest.raises(ValueError):
+        prediction_server.parse_vote(body, content_type, DISTRICT_IDS, TODAY)
+
+def test_parse_vote_closes_old_school_days():
+    max_age = settings.FEEDBACK_MAX_AGE_DAYS
+    recent = date.fromordinal(TODAY.toordinal() - max_age).isoformat()
+    old = date.fromordinal(TODAY.toordinal() - max_age - 1).isoformat()
+    form = 'application/x-www-form-urlencoded'
+    assert prediction_server.parse_vote(f'date={recent}&vote=yes&district=rockford'.encode(), form,
+                                        DISTRICT_IDS, TODAY)[1] == recent
+    with pytest.raises(ValueError):
+        prediction_server.parse_vote(f'date={old}&vote=yes&district=rockford'.encode(), form, DISTRICT_IDS, TODAY)
@@ -0,0 +1,63 @@
+from datetime import datetime
+import pytest
+import pytz
+from general_functions import prediction_store
+from settings import settings
+
+SCHOOL_TIMEZONE = pytz.timezone(settings.SCHOOL_TIMEZONE)
+
+@pytest.fixture(autouse=True)
+def fixture_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'PREDICTION_STORE_PATH', str(tmp_path / 'predictions.sqlite3'))
+
+def make_prediction(probability, message='Snow!'):
+    return {'probability': probability, 'rationale': 'Snow overnight.', 'message': message,
+            'source': 'assistant', 'model': 'gpt-test', 'latency_seconds': 1.5}
+
+def test_target_date_is_the_next_day_at_the_school():
+    # 03:00 UTC on Jan 9 is still the evening of Jan 8 at the school
+    now = datetime(2024, 1, 9, 3, 0, tzinfo=pytz.utc).astimezone(SCHOOL_TIMEZONE)
+    assert prediction_store.get_target_date(now) == '2024-01-09'
+
+def test_school_day_switches_at_the_end_hour():
+    morning = SCHOOL_TIMEZONE.localize(datetime(2024, 1, 9, 7, 0))
+    evening = SCHOOL_TIMEZONE.localize(datetime(2024, 1, 9, 19, 0))
+    assert prediction_store.get_school_day(morning, end_hour=12) == '2024-01-09'
+    assert prediction_store.get_school_day(evening, end_hour=12) == '2024-01-10'
+
+def test_append_and_read_back():
+    prediction_id = prediction_store.append_prediction('rockford', make_prediction(80.0), {'total_snow_cm': 4.5},
+                                                       target_date='2024-01-09', snapshot={'hours': [1, 2]})
+    stored = prediction_store.get_latest_prediction('rockford', '2024-01-09')
+    assert stored['id'] == prediction_id
+    assert (stored['probability'], stored['source'], stored['model']) == (80.0, 'assistant', 'gpt-test')
+    assert stored['features'] == {'total_snow_cm': 4.5}
+    assert stored['delivered'] is None
+    assert prediction_store.get_snapshot(prediction_id) == {'hours': [1, 2]}
+    assert prediction_store.get_latest_prediction('other') is None
+
+def test_deliveries_are_summed():
+    prediction_id = prediction_store.append_prediction('rockford', make_prediction(80.0), {}, '2024-01-09')
+    prediction_store.append_delivery(prediction_id, 10, 1)
+    prediction_store.append_delivery(prediction_id, 5, 0)
+    assert prediction_store.get_latest_prediction('rockford')['delivered'] == 15
+
+def test_newest_prediction_per_day():
+    for target_date, probability in (('2024-01-08', 10.0), ('2024-01-09', 20.0), ('2024-01-09', 90.0),
+                                     ('2024-01-10', 30.0), ('2024-01-12', 40.0)):
+        prediction_store.append_prediction('rockford', make_prediction(probability), {}, target_date)
+    prediction_store.append_prediction('other', make_prediction(50.0), {}, '2024-01-09')
+
+    assert prediction_store.get_latest_prediction('rockford')['target_date'] == '2024-01-12'
+    assert prediction_store.get_latest_prediction('rockford', '2024-01-09')['probability'] == 90.0
+    latest = prediction_store.get_predictions('rockford', '2024-01-09', '2024-01-11')
+    assert [(row['target_date'], row['probability']) for row in latest] == [('2024-01-09', 90.0), ('2024-01-10', 30.0)]
+    every = prediction_store.get_predictions('rockford', '2024-01-09', '2024-01-09', latest_only=False)
+    assert [row['probability'] for row in every] == [20.0, 90.0]
+
+def test_last_change_moves_on_every_append():
+    first = prediction_store.get_last_change()
+    prediction_id = prediction_store.append_prediction('rockford', make_prediction(80.0), {}, '2024-01-09')
+    second = prediction_store.get_last_change()
+    prediction_store.append_delivery(prediction_id, 1, 0)
+    assert len({first, second, prediction_store.get_last_change()}) == 3
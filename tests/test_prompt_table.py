@@ -0,0 +1,82 @@
+from datetime import date, datetime
+import pytest
+import pytz
+from email_functions import email_helpers
+from general_functions import districts
+from general_functions import general_functions
+from openai_actions import open_ai_api_calls as openai_api
+from openai_actions import open_ai_data
+from weatherapi.hourly_forecast import HourlyForecast, NUMERIC_FIELDS
+
+# 23:30 on Jan 8 UTC is 18:30 on Jan 8 at the school
+NOW = datetime(2024, 1, 8, 23, 30, tzinfo=pytz.utc)
+
+def make_weather(temps, **alert):
+    forecast = HourlyForecast()
+    for index, temp_f in enumerate(temps):
+        hour = {field: 0 for field in NUMERIC_FIELDS}
+        hour.update(temp_f=temp_f, pressure_in=30.01, vis_miles=6.25, condition={'text': 'Light snow'})
+        forecast.append(22 + index, hour)
+    return dict(alert, hourly=forecast)
+
+@pytest.mark.parametrize('value, decimals, text', [
+    (30.0, 2, '30'),
+    (29.95, 2, '29.95'),
+    (6.25, 1, '6.2'),
+    (-0.2, 0, '0'),
+    (12.5, 0, '12'),
+])
+def test_format_weather_value(value, decimals, text):
+    assert open_ai_data.format_weather_value(value, decimals) == text
+
+def test_table_pulls_out_constant_columns():
+    lines = open_ai_data.create_hourly_weather_summary(make_weather([20, 18.4])).split('\n')
+    assert lines[0] == open_ai_data.HOURLY_SUMMARY_UNITS
+    assert lines[1:4] == ['hour|temp', '22|20', '23|18']
+    assert lines[4].startswith('Same every hour: condition=Light snow, feels=0, ')
+    assert 'vis=6.2' in lines[4] and 'pres=30.01' in lines[4]
+    assert 'uv' not in '\n'.join(lines)
+
+def test_single_hour_keeps_every_column():
+    lines = open_ai_data.create_hourly_weather_summary(make_weather([20])).split('\n')
+    assert lines[1].split('|') == ['hour', 'condition'] + [header for _, header, _ in open_ai_data.HOURLY_SUMMARY_COLUMNS]
+    assert len(lines) == 3
+
+def test_no_hourly_data():
+    assert open_ai_data.create_hourly_weather_summary({'hourly': HourlyForecast()}) == 'No data'
+
+def test_alert_summary():
+    assert open_ai_data.create_weather_alert_summary({}) == 'Weather alert: none'
+    summary = open_ai_data.create_weather_alert_summary(
+        {'weather_alert_event': 'Winter Storm Warning', 'weather_alert_severity': 'Severe',
+         'weather_alert_desc': 'Heavy snow\n  expected.'})
+    assert summary.split('\n')[1:] == ['- Event: Winter Storm Warning; Severity: Severe; Certainty: No data; '
+                                       'Urgency: No data', '- Description: Heavy snow expected.']
+
+def test_prompt_uses_the_school_timezone_and_keeps_braces():
+    district = dict(districts.get_default_district(), school_name='Rockford {Public} Schools')
+    prompt = open_ai_data.create_open_ai_snow_day_message(make_weather([20, 18]), district, now=NOW)
+    assert '- Current date and time: 2024-01-08 18:30 EST' in prompt
+    assert 'Rockford {Public} Schools' in prompt
+    assert '{hourly_summary}' not in prompt and '{response_format}' not in prompt
+    assert 'hour|temp\n22|20\n23|18' in prompt
+    assert 'School starts at' in prompt and 'tomorrow.' in prompt
+    assert prompt.endswith(open_ai_data.PREDICTION_RESPONSE_FORMAT)
+
+def test_prompt_for_a_later_school_day():
+    prompt = open_ai_data.create_open_ai_snow_day_message(make_weather([20]), now=NOW, school_day=date(2024, 1, 11))
+    assert 'on Thursday 2024-01-11. That is the day being predicted' in prompt
+
+def test_missing_district_field_gives_no_prompt():
+    district = districts.get_default_district()
+    del district['school_start_time']
+    assert open_ai_data.create_open_ai_snow_day_message(make_weather([20]), district, now=NOW) is None
+
+def test_missing_prompt_never_starts_a_run(monkeypatch):
+    district = districts.get_default_district()
+    del district['zip_code']
+    monkeypatch.setattr(openai_api, 'get_assistant', lambda: pytest.fail('the assistant was called'))
+    with pytest.raises(ValueError):
+        general_functions.create_snow_day_message(district, make_weather([20]))
+    with pytest.raises(ValueError):
+        email_helpers.generate_email_content(None)
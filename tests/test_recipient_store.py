@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+import pytest
+from general_functions import http_client
+from google_functions import google_forms
+from google_functions import recipient_store
+from settings import settings
+
+FORM_ID = 'form-1'
+
+@pytest.fixture(autouse=True)
+def fixture_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'RECIPIENT_STORE_PATH', str(tmp_path / 'recipients.sqlite3'))
+
+def test_upsert_keeps_the_newest_response():
+    recipient_store.upsert_recipients(FORM_ID, [
+        ('Ann@Example.com ', 'Ann', '2024-01-02T00:00:00Z'),
+        ('bob@example.com', 'Bob', '2024-01-02T00:00:00Z'),
+    ], '2024-01-02T00:00:00Z')
+    recipient_store.upsert_recipients(FORM_ID, [
+        ('ann@example.com', 'Annie', '2024-01-03T00:00:00Z'),
+        ('BOB@example.com', 'Robert', '2024-01-01T00:00:00Z'),
+    ], '2024-01-03T00:00:00Z')
+    assert recipient_store.get_recipients(FORM_ID) == {'ann@example.com': 'Annie', 'bob@example.com': 'Bob'}
+    assert recipient_store.get_recipients('other-form') == {}
+
+def test_sync_state_only_moves_forward():
+    assert recipient_store.get_last_submitted_time(FORM_ID) is None
+    recipient_store.upsert_recipients(FORM_ID, [], '2024-01-03T00:00:00Z')
+    recipient_store.upsert_recipients(FORM_ID, [], '2024-01-01T00:00:00Z')
+    recipient_store.upsert_recipients(FORM_ID, [], None)
+    assert recipient_store.get_last_submitted_time(FORM_ID) == '2024-01-03T00:00:00Z'
+
+def make_response(email, name, submitted):
+    return {'respondentEmail': email, 'lastSubmittedTime': submitted,
+            'answers': {google_forms.NAME_ANSWER_KEY: {'textAnswers': {'answers': [{'value': name}]}}}}
+
+class FakeFormsApi:
+    '''
+    Serves form responses two to a page and records the query of every request.
+    '''
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+
+    def get(self, url, headers=None, params=None):
+        self.requests.append(dict(params))
+        since = (params.get('filter') or '').replace('timestamp >= ', '')
+        responses = [resp for resp in self.responses if resp['lastSubmittedTime'] >= since]
+        start = int(params.get('pageToken', 0))
+        page = {'responses': responses[start:start + 2]}
+        if start + 2 < len(responses):
+            page['nextPageToken'] = str(start + 2)
+        return SimpleNamespace(raise_for_status=lambda: None, json=lambda: page)
+
+@pytest.fixture(name='forms_api')
+def fixture_forms_api(monkeypatch):
+    forms_api = FakeFormsApi([
+        make_response('ann@example.com', 'Ann', '2024-01-01T00:00:00Z'),
+        make_response('bob@example.com', 'Bob', '2024-01-02T00:00:00Z'),
+        make_response('cat@example.com', 'Cat', '2024-01-03T00:00:00Z'),
+        {'respondentEmail': 'no-name@example.com', 'lastSubmittedTime': '2024-01-03T00:00:00Z'},
+    ])
+    monkeypatch.setattr(http_client, 'get', forms_api.get)
+    monkeypatch.setattr(google_forms, '_get_valid_credentials', lambda: SimpleNamespace(token='token'))
+    return forms_api
+
+def test_first_sync_follows_every_page(forms_api):
+    assert google_forms.sync_sign_up_responses(FORM_ID) == 3
+    assert [request.get('pageToken') for request in forms_api.requests] == [None, '2']
+    assert 'filter' not in forms_api.requests[0]
+    assert recipient_store.get_last_submitted_time(FORM_ID) == '2024-01-03T00:00:00Z'
+
+def test_later_syncs_only_ask_for_newer_responses(forms_api):
+    google_forms.sync_sign_up_responses(FORM_ID)
+    forms_api.responses.append(make_response('dan@example.com', 'Dan', '2024-01-04T00:00:00Z'))
+    forms_api.requests.clear()
+    # Cat was submitted at exactly the last synced time, so she is fetched again
+    assert google_forms.sync_sign_up_responses(FORM_ID) == 2
+    assert forms_api.requests[0] == {'pageSize': settings.GOOGLE_FORMS_PAGE_SIZE,
+                                     'filter': 'timestamp >= 2024-01-03T00:00:00Z'}
+    assert sorted(google_forms.get_sign_up_responses(FORM_ID)) == [
+        'ann@example.com', 'bob@example.com', 'cat@example.com', 'dan@example.com']
+
+def test_stored_sign_ups_survive_an_outage(forms_api, monkeypatch):
+    google_forms.sync_sign_up_responses(FORM_ID)
+    def fail():
+        raise ValueError('Invalid or missing credentials')
+    monkeypatch.setattr(google_forms, '_get_valid_credentials', fail)
+    assert len(google_forms.get_sign_up_responses(FORM_ID)) == 3
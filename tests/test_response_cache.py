@@ -0,0 +1,60 @@
+import pytest
+from general_functions import districts
+from general_functions.disk_cache import DiskCache
+from openai_actions import open_ai_response_cache as response_cache
+from weatherapi.hourly_forecast import HourlyForecast, NUMERIC_FIELDS
+from settings import settings
+
+DISTRICT = districts.get_default_district()
+
+def make_weather(temp_f=20.0, chance_of_snow=60, **alert):
+    forecast = HourlyForecast()
+    for hour_of_day in (22, 23, 0):
+        hour = {source_key: 0 for source_key in NUMERIC_FIELDS.values()}
+        hour.update(temp_f=temp_f, chance_of_snow=chance_of_snow, condition={'text': 'Snow'})
+        forecast.append(hour_of_day, hour)
+    return dict(alert, hourly=forecast)
+
+def make_key(weather_info=None, district=None, target_date=None):
+    return response_cache.make_prediction_key(district or DISTRICT, weather_info or make_weather(), target_date)
+
+def test_key_is_stable():
+    assert make_key() == make_key()
+
+def test_small_changes_share_a_key():
+    # temp_f buckets are 2°F and chance_of_snow buckets are 10%
+    assert make_key(make_weather(temp_f=20.4, chance_of_snow=62)) == make_key()
+
+@pytest.mark.parametrize('weather_info', [
+    make_weather(temp_f=24),
+    make_weather(chance_of_snow=90),
+    make_weather(weather_alert_event='Winter Storm Warning', weather_alert_severity='Severe'),
+])
+def test_material_changes_get_a_new_key(weather_info):
+    assert make_key(weather_info) != make_key()
+
+def test_district_and_school_day_are_part_of_the_key():
+    assert make_key(district=dict(DISTRICT, id='other')) != make_key()
+    assert make_key(target_date='2024-01-11') != make_key()
+    assert make_key(target_date='2024-01-11') != make_key(target_date='2024-01-12')
+
+def test_model_and_factor_file_are_part_of_the_key(monkeypatch):
+    key = make_key()
+    monkeypatch.setattr(settings, 'ENGINE_NAME', 'another-model')
+    assert make_key() != key
+    monkeypatch.undo()
+    monkeypatch.setattr(response_cache, '_get_factor_file_hash', lambda: 'changed')
+    assert make_key() != key
+
+def test_normalized_hours_keep_the_hour_of_day():
+    normalized = response_cache.normalize_weather_info(make_weather(), {'temp_f': 2})
+    assert normalized == [(22, 10), (23, 10), (0, 10), (None, None)]
+
+def test_round_trip_and_unreadable_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, 'response_cache', DiskCache(str(tmp_path), 60, 10))
+    prediction = {'probability': 80.0, 'rationale': 'Snow.', 'message': 'Snow day likely!'}
+    response_cache.cache_prediction('key', prediction)
+    assert response_cache.get_cached_prediction('key') == prediction
+    response_cache.response_cache.set('bad', b'{not json')
+    assert response_cache.get_cached_prediction('bad') is None
+    assert response_cache.response_cache.get('bad') is None
@@ -0,0 +1,65 @@
+import os
+import pytest
+from general_functions import prediction_store
+from general_functions import site_builder
+from general_functions import storage
+from settings import settings
+
+DISTRICT = {'id': 'rockford', 'school_name': 'Rockford & Co'}
+
+@pytest.fixture(autouse=True)
+def fixture_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'PREDICTION_STORE_PATH', str(tmp_path / 'predictions.sqlite3'))
+    monkeypatch.setattr(settings, 'SITE_FEEDBACK_URL', None)
+
+def test_minify_css_keeps_strings():
+    css = '/* header */\nbody {\n  color : red ;\n  font-family: "Open  Sans", sans-serif;\n}\n'
+    assert site_builder.minify_css(css) == 'body{color:red;font-family:"Open  Sans",sans-serif}'
+
+def test_minify_html():
+    page = '<html>\n  <!-- note -->\n  <body>\n    <p>Snow   day</p>\n  </body>\n</html>\n'
+    assert site_builder.minify_html(page) == '<html><body><p>Snow day</p></body></html>'
+
+def test_index_path(monkeypatch, tmp_path):
+    assert site_builder.get_index_path(str(tmp_path)) == os.path.join(storage.ROOT_DIRECTORY, 'index.html')
+    monkeypatch.setattr(settings, 'SITE_INDEX_PAGE', None)
+    assert site_builder.get_index_path(str(tmp_path)) == \
+        os.path.join(str(tmp_path), settings.DISTRICT_ID, 'index.html')
+
+def test_render_page(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'SITE_INDEX_PAGE', None)
+    site_directory = str(tmp_path)
+    latest = {'target_date': '2024-01-09', 'created_at': 1704841200, 'message': 'Snow <b>likely</b>',
+              'probability': 80.0}
+    history = [latest, {'target_date': '2024-01-08', 'probability': None}]
+    assets = {settings.SITE_ASSETS[0]: 'assets/style.0123456789.css'}
+    page = site_builder.render_page(DISTRICT, latest, history, assets, site_directory,
+                                    os.path.join(site_directory, 'rockford'))
+    assert 'Rockford &amp; Co' in page
+    assert 'Snow &lt;b&gt;likely&lt;/b&gt;' in page
+    assert 'Tuesday, January 9, 2024' in page
+    assert '../assets/style.0123456789.css' in page
+    assert '<tr><td>Tue Jan 09</td><td>80%</td></tr><tr><td>Mon Jan 08</td><td>No prediction</td></tr>' in page
+    assert '<script' not in page
+
+def test_build_district_page(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'SITE_INDEX_PAGE', None)
+    site_directory = str(tmp_path / 'site')
+    assert site_builder.build_district_page(DISTRICT, '2024-01-09', site_directory) is None
+
+    prediction = {'probability': 80.0, 'rationale': '', 'message': 'Snow!', 'source': 'assistant'}
+    prediction_store.append_prediction('rockford', prediction, {}, target_date='2024-01-09')
+    path = site_builder.build_district_page(DISTRICT, '2024-01-09', site_directory)
+    assert path == os.path.join(site_directory, 'rockford', 'index.html')
+    with open(path, encoding='utf-8') as file:
+        assert 'Snow!' in file.read()
+    stylesheets = os.listdir(os.path.join(site_directory, site_builder.ASSETS_DIRECTORY))
+    assert len(stylesheets) == 1 and site_builder.HASHED_ASSET.match(stylesheets[0])
+
+def test_stale_assets_are_removed(tmp_path):
+    assets_directory = tmp_path / site_builder.ASSETS_DIRECTORY
+    assets_directory.mkdir()
+    for file_name in ('style.0123456789.css', 'style.abcdefabcd.css', 'notes.txt'):
+        (assets_directory / file_name).write_text('', encoding='utf-8')
+    site_builder.remove_stale_assets(str(tmp_path), {'CSS/style.css': 'assets/style.abcdefabcd.css'})
+    assert sorted(os.listdir(assets_directory)) == ['notes.txt', 'style.abcdefabcd.css']
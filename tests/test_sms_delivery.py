@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+import pytest
+from email_functions import sms_delivery
+from email_functions.sms_delivery import TokenBucket
+from settings import settings
+
+@pytest.fixture(name='clock')
+def fixture_clock(monkeypatch):
+    '''
+    A clock that only moves when something sleeps.
+    '''
+    clock = SimpleNamespace(now=100.0, sleeps=[])
+
+    def sleep(seconds):
+        clock.sleeps.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr(sms_delivery, 'time', SimpleNamespace(monotonic=lambda: clock.now, sleep=sleep,
+                                                             perf_counter=lambda: clock.now))
+    return clock
+
+def test_bucket_allows_a_burst_then_paces(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert clock.now == pytest.approx(101.0)
+
+def test_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+    clock.now += 60
+    assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(1.0)
+
+def test_split_recipients_by_carrier():
+    email_recipients, sms_recipients = sms_delivery.split_recipients({
+        'ann@example.com': 'Ann',
+        '5551234567@vtext.com': 'Bob',
+        ' 5559876543@TMOMAIL.NET': 'Cat',
+        '5550000000@vtext.com': 'Dan',
+        'vtext.com@example.com': 'Eve',
+    })
+    assert email_recipients == {'ann@example.com': 'Ann', 'vtext.com@example.com': 'Eve'}
+    assert sms_recipients == {
+        'verizon': {'5551234567@vtext.com': 'Bob', '5550000000@vtext.com': 'Dan'},
+        'tmobile': {' 5559876543@TMOMAIL.NET': 'Cat'},
+    }
+
+def test_short_message_is_only_cleaned_up():
+    message = '## Snow day?\n\n**90%** chance   of a _snow day_ tomorrow!'
+    assert sms_delivery.compact_sms_message(message) == \
+        f'Snow day? 90% chance of a snow day tomorrow! {settings.SMS_OPT_OUT_NOTE}'
+
+def test_long_message_is_cut_at_a_word():
+    message = ' '.join(['Blizzard predicts heavy snow overnight, with icy roads.'] * 10)
+    compact = sms_delivery.compact_sms_message(message)
+    assert len(compact) <= settings.SMS_MAX_LENGTH
+    assert compact.endswith(f'... {settings.SMS_OPT_OUT_NOTE}')
+    body = compact[:-len(f'... {settings.SMS_OPT_OUT_NOTE}')]
+    assert message.startswith(body)
+    assert message[len(body)] == ' '
+    assert sms_delivery.compact_sms_message(message, max_length=60) == \
+        f'Blizzard predicts heavy snow... {settings.SMS_OPT_OUT_NOTE}'
@@ -0,0 +1,114 @@
+import smtplib
+from email.mime.text import MIMEText
+import pytest
+from email_functions import email_delivery
+from email_functions.smtp_pool import SmtpConnectionPool
+
+class FakeConnection:
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = 0
+        self.closed = False
+
+    def send_message(self, msg):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent += 1
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+def make_pool(*errors, size=2, max_messages=10):
+    '''
+    Builds a pool whose connections raise the given errors in turn, one per connection.
+    '''
+    connections = []
+    queued = list(errors)
+
+    def connect():
+        connections.append(FakeConnection([queued.pop(0)] if queued else []))
+        return connections[-1]
+
+    return SmtpConnectionPool(connect, size, max_messages), connections
+
+def test_sessions_are_reused():
+    pool, connections = make_pool()
+    for _ in range(3):
+        with pool.session() as session:
+            session.connection.send_message(None)
+            session.messages_sent += 1
+    assert len(connections) == 1
+    assert pool.stats == {'opened': 1, 'recycled': 0, 'discarded': 0}
+
+def test_sessions_are_recycled_at_the_message_limit():
+    pool, connections = make_pool(max_messages=2)
+    for _ in range(4):
+        with pool.session() as session:
+            session.messages_sent += 1
+    assert pool.stats['recycled'] == 2
+    assert all(connection.closed for connection in connections)
+
+@pytest.mark.parametrize('error, discarded', [
+    (smtplib.SMTPServerDisconnected('gone'), True),
+    (ConnectionResetError(), True),
+    (smtplib.SMTPResponseException(421, b'closing'), True),
+    (smtplib.SMTPRecipientsRefused({'a@example.com': (550, b'no such user')}), False),
+    (smtplib.SMTPDataError(552, b'too big'), False),
+])
+def test_only_broken_sessions_are_discarded(error, discarded):
+    pool, connections = make_pool(error)
+    with pytest.raises(type(error)):
+        with pool.session() as session:
+            session.connection.send_message(None)
+    assert pool.stats['discarded'] == int(discarded)
+    assert connections[0].closed == discarded
+    with pool.session():
+        pass
+    assert len(connections) == 1 + int(discarded)
+
+def test_failed_connect_frees_the_slot():
+    def refuse():
+        raise ConnectionRefusedError()
+    pool = SmtpConnectionPool(refuse, 1, 10)
+    # With the slot leaked, the second acquire would block forever
+    for _ in range(2):
+        with pytest.raises(ConnectionRefusedError):
+            pool.acquire()
+
+@pytest.fixture(name='sleeps')
+def fixture_sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(email_delivery.time, 'sleep', sleeps.append)
+    return sleeps
+
+def test_retry_on_a_fresh_session(sleeps):
+    pool, connections = make_pool(smtplib.SMTPServerDisconnected('gone'))
+    result = email_delivery.deliver_message(pool, MIMEText('hi'), 'a@example.com')
+    assert result == {'delivered': True, 'attempts': 2, 'error': None}
+    assert len(connections) == 2
+    assert len(sleeps) == 1
+
+def test_no_wait_after_the_last_attempt(sleeps):
+    errors = [smtplib.SMTPServerDisconnected('gone') for _ in range(3)]
+    pool, _ = make_pool(*errors)
+    result = email_delivery.deliver_message(pool, MIMEText('hi'), 'a@example.com', max_retries=3)
+    assert (result['delivered'], result['attempts']) == (False, 3)
+    assert len(sleeps) == 2
+
+def test_refused_recipients_are_not_retried(sleeps):
+    pool, connections = make_pool(smtplib.SMTPRecipientsRefused({'a@example.com': (550, b'no such user')}))
+    result = email_delivery.deliver_message(pool, MIMEText('hi'), 'a@example.com')
+    assert (result['delivered'], result['attempts']) == (False, 1)
+    assert sleeps == []
+    assert not connections[0].closed
+
+def test_refused_connection_fails_every_recipient(monkeypatch):
+    def refuse(username=None):
+        raise ConnectionRefusedError('Connection refused')
+    monkeypatch.setattr(email_delivery, 'open_smtp_pool', refuse)
+    results = email_delivery.send_email_to_user({'a@example.com': 'A', 'b@example.com': 'B'}, 'Snow!')
+    assert {result['delivered'] for result in results.values()} == {False}
+    assert results['a@example.com']['attempts'] == 0
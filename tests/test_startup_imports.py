@@ -0,0 +1,18 @@
+import subprocess
+import sys
+import pytest
+from benchmarks import startup_benchmark
+
+# Checked in a fresh interpreter, since the test run itself has already imported most of them
+CHECK_IMPORTS = '''
+import sys
+import {module}
+heavy = ('openai', 'googleapiclient', 'pytz', 'ijson')
+print(' '.join(sorted(name for name in sys.modules if name.split('.')[0] in heavy)))
+'''
+
+@pytest.mark.parametrize('module', ['main', 'general_functions.batch_runner', 'general_functions.backtest'])
+def test_entry_points_do_not_load_heavy_libraries(module):
+    result = subprocess.run([sys.executable, '-c', CHECK_IMPORTS.format(module=module)],
+                            cwd=startup_benchmark.ROOT_DIRECTORY, capture_output=True, text=True, check=True)
+    assert result.stdout.split() == []
@@ -0,0 +1,66 @@
+import pytest
+from weatherapi import weather_prescreen
+from weatherapi.hourly_forecast import HourlyForecast, NUMERIC_FIELDS
+from settings import settings
+
+CLEAR_HOUR = {field: 0 for field in NUMERIC_FIELDS}
+CLEAR_HOUR.update(temp_f=40, windchill_f=36, vis_miles=10)
+
+def make_night(*changed_hours, hours=4):
+    '''
+    Builds a clear night, with the given hour blocks merged over the first hours.
+    '''
+    forecast = HourlyForecast()
+    for index in range(hours):
+        hour = dict(CLEAR_HOUR, condition={'text': 'Clear'})
+        if index < len(changed_hours):
+            hour.update(changed_hours[index])
+        forecast.append(index, hour)
+    return {'hourly': forecast}
+
+def test_clear_night_has_no_reasons():
+    assert weather_prescreen.get_prescreen_reasons(make_night()) == []
+
+def test_missing_hourly_data_escalates():
+    assert weather_prescreen.get_prescreen_reasons({'hourly': HourlyForecast()}) == ['no hourly forecast data']
+
+@pytest.mark.parametrize('hour, reason', [
+    ({'chance_of_snow': 40}, '40% chance of snow'),
+    ({'snow_cm': 0.4}, '0.4cm of snow'),
+    ({'temp_f': 31, 'chance_of_rain': 60}, '60% chance of rain at 31°F'),
+    ({'windchill_f': -20}, 'wind chill down to -20°F'),
+])
+def test_each_rule(hour, reason):
+    assert weather_prescreen.get_prescreen_reasons(make_night(hour)) == [reason]
+
+def test_rain_outside_the_ice_band_is_clear():
+    assert weather_prescreen.get_prescreen_reasons(make_night({'temp_f': 45, 'chance_of_rain': 90})) == []
+
+def test_thresholds_are_exclusive():
+    rules = settings.PRESCREEN_RULES
+    night = make_night({'chance_of_snow': rules['max_chance_of_snow'], 'windchill_f': rules['min_windchill_f']})
+    assert weather_prescreen.get_prescreen_reasons(night) == []
+
+@pytest.mark.parametrize('event, severity, escalates', [
+    ('Winter Storm Warning', 'Moderate', True),
+    ('Flood Warning', 'Severe', True),
+    ('Dense Fog Advisory', 'Minor', False),
+])
+def test_alerts(event, severity, escalates):
+    night = dict(make_night(), weather_alert_event=event, weather_alert_severity=severity)
+    assert weather_prescreen.get_prescreen_reasons(night) == ([f'{event} ({severity})'] if escalates else [])
+
+def test_clear_night_prediction():
+    prediction = weather_prescreen.create_clear_night_prediction(make_night(), {'school_name': 'Rockford'})
+    assert prediction['probability'] == settings.PRESCREEN_CLEAR_PROBABILITY
+    assert 'lows around 40°F' in prediction['rationale']
+    assert prediction['message'].startswith("Blizzard here with tonight's prediction for Rockford")
+
+def test_stats_count_the_time_saved(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'PRESCREEN_STATS_PATH', str(tmp_path / 'prescreen_stats.json'))
+    weather_prescreen.record_clear_night()
+    weather_prescreen.record_assistant_run(12.0)
+    weather_prescreen.record_clear_night()
+    stats = weather_prescreen.load_prescreen_stats()
+    assert (stats['clear'], stats['escalated'], stats['assistant_runs']) == (2, 1, 1)
+    assert stats['seconds_saved'] == settings.PRESCREEN_ESTIMATED_ASSISTANT_SECONDS + 12.0
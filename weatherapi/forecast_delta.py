@@ -0,0 +1,69 @@
+'''
+This file contains the forecast snapshots and deltas used by the multi-day outlook.
+A snapshot is the compact copy of the relevant weather information a prediction
+was made from: the hours, one list of values per compared field and the alert.
+It is stored with the prediction, so the next run can compare a fresh forecast
+for the same school day against exactly what was predicted on, hour by hour and
+field by field, and only predict the day again when something changed enough
+to matter (settings.OUTLOOK_DELTA_THRESHOLDS).
+'''
+from settings import settings
+
+def take_snapshot(weather_info, fields=None):
+    '''
+    Builds the snapshot of the relevant weather information.
+    Returns a JSON-serializable dictionary with the hours, a list of values per
+    field (in hour order) and the alert event and severity.
+    '''
+    fields = fields or settings.OUTLOOK_DELTA_THRESHOLDS
+    hourly = weather_info['hourly']
+    return {
+        'hours': list(hourly.hours),
+        'fields': {field: [round(value, 2) for value in hourly.column(field)] for field in fields},
+        'alert': [weather_info.get('weather_alert_event'), weather_info.get('weather_alert_severity')],
+    }
+
+def compute_delta(previous, current):
+    '''
+    Compares two snapshots hour by hour.
+    Returns a dictionary with whether the hours and the alert changed and, for every
+    field both snapshots have, the per-hour changes (current minus previous) keyed
+    by hour of day. Hours only one of the snapshots has are left out of the changes.
+    '''
+    previous_positions = {hour: index for index, hour in enumerate(previous['hours'])}
+    shared_hours = [(hour, previous_positions[hour], index)
+                    for index, hour in enumerate(current['hours']) if hour in previous_positions]
+    changes = {}
+    for field, values in current['fields'].items():
+        previous_values = previous['fields'].get(field)
+        if previous_values is None:
+            continue
+        changes[field] = {hour: round(values[current_index] - previous_values[previous_index], 2)
+                          for hour, previous_index, current_index in shared_hours}
+    return {
+        'hours_changed': previous['hours'] != current['hours'],
+        'alert_changed': list(previous['alert']) != list(current['alert']),
+        'changes': changes,
+    }
+
+def get_change_reasons(delta, thresholds=None):
+    '''
+    Checks a delta against the outlook thresholds.
+    Returns a list of the meaningful changes. An empty list means the day's
+    stored prediction can be reused.
+    '''
+    thresholds = thresholds or settings.OUTLOOK_DELTA_THRESHOLDS
+    reasons = []
+    if delta['hours_changed']:
+        reasons.append('different forecast hours')
+    if delta['alert_changed']:
+        reasons.append('weather alert changed')
+
+    for field, threshold in thresholds.items():
+        field_changes = delta['changes'].get(field)
+        if not field_changes:
+            continue
+        hour, change = max(field_changes.items(), key=lambda item: abs(item[1]))
+        if abs(change) >= threshold:
+            reasons.append(f'{field} {change:+g} at {hour:02d}:00')
+    return reasons
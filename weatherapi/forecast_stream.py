@@ -0,0 +1,111 @@
+'''
+This file contains the streaming, field-selective parser for WeatherAPI forecasts.
+Rather than loading the whole forecast.json payload into nested dictionaries,
+the body is read as a stream of JSON events and only the hour blocks inside the
+requested windows (and the weather alerts) are ever built into objects.
+Everything else (location, current conditions, day and astro blocks, the hours
+we don't need) is skipped as it streams past, which keeps memory flat for long
+days= horizons and many locations.
+ijson is imported by the parsing functions, so it only loads once a forecast is parsed.
+'''
+from weatherapi import weather_data
+from weatherapi.hourly_forecast import HourlyForecast
+
+FORECAST_DAY_PREFIX = 'forecast.forecastday.item'
+HOUR_PREFIX = 'forecast.forecastday.item.hour.item'
+ALERT_PREFIX = 'alerts.alert.item'
+
+# Small reads keep the batch of pending parser events (and so peak memory) small
+STREAM_BUFFER_SIZE = 4096
+
+def _build_object(events, prefix):
+    '''
+    Builds the object that starts at prefix from the remaining events of the stream.
+    The start_map event for the object must already have been consumed.
+    '''
+    import ijson
+    builder = ijson.ObjectBuilder()
+    builder.event('start_map', None)
+    for event_prefix, event, value in events:
+        if event_prefix == prefix and event == 'end_map':
+            builder.event(event, value)
+            return builder.value
+        builder.event(event, value)
+    raise ValueError(f'Forecast stream ended inside {prefix}')
+
+def parse_forecast_windows(stream, windows, alert_periods=None):
+    '''
+    Parses only the requested hours and the weather alerts from a forecast stream.
+
+    Args:
+        stream: A binary file-like object holding the forecast.json body.
+        windows: A sequence of (forecast day, start hour, end hour) tuples, end hour exclusive.
+        alert_periods (optional): A sequence of (start, end) timezone-aware datetimes. When
+            given, each period gets the first alert in effect during it, instead of every
+            window sharing the first alert of the forecast.
+
+    Returns:
+        tuple: A list with one HourlyForecast per window (in the order given) and a
+        dictionary with the weather alert fields (empty if there are no alerts), or
+        a list of such dictionaries, one per alert period, if alert_periods is given.
+    '''
+    import ijson
+    hourly_windows = [HourlyForecast() for _ in windows]
+    windows_by_day = {}
+    for window_index, (day_index, start_hour, end_hour) in enumerate(windows):
+        windows_by_day.setdefault(day_index, []).append((window_index, start_hour, end_hour))
+
+    alert_data = {}
+    period_alerts = [{} for _ in alert_periods or ()]
+    day_index = -1
+    hour_position = -1
+    events = ijson.parse(stream, buf_size=STREAM_BUFFER_SIZE, use_float=True)
+    for prefix, event, _ in events:
+        if event != 'start_map':
+            continue
+
+        if prefix == FORECAST_DAY_PREFIX:
+            day_index += 1
+            hour_position = -1
+        elif prefix == HOUR_PREFIX:
+            hour_position += 1
+            day_windows = windows_by_day.get(day_index)
+            # The WeatherAPI lists the 24 hours of a day in order, so the position
+            # tells us whether the hour is wanted before we build anything
+            if not day_windows or not any(start <= hour_position < end for _, start, end in day_windows):
+                continue
+
+            hour = _build_object(events, HOUR_PREFIX)
+            hour_of_day = int(hour['time'].split(' ')[1].split(':')[0])
+            for window_index, start_hour, end_hour in day_windows:
+                if start_hour <= hour_of_day < end_hour:
+                    hourly_windows[window_index].append(hour_of_day, hour)
+        elif prefix == ALERT_PREFIX and alert_periods is not None:
+            weather_alert = _build_object(events, ALERT_PREFIX)
+            for period_index, (start, end) in enumerate(alert_periods):
+                if not period_alerts[period_index] and weather_data.alert_overlaps(weather_alert, start, end):
+                    period_alerts[period_index] = weather_data.get_weather_alert_data(weather_alert)
+        elif prefix == ALERT_PREFIX and not alert_data:
+            alert_data = weather_data.get_weather_alert_data(_build_object(events, ALERT_PREFIX))
+
+    if alert_periods is not None:
+        return hourly_windows, period_alerts
+    return hourly_windows, alert_data
+
+def merge_forecast_windows(hourly_windows, alert_data):
+    '''
+    Combines parsed windows and alert fields into the dictionary shape returned by
+    weather_data.get_relevant_weather_information().
+    '''
+    relevant_weather = {'hourly': HourlyForecast()}
+    for hourly_window in hourly_windows:
+        relevant_weather['hourly'].extend(hourly_window)
+    relevant_weather.update(alert_data)
+    return relevant_weather
+
+def parse_relevant_weather_information(stream):
+    '''
+    Streaming equivalent of weather_data.get_relevant_weather_information().
+    Returns the same dictionary shape, built without loading the whole forecast.
+    '''
+    return merge_forecast_windows(*parse_forecast_windows(stream, weather_data.RELEVANT_WINDOWS))
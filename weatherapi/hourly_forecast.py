@@ -0,0 +1,116 @@
+'''
+This file contains the compact hourly forecast structure.
+Instead of one string-keyed entry per hour and field (hour_19_temp_f, ...),
+every numeric field is stored as its own array column indexed by position, so
+aggregates over a window of hours are single reductions over a typed array.
+'''
+from array import array
+
+# The numeric fields we keep for every hour, mapped to their key in the WeatherAPI hour block
+NUMERIC_FIELDS = {
+    'temp_f': 'temp_f',
+    'chance_of_snow': 'chance_of_snow',
+    'chance_of_rain': 'chance_of_rain',
+    'wind_mph': 'wind_mph',
+    'visibility_miles': 'vis_miles',
+    'snow_cm': 'snow_cm',
+    'humidity': 'humidity',
+    'cloud': 'cloud',
+    'pressure_in': 'pressure_in',
+    'feelslike_f': 'feelslike_f',
+    'windchill_f': 'windchill_f',
+    'dewpoint_f': 'dewpoint_f',
+    'gust_mph': 'gust_mph',
+    'uv': 'uv',
+}
+
+# Fields the WeatherAPI leaves out when there is nothing to report
+OPTIONAL_FIELDS = {'snow_cm': 0}
+
+class HourlyForecast:
+    '''
+    Columnar storage for a run of forecast hours.
+    hours holds the hour of day for each position, conditions holds the condition
+    text and columns holds one array of doubles per numeric field.
+    '''
+    __slots__ = ('hours', 'conditions', 'columns')
+
+    def __init__(self):
+        self.hours = array('b')
+        self.conditions = []
+        self.columns = {field: array('d') for field in NUMERIC_FIELDS}
+
+    def __len__(self):
+        return len(self.hours)
+
+    def append(self, hour_of_day, hour):
+        '''
+        Adds one WeatherAPI hour block to the end of the forecast.
+        '''
+        for field, source_key in NUMERIC_FIELDS.items():
+            if field in OPTIONAL_FIELDS:
+                value = hour.get(source_key, OPTIONAL_FIELDS[field])
+            else:
+                value = hour[source_key]
+            self.columns[field].append(value)
+        self.hours.append(hour_of_day)
+        self.conditions.append(hour['condition']['text'])
+
+    def extend(self, other):
+        '''
+        Adds every hour of another HourlyForecast to the end of this one.
+        '''
+        self.hours.extend(other.hours)
+        self.conditions.extend(other.conditions)
+        for field, column in self.columns.items():
+            column.extend(other.columns[field])
+
+    def column(self, field):
+        '''
+        Returns the array of values for a numeric field.
+        '''
+        return self.columns[field]
+
+    def select(self, hours_of_day):
+        '''
+        Returns a new HourlyForecast holding only the given hours of day, in their
+        original order. Useful for narrowing down to the commute window.
+        '''
+        wanted = set(hours_of_day)
+        positions = [index for index, hour in enumerate(self.hours) if hour in wanted]
+        selection = HourlyForecast()
+        selection.hours = array('b', (self.hours[index] for index in positions))
+        selection.conditions = [self.conditions[index] for index in positions]
+        selection.columns = {
+            field: array('d', (column[index] for index in positions))
+            for field, column in self.columns.items()
+        }
+        return selection
+
+    def minimum(self, field, default=None):
+        '''
+        Returns the lowest value of a field, or the default if there are no hours.
+        '''
+        return min(self.columns[field], default=default)
+
+    def maximum(self, field, default=None):
+        '''
+        Returns the highest value of a field, or the default if there are no hours.
+        '''
+        return max(self.columns[field], default=default)
+
+    def total(self, field):
+        '''
+        Returns the sum of a field over all hours.
+        '''
+        return sum(self.columns[field])
+
+    def records(self):
+        '''
+        Yields (hour_of_day, condition, values) for each hour in order, where
+        values maps every numeric field to its value for that hour.
+        '''
+        fields = list(self.columns)
+        columns = [self.columns[field] for field in fields]
+        for index, hour_of_day in enumerate(self.hours):
+            yield hour_of_day, self.conditions[index], dict(zip(fields, (column[index] for column in columns)))
@@ -1,26 +1,128 @@
 '''
 This file contains calls to the weather api
+Requests go through the shared pooled client in general_functions.http_client.
+requests is only imported once a forecast has to be fetched, so runs that use a
+cached forecast don't pay for loading it. ijson and pytz are imported in the
+functions that use them, so importing this module stays cheap.
 '''
+import io
 import os
-import requests
+import logging
+from datetime import datetime
 from settings import settings
+from general_functions.disk_cache import DiskCache
+from general_functions import http_client
+from general_functions import metrics
+from weatherapi import forecast_stream
+from weatherapi import weather_data
 
-def get_forecast():
+forecast_cache = DiskCache(settings.FORECAST_CACHE_DIRECTORY,
+                           settings.FORECAST_CACHE_TTL_SECONDS,
+                           settings.FORECAST_CACHE_MAX_ENTRIES,
+                           settings.FORECAST_CACHE_MAX_BYTES)
+
+class _RecordingReader:
+    '''
+    Wraps a response stream and counts the bytes read through it. When keep is
+    set, a copy of every chunk is kept too, so a streamed forecast can still be
+    written to the cache afterwards.
+    '''
+    def __init__(self, raw, keep=True):
+        self.raw = raw
+        self.keep = keep
+        self.chunks = []
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = self.raw.read(size)
+        self.bytes_read += len(chunk)
+        if self.keep:
+            self.chunks.append(chunk)
+        return chunk
+
+def _get_forecast_query(zip_code, days):
     '''
-    This function gets the weather forecast for the current day and
-    the next day. It is also gathering weather alerts.
+    Builds the forecast.json query (without the API key) and its cache key.
     '''
-    try:
-        url = (f'{settings.WEATHER_API_BASE}'
-               f'forecast.json?key={os.environ.get("WEATHERAPI_KEY")}'
-               f'&q={settings.ZIP_CODE}'
-               f'&days=2'
-               f'&aqi=no'
-               f'&alerts=yes')
+    import pytz
+    query = (f'&q={zip_code}'
+             f'&days={days}'
+             f'&aqi=no'
+             f'&alerts=yes')
+    forecast_date = datetime.now(pytz.timezone(settings.SCHOOL_TIMEZONE)).date().isoformat()
+    return query, DiskCache.make_key(zip_code, forecast_date, query)
+
+def _get_forecast_url(query):
+    return (f'{settings.WEATHER_API_BASE}'
+            f'forecast.json?key={os.environ.get("WEATHERAPI_KEY")}'
+            f'{query}')
+
+def get_forecast_windows(windows, zip_code=None, use_cache=None, alert_periods=None):
+    '''
+    Streams the forecast and parses only the hours inside the given windows and
+    the weather alerts, without loading the whole payload.
+
+    Args:
+        windows: A sequence of (forecast day, start hour, end hour) tuples.
+        zip_code (str, optional): The location. Defaults to the zip code in settings.
+        use_cache (bool, optional): Overrides settings.FORECAST_CACHE_ENABLED.
+        alert_periods (optional): (start, end) datetimes to pick the alerts for, see
+            forecast_stream.parse_forecast_windows().
 
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as ex:
-        print(f'There was an error in get_one_day_forecast. Error: {ex}')
+    Returns:
+        tuple or None: One HourlyForecast per window and the weather alert fields (one
+        dictionary per alert period if alert_periods is given), or None if the request
+        failed or the forecast was cut off or malformed.
+    '''
+    import ijson
+    zip_code = zip_code or settings.ZIP_CODE
+    use_cache = settings.FORECAST_CACHE_ENABLED if use_cache is None else use_cache
+    days = max([settings.FORECAST_DAYS] + [day_index + 1 for day_index, _, _ in windows])
+    query, cache_key = _get_forecast_query(zip_code, days)
+
+    with metrics.span('forecast_fetch', zip_code=zip_code, cache_hit=False) as span:
+        if use_cache:
+            cached_forecast = forecast_cache.get(cache_key)
+            if cached_forecast is not None:
+                logging.info('Using the cached forecast for %s (cache stats: %s)', zip_code, forecast_cache.stats)
+                span.update(cache_hit=True, bytes=len(cached_forecast))
+                try:
+                    return forecast_stream.parse_forecast_windows(io.BytesIO(cached_forecast), windows, alert_periods)
+                except (ijson.JSONError, ValueError, KeyError, TypeError) as ex:
+                    logging.warning('The cached forecast for %s is unreadable, fetching it again: %s', zip_code, ex)
+                    span['cache_hit'] = False
+
+        import requests
+        import urllib3
+        try:
+            with http_client.get(_get_forecast_url(query), stream=True) as response:
+                response.raise_for_status()
+                # Let urllib3 undo any gzip transfer encoding as we read
+                response.raw.decode_content = True
+                reader = _RecordingReader(response.raw, keep=use_cache)
+                forecast_windows = forecast_stream.parse_forecast_windows(reader, windows, alert_periods)
+        # A body cut off mid-stream surfaces from ijson or urllib3 rather than requests,
+        # and a malformed hour from HourlyForecast.append()
+        except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError, ijson.JSONError,
+                ValueError, KeyError, TypeError) as ex:
+            logging.error('Could not fetch the forecast for %s: %s', zip_code, ex)
+            span['error'] = str(ex)
+            return None
+        span['bytes'] = reader.bytes_read
+
+        if use_cache:
+            forecast_cache.set(cache_key, b''.join(reader.chunks))
+            logging.info('Cached the forecast for %s (cache stats: %s)', zip_code, forecast_cache.stats)
+        return forecast_windows
+
+def get_relevant_forecast(zip_code=None, use_cache=None):
+    '''
+    Streams the forecast and returns the relevant weather information for the
+    snow day prediction, in the same shape as
+    weather_data.get_relevant_weather_information().
+    '''
+    forecast_windows = get_forecast_windows(weather_data.RELEVANT_WINDOWS, zip_code, use_cache)
+    if forecast_windows is None:
         return None
+
+    return forecast_stream.merge_forecast_windows(*forecast_windows)
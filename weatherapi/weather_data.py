@@ -4,61 +4,126 @@ The weather data that we get will be used to pass to our AI engine to
 determine the percentage chance of a snow day.
 '''
 import logging
+from datetime import datetime
+from weatherapi.hourly_forecast import HourlyForecast
+from settings import settings
+
+# The (forecast day, start hour, end hour) windows used for the snow day prediction:
+# 7 PM to Midnight of the current day and Midnight to 8 AM of the next day
+RELEVANT_WINDOWS = ((0, 19, 24), (1, 0, 8))
+
+def get_night_windows(day_offset):
+    '''
+    Returns the windows for the night before the school day day_offset days from
+    now (1 is tomorrow, which gives RELEVANT_WINDOWS).
+    '''
+    return tuple((day_index + day_offset - 1, start_hour, end_hour)
+                 for day_index, start_hour, end_hour in RELEVANT_WINDOWS)
 
 def get_hourly_forecast_data(hourly_data, start_hour, end_hour):
     '''
     Extracts relevant weather data from hourly forecast between given hours.
+    Returns an HourlyForecast with one position per hour.
     '''
-    relevant_data = {}
+    relevant_data = HourlyForecast()
     for hour in hourly_data:
         hour_time = hour['time']
         hour_of_day = int(hour_time.split(' ')[1].split(':')[0])  # Extracting the hour part
 
         if start_hour <= hour_of_day < end_hour:
-            relevant_data[f'hour_{hour_of_day}_temp_f'] = hour['temp_f']
-            relevant_data[f'hour_{hour_of_day}_chance_of_snow'] = hour['chance_of_snow']
-            relevant_data[f'hour_{hour_of_day}_chance_of_rain'] = hour['chance_of_rain']
-            relevant_data[f'hour_{hour_of_day}_wind_mph'] = hour['wind_mph']
-            relevant_data[f'hour_{hour_of_day}_visibility_miles'] = hour['vis_miles']
-            relevant_data[f'hour_{hour_of_day}_snow_cm'] = hour.get('snow_cm', 0)
-            relevant_data[f'hour_{hour_of_day}_humidity'] = hour['humidity']
-            relevant_data[f'hour_{hour_of_day}_cloud'] = hour['cloud']
-            relevant_data[f'hour_{hour_of_day}_pressure_in'] = hour['pressure_in']
-            relevant_data[f'hour_{hour_of_day}_feelslike_f'] = hour['feelslike_f']
-            relevant_data[f'hour_{hour_of_day}_windchill_f'] = hour['windchill_f']
-            relevant_data[f'hour_{hour_of_day}_dewpoint_f'] = hour['dewpoint_f']
-            relevant_data[f'hour_{hour_of_day}_gust_mph'] = hour['gust_mph']
-            relevant_data[f'hour_{hour_of_day}_uv'] = hour['uv']
-            relevant_data[f'hour_{hour_of_day}_condition'] = hour['condition']['text']
+            relevant_data.append(hour_of_day, hour)
 
     return relevant_data
 
+def get_weather_alert_data(weather_alert_data):
+    '''
+    Extracts the fields we pass along from a single WeatherAPI alert.
+    '''
+    return {
+        'weather_alert_event': weather_alert_data['event'],
+        'weather_alert_severity': weather_alert_data['severity'],
+        'weather_alert_certainty': weather_alert_data['certainty'],
+        'weather_alert_urgency': weather_alert_data['urgency'],
+        'weather_alert_desc': weather_alert_data['desc'],
+    }
+
+def alert_overlaps(weather_alert_data, start, end):
+    '''
+    Tells whether a WeatherAPI alert is in effect at any time between the
+    timezone-aware datetimes start and end. An alert without a readable
+    effective or expires time is taken to be open-ended on that side.
+    '''
+    try:
+        effective = datetime.fromisoformat(weather_alert_data['effective'])
+    except (KeyError, TypeError, ValueError):
+        effective = None
+    try:
+        expires = datetime.fromisoformat(weather_alert_data['expires'])
+    except (KeyError, TypeError, ValueError):
+        expires = None
+
+    if effective is not None and effective >= end:
+        return False
+    return expires is None or expires > start
+
 def get_relevant_weather_information(forecast_data):
     '''
     Gets the weather data from 7 PM on the current day to 8 AM the next day for snow day prediction.
+    The hourly data is stored under the 'hourly' key as an HourlyForecast, alongside
+    the weather alert fields.
     '''
     logging.info('Getting the relevant weather info from the evening to the next morning')
-    weather_data = {}
+    weather_data = {'hourly': HourlyForecast()}
 
     try:
-        # Data from 7 PM to Midnight of the current day (forecast day 0)
-        current_day_hourly_data = forecast_data['forecast']['forecastday'][0]['hour']
-        weather_data.update(get_hourly_forecast_data(current_day_hourly_data, 19, 24))  # 7 PM to Midnight
-
-        # Data from Midnight to 8 AM of the next day (forecast day 1)
-        next_day_hourly_data = forecast_data['forecast']['forecastday'][1]['hour']
-        weather_data.update(get_hourly_forecast_data(next_day_hourly_data, 0, 8))  # Midnight to 8 AM
+        # Data from 7 PM to Midnight of the current day, then Midnight to 8 AM of the next day
+        for day_index, start_hour, end_hour in RELEVANT_WINDOWS:
+            hourly_data = forecast_data['forecast']['forecastday'][day_index]['hour']
+            weather_data['hourly'].extend(get_hourly_forecast_data(hourly_data, start_hour, end_hour))
 
         # Get any weather alerts if applicable
         if 'alerts' in forecast_data and len(forecast_data['alerts']['alert']) > 0:
-            weather_alert_data = forecast_data['alerts']['alert'][0]
-            weather_data['weather_alert_event'] = weather_alert_data['event']
-            weather_data['weather_alert_severity'] = weather_alert_data['severity']
-            weather_data['weather_alert_certainty'] = weather_alert_data['certainty']
-            weather_data['weather_alert_urgency'] = weather_alert_data['urgency']
-            weather_data['weather_alert_desc'] = weather_alert_data['desc']
+            weather_data.update(get_weather_alert_data(forecast_data['alerts']['alert'][0]))
 
     except KeyError as ex:
         logging.error('Key not found in forecast_data: %s', ex)
 
     return weather_data
+
+def get_commute_window_features(weather_data):
+    '''
+    Summarizes the morning commute window (settings.COMMUTE_WINDOW_START_HOUR to
+    settings.COMMUTE_WINDOW_END_HOUR) of the relevant weather information.
+    '''
+    commute = weather_data['hourly'].select(range(settings.COMMUTE_WINDOW_START_HOUR,
+                                                  settings.COMMUTE_WINDOW_END_HOUR))
+    return {
+        'min_temp_f': commute.minimum('temp_f'),
+        'min_windchill_f': commute.minimum('windchill_f'),
+        'max_chance_of_snow': commute.maximum('chance_of_snow'),
+        'total_snow_cm': commute.total('snow_cm'),
+        'max_gust_mph': commute.maximum('gust_mph'),
+        'min_visibility_miles': commute.minimum('visibility_miles'),
+    }
+
+def get_prediction_features(weather_data):
+    '''
+    Summarizes the relevant weather information into the flat features stored with
+    every prediction: overnight extremes and totals, the commute window summary
+    (prefixed with commute_) and the weather alert.
+    '''
+    hourly = weather_data['hourly']
+    features = {
+        'hours': len(hourly),
+        'min_temp_f': hourly.minimum('temp_f'),
+        'min_windchill_f': hourly.minimum('windchill_f'),
+        'max_chance_of_snow': hourly.maximum('chance_of_snow'),
+        'max_chance_of_rain': hourly.maximum('chance_of_rain'),
+        'total_snow_cm': hourly.total('snow_cm'),
+        'max_gust_mph': hourly.maximum('gust_mph'),
+        'min_visibility_miles': hourly.minimum('visibility_miles'),
+        'weather_alert_event': weather_data.get('weather_alert_event'),
+        'weather_alert_severity': weather_data.get('weather_alert_severity'),
+    }
+    features.update((f'commute_{name}', value) for name, value in get_commute_window_features(weather_data).items())
+    return features
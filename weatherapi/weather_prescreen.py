@@ -0,0 +1,138 @@
+'''
+This file contains the deterministic weather pre-screen.
+Before we pay for an assistant run, the relevant weather information is checked
+against simple rules (snow, ice, extreme cold and weather alerts) from 7 PM
+to 8 AM. When none of the rules trip, the night is clearly not a snow day and a
+templated prediction is produced locally instead.
+
+Decision counts and the assistant time we avoided are kept in a small stats file
+so we can see how many expensive calls the pre-screen saves over a season.
+'''
+import json
+import logging
+import os
+import threading
+from general_functions import storage
+from settings import settings
+
+_stats_lock = threading.Lock()
+
+def get_prescreen_reasons(weather_info, rules=None):
+    '''
+    Checks the relevant weather information against the pre-screen rules.
+    Returns a list of the reasons the night might be a snow day. An empty list
+    means the night is clear.
+    '''
+    rules = rules or settings.PRESCREEN_RULES
+    hourly = weather_info.get('hourly')
+    if not hourly:
+        return ['no hourly forecast data']
+
+    reasons = []
+    max_chance_of_snow = hourly.maximum('chance_of_snow')
+    if max_chance_of_snow > rules['max_chance_of_snow']:
+        reasons.append(f'{max_chance_of_snow:g}% chance of snow')
+
+    total_snow_cm = hourly.total('snow_cm')
+    if total_snow_cm > rules['max_total_snow_cm']:
+        reasons.append(f'{total_snow_cm:g}cm of snow')
+
+    # Rain falling while temperatures sit around freezing means ice
+    low_temp_f, high_temp_f = rules['ice_temp_band_f']
+    for temp_f, chance_of_rain in zip(hourly.column('temp_f'), hourly.column('chance_of_rain')):
+        if low_temp_f <= temp_f <= high_temp_f and chance_of_rain > rules['max_ice_chance_of_rain']:
+            reasons.append(f'{chance_of_rain:g}% chance of rain at {temp_f:g}°F')
+            break
+
+    min_windchill_f = hourly.minimum('windchill_f')
+    if min_windchill_f < rules['min_windchill_f']:
+        reasons.append(f'wind chill down to {min_windchill_f:g}°F')
+
+    alert_event = weather_info.get('weather_alert_event')
+    if alert_event:
+        alert_severity = weather_info.get('weather_alert_severity')
+        if (alert_severity in rules['alert_severities'] or
+                any(keyword in alert_event.lower() for keyword in rules['alert_keywords'])):
+            reasons.append(f'{alert_event} ({alert_severity})')
+
+    return reasons
+
+def create_clear_night_prediction(weather_info, district):
+    '''
+    Creates the templated prediction for a night that passed the pre-screen, in the
+    same shape as the assistant's structured prediction.
+    '''
+    hourly = weather_info['hourly']
+    probability = settings.PRESCREEN_CLEAR_PROBABILITY
+    rationale = (f'No snow or ice in the forecast from 7 PM to 8 AM '
+                 f'(lows around {hourly.minimum("temp_f"):g}°F, '
+                 f'at most a {hourly.maximum("chance_of_snow"):g}% chance of snow) and no winter weather alerts.')
+    message = settings.PRESCREEN_MESSAGE_TEMPLATE.format(
+        school_name=district['school_name'],
+        probability=probability,
+        rationale=rationale,
+    )
+    return {'probability': probability, 'rationale': rationale, 'message': message}
+
+def _stats_path():
+    return os.path.join(storage.ROOT_DIRECTORY, settings.PRESCREEN_STATS_PATH)
+
+def load_prescreen_stats():
+    '''
+    Reads the pre-screen stats file.
+    '''
+    stats = {'clear': 0, 'escalated': 0, 'assistant_runs': 0, 'assistant_seconds': 0.0, 'seconds_saved': 0.0}
+    try:
+        with open(_stats_path(), 'r', encoding='utf-8') as stats_file:
+            stats.update(json.load(stats_file))
+    except (OSError, ValueError):
+        pass
+    return stats
+
+def _update_prescreen_stats(update):
+    with _stats_lock:
+        stats = load_prescreen_stats()
+        update(stats)
+        path = _stats_path()
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as stats_file:
+                json.dump(stats, stats_file, indent=2)
+            os.replace(temp_path, path)
+        except OSError as ex:
+            logging.warning('Could not save the pre-screen stats: %s', ex)
+    return stats
+
+def get_average_assistant_seconds(stats):
+    '''
+    Returns the average measured assistant time, or the configured estimate when
+    no runs have been measured yet.
+    '''
+    if stats['assistant_runs']:
+        return stats['assistant_seconds'] / stats['assistant_runs']
+    return settings.PRESCREEN_ESTIMATED_ASSISTANT_SECONDS
+
+def record_clear_night():
+    '''
+    Counts a night the pre-screen handled locally and the assistant time it saved.
+    '''
+    def update(stats):
+        stats['clear'] += 1
+        stats['seconds_saved'] += get_average_assistant_seconds(stats)
+
+    stats = _update_prescreen_stats(update)
+    logging.info('Pre-screen decisions: %s clear, %s escalated. About %.0f seconds of assistant time saved so far.',
+                 stats['clear'], stats['escalated'], stats['seconds_saved'])
+
+def record_assistant_run(seconds):
+    '''
+    Counts a night the pre-screen sent to the assistant and how long the assistant took.
+    '''
+    def update(stats):
+        stats['escalated'] += 1
+        stats['assistant_runs'] += 1
+        stats['assistant_seconds'] += seconds
+
+    stats = _update_prescreen_stats(update)
+    logging.info('Pre-screen decisions: %s clear, %s escalated.', stats['clear'], stats['escalated'])